@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Offline benchmark of the output writers, on synthetic posts shaped like the scraper's.
+
+Compares the former export path, where every post was kept in a dictionary, dumped to a JSON string, parsed back
+and turned into a dictionary per row, with the writers that take the posts straight from the scrape loop.
+Reports time and peak memory allocated by python (tracemalloc) per writer, and with --hold the memory taken by the
+posts kept in memory, as dictionaries and as Post records.
+
+    python -m benchmarks.export --posts 100000
+    python -m benchmarks.export --posts 100000 --format csv --json export.json
+    python -m benchmarks.export --posts 100000 --hold
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from facebook_page_scraper import Facebook_scraper, Jsonl_sink, Parquet_sink, Post, Sqlite_sink
+from facebook_page_scraper.sinks import Csv_sink
+
+
+def synthetic_posts(count):
+    """generator of count (post ID, post) tuples with the keys and typical sizes of the scraped posts"""
+    for index in range(count):
+        post_id = str(10 ** 15 + index)
+        yield post_id, {
+            "name": "Page {}".format(index % 50),
+            "user_url": "https://www.facebook.com/page{}".format(index % 50),
+            "content": "Post number {} ".format(index) * 20,
+            "images": ["https://scontent.xx.fbcdn.net/v/t39/{}_{}_n.jpg?stp=dst-jpg&_nc_ht=scontent".format(index, image)
+                       for image in range(index % 4)],
+            "post_id": post_id,
+            "post_url": "https://www.facebook.com/page{}/posts/{}".format(index % 50, post_id),
+            "error": None,
+            "shares": index % 97,
+            "reactions": {"likes": index % 1000, "loves": index % 100, "wow": 0, "cares": 1, "sad": 0, "angry": 0,
+                          "haha": index % 7},
+            "reaction_count": index % 1000 + index % 100 + 1 + index % 7,
+            "comments": index % 300,
+            "posted_on": "2024-01-{:02d}T10:{:02d}:00".format(index % 28 + 1, index % 60),
+            "video": [],
+        }
+
+
+def json_round_trip_csv(posts, path):
+    """the former scrap_to_csv: whole result as a dictionary, JSON string, parsed back, one dictionary per row"""
+    data = json.loads(json.dumps(dict(posts), ensure_ascii=False))
+    with open(path, "w", newline="", encoding="utf-8") as data_file:
+        writer = csv.DictWriter(data_file, fieldnames=Csv_sink.FIELDNAMES)
+        writer.writeheader()
+        for key, post in data.items():
+            reactions = post.get("reactions", {})
+            writer.writerow({
+                "id": key, "name": post.get("name", ""), "shares": post.get("shares", 0),
+                "likes": reactions.get("likes", 0), "loves": reactions.get("loves", 0), "wow": reactions.get("wow", 0),
+                "cares": reactions.get("cares", 0), "sad": reactions.get("sad", 0),
+                "angry": reactions.get("angry", 0), "haha": reactions.get("haha", 0),
+                "reactions_count": post.get("reaction_count", 0), "comments": post.get("comments", ""),
+                "content": post.get("content", ""), "posted_on": post.get("posted_on", ""),
+                "video": post.get("video", ""), "images": " ".join(post.get("images", [])),
+                "post_url": post.get("post_url", ""),
+            })
+
+
+def json_round_trip_jsonl(posts, path):
+    """the JSON lines equivalent of the former path, the whole result is kept before being written"""
+    data = json.loads(json.dumps(dict(posts), ensure_ascii=False))
+    with open(path, "w", encoding="utf-8") as data_file:
+        for key, post in data.items():
+            data_file.write(json.dumps(dict(post, id=key), ensure_ascii=False) + "\n")
+
+
+def json_round_trip_parquet(posts, path):
+    """the conversion analysts ran on scrap_to_json's output: parsed back, flattened to rows, written at once"""
+    import pyarrow
+    import pyarrow.parquet
+    data = json.loads(json.dumps(dict(posts), ensure_ascii=False))
+    rows = []
+    for key, post in data.items():
+        reactions = post.get("reactions", {})
+        rows.append(dict({column: post.get(column) for column in ("name", "user_url", "shares", "comments", "content",
+                                                                  "posted_on", "video", "images", "post_url")},
+                         id=key, reactions_count=post.get("reaction_count"),
+                         **{column: reactions.get(column) for column in Csv_sink.REACTION_COLUMNS}))
+    pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), path)
+
+
+def streaming_csv(posts, path):
+    """Facebook_scraper.scrap_to_csv's writer, fed the posts one by one"""
+    Facebook_scraper("benchmark")._Facebook_scraper__json_to_csv(path, posts)
+
+
+def streaming_jsonl(posts, path):
+    with Jsonl_sink(path, flush_every=1000) as sink:
+        for key, post in posts:
+            sink.write(key, post)
+
+
+def streaming_parquet(posts, path):
+    with Parquet_sink(path) as sink:
+        for key, post in posts:
+            sink.write(key, post)
+
+
+def per_post_sqlite(posts, path):
+    """upserts every post in its own transaction"""
+    with Sqlite_sink(path, page="benchmark", batch_size=1) as sink:
+        for key, post in posts:
+            sink.write(key, post)
+
+
+def batched_sqlite(posts, path):
+    with Sqlite_sink(path, page="benchmark") as sink:
+        for key, post in posts:
+            sink.write(key, post)
+
+
+# format: [(writer name, function(posts, path))], the first one is the baseline of the format
+WRITERS = {
+    "csv": [("json round trip", json_round_trip_csv), ("streaming", streaming_csv)],
+    "jsonl": [("json round trip", json_round_trip_jsonl), ("streaming", streaming_jsonl)],
+    "parquet": [("json round trip", json_round_trip_parquet), ("streaming", streaming_parquet)],
+    "sqlite": [("per post", per_post_sqlite), ("batched", batched_sqlite)],
+}
+
+
+def run_writer(writer, posts_count, directory, extension):
+    """writes posts_count synthetic posts with writer, returns dictionary of the measurements"""
+    path = os.path.join(directory, "posts.{}".format(extension))
+    for leftover in (path, path + ".checkpoint.json", path + ".checkpoint.ids", path + "-wal", path + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        writer(synthetic_posts(posts_count), path)
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "posts_per_second": posts_count / seconds, "peak_mb": peak / 2 ** 20,
+            "file_mb": os.path.getsize(path) / 2 ** 20}
+
+
+# record type: function(post dictionary) returning the record held in memory
+RECORDS = {"dict": dict, "Post": lambda post: Post(**post)}
+
+
+def hold_posts(record, posts_count):
+    """keeps posts_count synthetic posts as record in a dictionary, like scrap_to_json does, returns the MB they take"""
+    tracemalloc.start()
+    try:
+        held = {key: record(post) for key, post in synthetic_posts(posts_count)}
+        current = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del held
+    return current / 2 ** 20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="offline benchmark of the output writers of facebook_page_scraper")
+    parser.add_argument("--posts", type=int, default=100000, help="posts to write")
+    parser.add_argument("--format", action="append", choices=sorted(WRITERS), help="formats to compare, all by default")
+    parser.add_argument("--hold", action="store_true", help="only compare the memory taken by the posts kept in memory")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    results = []
+    if args.hold:
+        print("{:<8} {:>10}".format("record", "held MB"))
+        for name, record in RECORDS.items():
+            results.append({"record": name, "posts": args.posts, "held_mb": hold_posts(record, args.posts)})
+            print("{record:<8} {held_mb:>10.1f}".format(**results[-1]))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as results_file:
+                json.dump(results, results_file, indent=2)
+        return results
+    with tempfile.TemporaryDirectory() as directory:
+        for output_format in args.format or sorted(WRITERS):
+            for name, writer in WRITERS[output_format]:
+                try:
+                    result = run_writer(writer, args.posts, directory, output_format)
+                except ImportError as ex:
+                    print("skipping {} {}: {}".format(output_format, name, ex))
+                    continue
+                result.update({"format": output_format, "writer": name, "posts": args.posts})
+                results.append(result)
+    print("{:<8} {:<16} {:>10} {:>12} {:>10} {:>10}".format("format", "writer", "seconds", "posts/s", "peak MB", "file MB"))
+    for result in results:
+        print("{format:<8} {writer:<16} {seconds:>10.2f} {posts_per_second:>12.0f} {peak_mb:>10.1f} {file_mb:>10.1f}"
+              .format(**result))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as results_file:
+            json.dump(results, results_file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
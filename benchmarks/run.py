@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Offline benchmark of Facebook_scraper against the recorded feed pages.
+
+Runs scrap_to_json headless against the local stand-in of benchmarks/server.py and reports posts/sec,
+WebDriver commands per post, wall time per phase and peak RSS of the scraper and of the browser.
+
+    python -m benchmarks.run --browser chrome --layout new_layout --posts 20 --mode webdriver --mode script
+    python -m benchmarks.run --json nightly.json   # keep the results to compare releases
+"""
+import argparse
+import json
+import resource
+import sys
+import threading
+import time
+
+from facebook_page_scraper import Facebook_scraper
+
+from .server import Fixture_server
+
+
+class Memory_sampler:
+    """samples RSS of this process and of all its children (driver and browser processes) while a scrape runs,
+    uses psutil when it is installed, else falls back to getrusage which only sees exited children"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_rss = 0
+        self.__stop = threading.Event()
+        self.__thread = None
+        try:
+            import psutil
+            self.__process = psutil.Process()
+        except ImportError:
+            self.__process = None
+
+    def __sample(self):
+        rss = self.__process.memory_info().rss
+        for child in self.__process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except Exception:
+                pass  # process exited between listing and sampling
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def __run(self):
+        while not self.__stop.wait(self.interval):
+            self.__sample()
+
+    def start(self):
+        if self.__process is not None:
+            self.__thread = threading.Thread(target=self.__run, daemon=True)
+            self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            return self.peak_rss
+        # ru_maxrss is in kilobytes on linux, in bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * scale
+
+
+def run_benchmark(fixture_server, layout, posts_count, browser, extraction_mode, timeout):
+    """scrapes posts_count posts of the given layout, returns dictionary of the measurements"""
+    sampler = Memory_sampler().start()
+    try:
+        scraper = Facebook_scraper(Fixture_server.PAGE, posts_count, browser, timeout=timeout,
+                                   headless=True, extraction_mode=extraction_mode, profile=True)
+        scraper.URL = fixture_server.url(layout)
+        started = time.time()
+        posts = json.loads(scraper.scrap_to_json())
+        wall_time = time.time() - started
+    finally:
+        peak_rss = sampler.stop()
+    commands = scraper.profile["commands"] if scraper.profile else 0
+    extraction_time = scraper.phase_timings.get("extract") or wall_time
+    return {
+        "layout": layout,
+        "mode": extraction_mode,
+        "posts": len(posts),
+        "wall_time": wall_time,
+        "posts_per_sec": len(posts) / extraction_time if extraction_time else 0,
+        "commands": commands,
+        "commands_per_post": commands / len(posts) if posts else None,
+        "slowest_methods": scraper.profile["by_method"][:5] if scraper.profile else [],
+        "phases": scraper.phase_timings,
+        "peak_rss_mb": peak_rss / (1024 * 1024),
+    }
+
+
+def print_report(results):
+    header = "{:<11} {:<10} {:>6} {:>9} {:>10} {:>10} {:>10}  {}".format(
+        "layout", "mode", "posts", "posts/s", "cmd/post", "wall (s)", "rss (MB)", "phases (s)")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print("{:<11} {:<10} {:>6} {:>9.2f} {:>10} {:>10.1f} {:>10.0f}  {}".format(
+            result["layout"], result["mode"], result["posts"], result["posts_per_sec"],
+            "-" if result["commands_per_post"] is None else "{:.1f}".format(result["commands_per_post"]),
+            result["wall_time"], result["peak_rss_mb"],
+            " ".join("{}={:.1f}".format(phase, seconds) for phase, seconds in result["phases"].items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="offline benchmark of facebook_page_scraper")
+    parser.add_argument("--browser", default="chrome", choices=("chrome", "firefox"))
+    parser.add_argument("--layout", action="append", choices=Fixture_server.LAYOUTS,
+                        help="layout to benchmark, can be repeated, default is every layout")
+    parser.add_argument("--mode", action="append", choices=Facebook_scraper.EXTRACTION_MODES,
+                        help="extraction mode to benchmark, can be repeated, default is webdriver")
+    parser.add_argument("--posts", type=int, default=20, help="posts to scrape per run")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per layout and mode")
+    parser.add_argument("--timeout", type=int, default=600)
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    arguments = parser.parse_args(argv)
+
+    results = []
+    with Fixture_server(total_posts=max(arguments.posts * 2, 50)) as fixture_server:
+        for layout in arguments.layout or Fixture_server.LAYOUTS:
+            for mode in arguments.mode or ["webdriver"]:
+                for _ in range(arguments.repeat):
+                    results.append(run_benchmark(fixture_server, layout, arguments.posts, arguments.browser,
+                                                 mode, arguments.timeout))
+    print_report(results)
+    if arguments.json:
+        with open(arguments.json, "w", encoding="utf-8") as json_file:
+            json.dump({"created_at": time.time(), "python": sys.version.split()[0],
+                       "results": results}, json_file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Local HTTP stand-in for facebook, serves the recorded feed pages of benchmarks/fixtures.
+
+The feed is generated from the recorded post markup, pages lazy load more posts while they are scrolled,
+just like facebook does, so Facebook_scraper runs unchanged against them.
+"""
+import os
+import random
+import struct
+import threading
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+WORDS = ("meta", "research", "release", "model", "open", "source", "community", "today", "learn", "more",
+         "video", "photo", "event", "live", "update", "team", "world", "people", "build", "share")
+
+
+def _read_template(name):
+    with open(os.path.join(FIXTURES_DIRECTORY, name), encoding="utf-8") as template_file:
+        return Template(template_file.read())
+
+
+def _png(width, height, seed):
+    """returns bytes of a plain colored PNG image, images must really load for the photo viewer to move on"""
+    color = bytes(((seed * 37) % 256, (seed * 91) % 256, (seed * 53) % 256))
+    raw = b"".join(b"\x00" + color * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+class Fixture_server:
+    """serves the recorded new and old layout feed pages on a local port"""
+
+    LAYOUTS = ("new_layout", "old_layout")
+    PAGE = "bench"
+
+    def __init__(self, total_posts=500, initial_posts=5, batch_size=5, page_name="Bench Page", host="127.0.0.1", port=0):
+        self.total_posts = total_posts
+        self.initial_posts = initial_posts
+        self.batch_size = batch_size
+        self.page_name = page_name
+        self.now = datetime.now().replace(second=0, microsecond=0)
+        self.__pages = {layout: _read_template("{}.html".format(layout)) for layout in self.LAYOUTS}
+        self.__posts = {layout: _read_template("{}_post.html".format(layout)) for layout in self.LAYOUTS}
+        self.__httpd = ThreadingHTTPServer((host, port), self.__handler())
+        self.__thread = None
+
+    @property
+    def port(self):
+        return self.__httpd.server_address[1]
+
+    def url(self, layout):
+        """returns URL of the feed page of given layout"""
+        return "http://{}:{}/{}".format(self.__httpd.server_address[0], self.port, layout)
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__httpd.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__httpd.shutdown()
+        self.__httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def __media(self, layout, index, rng):
+        kind = index % 4
+        fbid = 5000000 + index * 10
+        set_id = 9000000 + index
+        if kind == 0:
+            return ""
+        if layout == "old_layout":
+            return '<div class="_3x-2"><img class="scaledImageFitWidth img" src="/img/{}.png" alt=""></div>'.format(fbid)
+        if kind == 3:
+            return '<div><a role="link" href="/{}/videos/{}/"><div>video</div></a></div>'.format(self.PAGE, 7000000 + index)
+        images = [fbid] if kind == 1 else [fbid + offset for offset in range(rng.randint(3, 6))]
+        anchors = "".join(
+            '<a href="/photo/?fbid={0}&amp;set=a.{1}" role="link" data-set="{1}" data-set-images="{2}">'
+            '<div><img referrerpolicy="origin-when-cross-origin" src="/img/{0}.png" alt=""></div></a>'.format(
+                image, set_id, ",".join(str(i) for i in images))
+            for image in images[:2])
+        more = '<div>+{}</div>'.format(len(images) - 2) if len(images) > 2 else ""
+        return "<div>{}{}</div>".format(anchors, more)
+
+    def __reactions(self, layout, rng):
+        reactions = []
+        for label in ("Like", "Love", "Care", "Haha", "Wow", "Sad", "Angry"):
+            count = rng.choice((0, 0, rng.randint(1, 90), rng.randint(100, 999), rng.randint(1000, 9000)))
+            if not count:
+                continue
+            shown = "{:.1f}K".format(count / 1000) if count >= 1000 else str(count)
+            if layout == "old_layout":
+                reactions.append('<a aria-label="{} {}" href="#"></a>'.format(shown, label))
+            else:
+                reactions.append('<div aria-label="{}: {} people" role="button"><span></span></div>'.format(label, shown))
+        return "".join(reactions)
+
+    def render_post(self, layout, index):
+        """returns markup of the post at given index of the feed, the same index always renders the same post"""
+        rng = random.Random(index)
+        posted_on = self.now - timedelta(hours=5 * index + 1)
+        hours = int((self.now - posted_on).total_seconds() // 3600)
+        return self.__posts[layout].substitute(
+            position=index + 1,
+            post_id=1000000 + index,
+            page=self.PAGE,
+            name=self.page_name,
+            content=" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 60))).capitalize() + ".",
+            utime=int(posted_on.timestamp()),
+            tooltip=posted_on.strftime("%A, %B %d, %Y at %I:%M %p"),
+            relative_time="{}h".format(hours) if hours < 24 else "{}d".format(hours // 24),
+            media=self.__media(layout, index, rng),
+            reactions=self.__reactions(layout, rng),
+            comments=rng.randint(0, 400),
+            shares=rng.randint(0, 90),
+        )
+
+    def render_feed(self, layout, offset, count):
+        """returns markup of count posts starting from offset, empty string once the feed is exhausted"""
+        return "\n".join(self.render_post(layout, index)
+                         for index in range(offset, min(offset + count, self.total_posts)))
+
+    def render_page(self, layout):
+        return self.__pages[layout].substitute(
+            page_name=self.page_name,
+            posts=self.render_feed(layout, 0, self.initial_posts),
+            initial_posts=self.initial_posts,
+            batch_size=self.batch_size,
+        )
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                pass  # keeps the benchmark's report readable
+
+            def __send(self, body, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "max-age=3600" if content_type == "image/png" else "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if len(parts) == 1 and parts[0] in server.LAYOUTS:
+                    return self.__send(server.render_page(parts[0]).encode("utf-8"), "text/html; charset=utf-8")
+                if len(parts) == 2 and parts[0] == "feed" and parts[1] in server.LAYOUTS:
+                    offset = int(parse_qs(url.query).get("offset", ["0"])[0])
+                    feed = server.render_feed(parts[1], offset, server.batch_size)
+                    return self.__send(feed.encode("utf-8"), "text/html; charset=utf-8")
+                if len(parts) == 2 and parts[0] == "img" and parts[1].endswith(".png"):
+                    return self.__send(_png(64, 64, int(parts[1][:-4])), "image/png")
+                self.send_error(404)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="serves the recorded feed pages, e.g to inspect them in a browser")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--posts", type=int, default=500, help="number of posts in the feed")
+    arguments = parser.parse_args()
+    fixture_server = Fixture_server(total_posts=arguments.posts, port=arguments.port)
+    for layout in Fixture_server.LAYOUTS:
+        print(fixture_server.url(layout))
+    fixture_server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fixture_server.stop()
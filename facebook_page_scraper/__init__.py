@@ -3,6 +3,26 @@ from .scraper import Facebook_scraper
 from .driver_utilities import Utilities
 from .element_finder import Finder
 from .scraping_utilities import Scraping_utilities
+from .script_extractor import Script_extractor
+from .html_parser import Html_parser
+from .profiler import Driver_profiler
+from .driver_pool import Driver_pool
+from .session_store import Session_store
+from .orchestrator import Orchestrator
+from .async_scraper import Async_facebook_scraper
+from .sinks import Post_sink, Jsonl_sink, Csv_sink, Parquet_sink, Sqlite_sink
+from .post_index import Post_index
+from .waits import Waits
+from .graphql_parser import Graphql_parser
+from .media_downloader import Media_downloader
+from .feed_cursor import Feed_cursor
+from .filters import Post_filter, Time_window, Content_match, Min_reactions, Author
+from .post import Post
+from .scheduler import Scheduler
 
 __all__ = ["Initializer", "Facebook_scraper",
-           "Utilities", "Finder", "Scraping_utilities"]
+           "Utilities", "Finder", "Scraping_utilities", "Script_extractor", "Html_parser", "Driver_profiler", "Driver_pool",
+           "Session_store", "Orchestrator", "Async_facebook_scraper",
+           "Post_sink", "Jsonl_sink", "Csv_sink", "Parquet_sink", "Sqlite_sink", "Post_index", "Waits", "Graphql_parser",
+           "Media_downloader", "Feed_cursor",
+           "Post_filter", "Time_window", "Content_match", "Min_reactions", "Author", "Post", "Scheduler"]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import logging
+
+from .scraper import Facebook_scraper
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Async_facebook_scraper:
+    """
+    asyncio front end of Facebook_scraper, the scraper runs unchanged in an executor thread so the event loop never
+    blocks on the browser. Cancelling a call stops the scraper after the current post and waits for it to close its
+    browser (or give it back to its Driver_pool)
+
+    every keyword argument is passed to Facebook_scraper, e.g browser, headless, extraction_mode or driver_pool
+    """
+
+    def __init__(self, page_or_group_name, posts_count=10, executor=None, **scraper_options):
+        self.page_or_group_name = page_or_group_name
+        self.posts_count = int(posts_count)
+        # executor running the blocking scraper, None uses the loop's default executor
+        self.executor = executor
+        self.scraper_options = scraper_options
+
+    def __scraper(self):
+        return Facebook_scraper(self.page_or_group_name, self.posts_count, **self.scraper_options)
+
+    @staticmethod
+    async def __stop(scraper, future):
+        """stops the scraper and waits for its current step to end"""
+        scraper.stop()
+        await asyncio.wait({future})
+        logger.setLevel(logging.INFO)
+        logger.info("Stopped scraping {}".format(scraper.page_or_group_name))
+
+    async def scrap_to_json(self, minimum_timestamp=None, single_post=False):
+        """async version of Facebook_scraper.scrap_to_json, returns JSON string of the posts"""
+        scraper = self.__scraper()
+        # the run starts here, so that a cancellation before the executor picks it up still stops it
+        posts = scraper.iter_posts(minimum_timestamp, single_post)
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, scraper._Facebook_scraper__posts_to_json, posts)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await self.__stop(scraper, future)
+            raise
+
+    async def iter_posts(self, minimum_timestamp=None, single_post=False):
+        """async generator of (post ID, post) tuples, every post is yielded as soon as Facebook_scraper.iter_posts
+        yields it, the browser is only asked for the next post once the consumer is ready for it"""
+        loop = asyncio.get_running_loop()
+        scraper = self.__scraper()
+        posts = scraper.iter_posts(minimum_timestamp, single_post)
+        finished = object()
+        try:
+            while True:
+                next_post = loop.run_in_executor(self.executor, next, posts, finished)
+                try:
+                    item = await asyncio.shield(next_post)
+                except asyncio.CancelledError:
+                    await self.__stop(scraper, next_post)
+                    raise
+                if item is finished:
+                    break
+                yield item
+        finally:
+            # cancelled or closed early by the consumer, closing the generator closes the browser
+            await loop.run_in_executor(self.executor, posts.close)
+
+    def __aiter__(self):
+        return self.iter_posts()
+
+    @staticmethod
+    async def scrap_many(targets, concurrency=2, executor=None, **scraper_options):
+        """async generator scraping many targets, at most concurrency at a time, yields (target, posts dictionary)
+        tuples as the targets complete, posts is None if the target failed.
+
+        targets are page or group names, or dictionaries holding "page_or_group_name" and any of the Facebook_scraper
+        arguments along with "minimum_timestamp" and "single_post", like for Orchestrator"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def scrape(target):
+            if isinstance(target, str):
+                target = {"page_or_group_name": target}
+            options = dict(scraper_options)
+            options.update({key: value for key, value in target.items()
+                            if key not in ("page_or_group_name", "minimum_timestamp", "single_post")})
+            async with semaphore:
+                scraper = Async_facebook_scraper(target["page_or_group_name"], executor=executor, **options)
+                try:
+                    posts = await scraper.scrap_to_json(target.get("minimum_timestamp"), target.get("single_post", False))
+                    return target, json.loads(posts)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as ex:
+                    logger.exception("Error at scrap_many : {}".format(ex))
+                    return target, None
+
+        tasks = [asyncio.ensure_future(scrape(target)) for target in targets]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            # cancelled or closed early, every running scraper stops and closes its browser
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
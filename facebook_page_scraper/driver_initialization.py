@@ -6,8 +6,14 @@ from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from webdriver_manager.chrome import ChromeDriverManager
 from webdriver_manager.firefox import GeckoDriverManager
+from selenium.common.exceptions import SessionNotCreatedException
+import json
 import logging
 import os
+import shutil
+import subprocess
+import tempfile
+import time
 
 logger = logging.getLogger(__name__)
 format = logging.Formatter(
@@ -19,11 +25,94 @@ logger.addHandler(ch)
 
 class Initializer:
 
-    def __init__(self, browser_name, proxy=None, headless=True, devTools=False):
+    # where the fast startup mode keeps the resolved driver paths and the browser profiles
+    DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "facebook_page_scraper")
+    # a resolved driver is checked again with webdriver_manager after this many seconds, even if nothing changed
+    DRIVER_CACHE_TTL = 7 * 24 * 3600
+    BROWSER_BINARIES = {
+        "chrome": ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+                   "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"],
+        "firefox": ["firefox", "/Applications/Firefox.app/Contents/MacOS/firefox"],
+    }
+
+    def __init__(self, browser_name, proxy=None, headless=True, devTools=False, fast_startup=False,
+                 cache_directory=None, worker_id=0):
         self.browser_name = browser_name
         self.proxy = proxy
         self.headless = headless
         self.devTools = devTools
+        # fast startup reuses the resolved driver binary and a persistent browser profile, per worker
+        self.fast_startup = fast_startup
+        self.cache_directory = cache_directory or self.DEFAULT_CACHE_DIRECTORY
+        self.worker_id = worker_id
+
+    @staticmethod
+    def __command_version(command):
+        """returns first line printed by `command --version`, None if it can't be run"""
+        try:
+            output = subprocess.run([command, "--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    timeout=10, check=False).stdout.decode("utf-8", "ignore").strip()
+            return output.splitlines()[0] if output else None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def __browser_version(self, browser_name):
+        """returns version of the locally installed browser, None if it couldn't be found"""
+        for binary in self.BROWSER_BINARIES.get(browser_name, []):
+            path = shutil.which(binary) or (binary if os.path.isfile(binary) else None)
+            if path:
+                version = self.__command_version(path)
+                if version:
+                    return version
+        return None
+
+    def __read_driver_cache(self):
+        try:
+            with open(os.path.join(self.cache_directory, "drivers.json"), encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def __write_driver_cache(self, cache):
+        os.makedirs(self.cache_directory, exist_ok=True)
+        # write then rename, so concurrent workers never read a half written file
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_directory, suffix=".json")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as cache_file:
+            json.dump(cache, cache_file, indent=2)
+        os.replace(temporary_path, os.path.join(self.cache_directory, "drivers.json"))
+
+    def __driver_path(self, browser_name, install, refresh=False):
+        """returns path of the driver executable, with fast startup it is taken from the cache as long as the driver
+        and the browser versions did not change, else it is resolved by install (webdriver_manager) and cached"""
+        if not self.fast_startup:
+            return install()
+        cache = self.__read_driver_cache()
+        cached = cache.get(browser_name)
+        browser_version = self.__browser_version(browser_name)
+        if cached and not refresh:
+            is_valid = (os.path.isfile(cached.get("path", ""))
+                        and time.time() - cached.get("resolved_at", 0) < self.DRIVER_CACHE_TTL
+                        and cached.get("browser_version") == browser_version
+                        and cached.get("driver_version") == self.__command_version(cached["path"]))
+            if is_valid:
+                return cached["path"]
+            logger.info("Cached {} driver is outdated, resolving it again".format(browser_name))
+        path = install()
+        cache[browser_name] = {
+            "path": path,
+            "driver_version": self.__command_version(path),
+            "browser_version": browser_version,
+            "resolved_at": time.time(),
+        }
+        self.__write_driver_cache(cache)
+        return path
+
+    def __profile_directory(self, browser_name):
+        """returns the persistent profile directory of this worker, so HTTP cache and service workers survive restarts.
+        Two browsers can't share a profile, every concurrent worker needs its own worker_id"""
+        directory = os.path.join(self.cache_directory, "profiles", "{}-{}".format(browser_name, self.worker_id))
+        os.makedirs(directory, exist_ok=True)
+        return directory
 
     def set_properties(self, browser_option):
         """adds capabilities to the driver"""
@@ -42,7 +131,7 @@ class Initializer:
         browser_option.add_argument('--disable-popup-blocking')
         return browser_option
 
-    def set_driver_for_browser(self, browser_name, driver_install_config=None, remoteBrowser=None):
+    def set_driver_for_browser(self, browser_name, driver_install_config=None, remoteBrowser=None, refresh_driver=False):
         """expects browser name and returns a driver instance"""
         if driver_install_config is None:
             driver_install_config = {}
@@ -50,6 +139,10 @@ class Initializer:
         # if browser is suppose to be chrome
         if browser_name.lower() == "chrome":
             browser_option = ChromeOptions()
+            if self.fast_startup and remoteBrowser is None:
+                browser_option.add_argument("--user-data-dir={}".format(self.__profile_directory("chrome")))
+            chrome_driver_path = lambda: self.__driver_path(
+                "chrome", lambda: ChromeDriverManager().install(), refresh=refresh_driver)
             # automatically installs chromedriver and initialize it and returns the instance
             if self.proxy is not None:
                 options = {
@@ -58,7 +151,7 @@ class Initializer:
                     'no_proxy': 'localhost, 127.0.0.1'
                 }
                 logger.info("Using: {}".format(self.proxy))
-                return seleniumWireWebDriver.Chrome(executable_path=ChromeDriverManager().install(),
+                return seleniumWireWebDriver.Chrome(executable_path=chrome_driver_path(),
                                         options=self.set_properties(browser_option), seleniumwire_options=options)
 
             if remoteBrowser is not None:
@@ -69,7 +162,7 @@ class Initializer:
                 # Use RemoteWebDriver with Firefox capabilities
                 return webdriver.Remote(command_executor=selenium_grid_url, options=self.set_properties(browser_option))
             else:
-                return seleniumWireWebDriver.Chrome(executable_path=ChromeDriverManager().install(), options=self.set_properties(browser_option))
+                return seleniumWireWebDriver.Chrome(executable_path=chrome_driver_path(), options=self.set_properties(browser_option))
         elif browser_name.lower() == "firefox":
             browser_option = FirefoxOptions()
             # Check if remoteBrowser is enabled (True) - use RemoteWebDriver
@@ -82,15 +175,28 @@ class Initializer:
                 # Use RemoteWebDriver with Firefox capabilities
                 return webdriver.Remote(command_executor=selenium_grid_url, options=self.set_properties(browser_option))
             else:
+                if self.fast_startup:
+                    browser_option.add_argument("-profile")
+                    browser_option.add_argument(self.__profile_directory("firefox"))
                 # automatically installs geckodriver and initialize it and returns the instance
-                return seleniumWireWebDriver.Firefox(executable_path=GeckoDriverManager(**driver_install_config).install(), options=self.set_properties(browser_option))
+                gecko_driver_path = self.__driver_path(
+                    "firefox", lambda: GeckoDriverManager(**driver_install_config).install(), refresh=refresh_driver)
+                return seleniumWireWebDriver.Firefox(executable_path=gecko_driver_path, options=self.set_properties(browser_option))
         else:
             # if browser_name is not chrome neither firefox than raise an exception
             raise Exception("Browser not supported!")
 
     def init(self, driver_install_config, remoteBrowser=None):
         """returns driver instance"""
-        driver = self.set_driver_for_browser(self.browser_name, driver_install_config=driver_install_config, remoteBrowser=remoteBrowser)
+        try:
+            driver = self.set_driver_for_browser(self.browser_name, driver_install_config=driver_install_config, remoteBrowser=remoteBrowser)
+        except SessionNotCreatedException:
+            if not self.fast_startup:
+                raise
+            # the browser was probably updated since the driver got cached, resolve it again
+            logger.info("Could not start the browser with the cached driver, resolving it again")
+            driver = self.set_driver_for_browser(self.browser_name, driver_install_config=driver_install_config,
+                                                 remoteBrowser=remoteBrowser, refresh_driver=True)
         if driver is not None:
             driver.set_page_load_timeout(120)
         return driver
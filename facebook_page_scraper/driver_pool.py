@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+import logging
+import queue
+import threading
+import time
+
+from .driver_initialization import Initializer
+from .driver_utilities import Utilities
+from .element_finder import Finder
+from .session_store import Session_store
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Driver_pool:
+    """
+    Keeps initialized, logged in browsers warm so that Facebook_scraper instances can borrow one for a job
+    instead of installing the driver, launching the browser and logging in on every run.
+
+    Browsers are health checked when they are borrowed and given back, reset when they are given back, and recycled
+    after max_jobs jobs or once their memory grew by more than max_memory_growth megabytes. Measuring the memory
+    requires psutil, install it with: pip install "facebook_page_scraper[pool]".
+    """
+
+    LOGIN_URL = "https://www.facebook.com/"
+
+    def __init__(self, size=2, browser="chrome", proxy=None, headless=True, username=None, password=None,
+                 driver_install_config=None, remoteBrowser=None, max_jobs=50, max_memory_growth=None,
+                 fast_startup=False, cache_directory=None, session_store=None, first_worker_id=0):
+        self.size = size
+        self.browser = browser
+        self.proxy = proxy
+        self.headless = headless
+        self.username = username
+        self.password = password
+        self.driver_install_config = driver_install_config
+        self.remoteBrowser = remoteBrowser
+        self.max_jobs = max_jobs
+        self.max_memory_growth = max_memory_growth
+        self.fast_startup = fast_startup
+        self.cache_directory = cache_directory
+        # Session_store the browsers restore their login from, instead of all logging in with the login form
+        self.session_store = session_store
+        # LIFO so the most recently used browser, with the warmest cache, is borrowed first. It also holds a None for
+        # every slot freed without a browser, e.g its replacement failed to launch, which wakes up a waiting borrower
+        self.__idle = queue.LifoQueue()
+        # number of those None in the queue
+        self.__wake_ups = 0
+        self.__lock = threading.Lock()
+        # stats of every browser owned by the pool, keyed by the driver's session id
+        self.__drivers = {}
+        # worker ids not used by a live browser, each browser needs its own profile directory with fast_startup
+        # first_worker_id keeps them distinct from the browsers of other pools, e.g in other processes
+        self.__free_worker_ids = list(range(first_worker_id + size - 1, first_worker_id - 1, -1))
+        self.__closed = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def logged_in(self):
+        """True if the pooled browsers are logged in, Facebook_scraper then skips its own login"""
+        return self.username is not None
+
+    @property
+    def busy(self):
+        """number of browsers currently borrowed"""
+        with self.__lock:
+            # the slots reserved while a browser starts aren't browsers yet
+            browsers = sum(1 for stats in self.__drivers.values() if stats is not None)
+            return browsers - (self.__idle.qsize() - self.__wake_ups)
+
+    def start(self):
+        """launches the browsers of the pool up front, so the first jobs don't pay the startup either"""
+        for _ in range(self.size - len(self.__drivers)):
+            self.__idle.put(self.__create_driver())
+        return self
+
+    def __create_driver(self):
+        """launches a new browser, logs it in and registers it in the pool"""
+        with self.__lock:
+            if self.__closed:
+                raise Exception("Driver pool is closed!")
+            worker_id = self.__free_worker_ids.pop()
+        try:
+            driver = Initializer(self.browser, self.proxy, self.headless, fast_startup=self.fast_startup,
+                                 cache_directory=self.cache_directory, worker_id=worker_id).init(
+                self.driver_install_config, remoteBrowser=self.remoteBrowser)
+            driver.set_window_size(1920, 1080)
+            if self.username is not None:
+                self.__log_in(driver)
+        except Exception:
+            with self.__lock:
+                self.__free_worker_ids.append(worker_id)
+            raise
+        with self.__lock:
+            self.__drivers[driver.session_id] = {
+                "jobs": 0,
+                "created_at": time.time(),
+                "memory": self.__memory_usage(driver),
+                "worker_id": worker_id,
+                # UI layout of facebook detected by the first job, see Finder's detect_ui
+                "layout": None,
+            }
+        logger.setLevel(logging.INFO)
+        logger.info("Driver pool: started a new {} browser ({} in pool)".format(self.browser, len(self.__drivers)))
+        return driver
+
+    def __log_in(self, driver):
+        """logs the new browser in, with the saved session of the account if it is still valid"""
+        restored = self.session_store is not None and self.session_store.restore(driver, self.username)
+        driver.get(self.LOGIN_URL)
+        if restored and Session_store.is_logged_in(driver):
+            return
+        if restored:
+            self.session_store.invalidate(self.username)
+        Finder._Finder__login(driver, self.username, self.password)
+        Finder._Finder__accept_cookies(driver)
+        if self.session_store is not None:
+            self.session_store.save(driver, self.username)
+
+    def borrow(self, timeout=None):
+        """returns a warm driver, launches a new one if the pool is not full yet,
+        else waits up to timeout seconds (forever if None) for one to be released"""
+        while True:
+            try:
+                driver = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            if driver is None:
+                self.__woken_up()
+            elif self.__alive(driver):
+                return driver
+        slot = object()
+        with self.__lock:
+            can_grow = len(self.__drivers) < self.size
+            if can_grow:
+                # reserve the slot while the browser starts
+                self.__drivers[slot] = None
+        if can_grow:
+            try:
+                driver = self.__create_driver()
+            except Exception:
+                with self.__lock:
+                    self.__drivers.pop(slot, None)
+                # the slot is free again, a borrower waiting meanwhile tries to launch the browser in turn
+                self.__wake_up_waiter()
+                raise
+            with self.__lock:
+                self.__drivers.pop(slot, None)
+            return driver
+        driver = self.__idle.get(timeout=timeout)
+        if driver is None:
+            # a slot was freed without a browser, the next attempt launches one
+            self.__woken_up()
+            return self.borrow(timeout)
+        # a dead browser leaves its slot free, the next attempt launches its replacement
+        return driver if self.__alive(driver) else self.borrow(timeout)
+
+    def __wake_up_waiter(self):
+        """wakes up a borrower waiting for a browser so that it retries to launch one, a slot of the pool being free"""
+        with self.__lock:
+            self.__wake_ups += 1
+            self.__idle.put(None)
+
+    def __woken_up(self):
+        with self.__lock:
+            self.__wake_ups -= 1
+
+    def __alive(self, driver):
+        """returns True if the idle browser still answers, else discards it, e.g it crashed while waiting for a job"""
+        if self.__is_healthy(driver):
+            return True
+        logger.setLevel(logging.INFO)
+        logger.info("Driver pool: discarding idle browser, unhealthy")
+        self.__discard(driver)
+        return False
+
+    def layout(self, driver):
+        """returns the layout a previous job detected in the pooled browser, None if none did"""
+        with self.__lock:
+            stats = self.__drivers.get(driver.session_id)
+            return stats["layout"] if stats else None
+
+    def remember_layout(self, driver, layout):
+        """keeps the layout detected in the pooled browser, for the next jobs it runs"""
+        with self.__lock:
+            stats = self.__drivers.get(driver.session_id)
+            if stats:
+                stats["layout"] = layout
+
+    def release(self, driver):
+        """gives back a borrowed driver, it is reset for the next job, or replaced if it is unhealthy or due for recycling"""
+        with self.__lock:
+            stats = self.__drivers.get(driver.session_id)
+            closed = self.__closed
+            if stats is not None:
+                stats["jobs"] += 1
+        if stats is None:
+            # not a pooled driver, e.g its session died and was already discarded
+            Utilities._Utilities__close_driver(driver)
+            return
+        reason = None
+        if closed:
+            reason = "pool closed"
+        elif not self.__is_healthy(driver):
+            reason = "unhealthy"
+        elif self.max_jobs and stats["jobs"] >= self.max_jobs:
+            reason = "served {} jobs".format(stats["jobs"])
+        elif self.__memory_grew(driver, stats):
+            reason = "memory grew by more than {} MB".format(self.max_memory_growth)
+        elif not self.__reset(driver):
+            reason = "could not be reset"
+        if reason is None:
+            self.__idle.put(driver)
+            return
+        logger.setLevel(logging.INFO)
+        logger.info("Driver pool: recycling browser, {}".format(reason))
+        self.__discard(driver)
+        if not closed:
+            try:
+                self.__idle.put(self.__create_driver())
+            except Exception as ex:
+                # the pool shrinks for now, the next borrow() tries to launch it again, a waiting one included
+                logger.exception("Error at driver pool release : {}".format(ex))
+                self.__wake_up_waiter()
+
+    def __discard(self, driver):
+        with self.__lock:
+            stats = self.__drivers.pop(driver.session_id, None)
+        # the browser must be gone before another one opens its profile
+        Utilities._Utilities__close_driver(driver)
+        if stats is not None:
+            with self.__lock:
+                self.__free_worker_ids.append(stats["worker_id"])
+
+    @staticmethod
+    def __is_healthy(driver):
+        """checks that the browser still answers"""
+        try:
+            return driver.execute_script("return 1;") == 1 and len(driver.window_handles) > 0
+        except Exception:
+            return False
+
+    @staticmethod
+    def __reset(driver):
+        """closes the tabs opened by the job and leaves the page, cookies are kept so the browser stays logged in"""
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get("about:blank")
+            if hasattr(driver, "requests"):
+                # selenium-wire keeps every captured request in memory
+                del driver.requests
+            return True
+        except Exception as ex:
+            logger.exception("Error at driver pool reset : {}".format(ex))
+            return False
+
+    @staticmethod
+    def __memory_usage(driver):
+        """returns RSS in bytes of the driver and browser processes, None if it can't be measured
+        (psutil not installed or remote browser)"""
+        try:
+            import psutil
+            process = psutil.Process(driver.service.process.pid)
+            return process.memory_info().rss + sum(
+                child.memory_info().rss for child in process.children(recursive=True))
+        except Exception:
+            return None
+
+    def __memory_grew(self, driver, stats):
+        if not self.max_memory_growth or stats["memory"] is None:
+            return False
+        memory = self.__memory_usage(driver)
+        return memory is not None and memory - stats["memory"] > self.max_memory_growth * 1024 * 1024
+
+    def close(self):
+        """closes every browser of the pool, borrowed ones are closed when they are released"""
+        with self.__lock:
+            self.__closed = True
+        while True:
+            try:
+                driver = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            if driver is None:
+                self.__woken_up()
+            else:
+                self.__discard(driver)
@@ -2,7 +2,6 @@
 
 import logging
 import sys
-import time
 from random import randint
 
 from selenium.common.exceptions import (NoSuchElementException,
@@ -12,6 +11,8 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+from .waits import Waits
+
 logger = logging.getLogger(__name__)
 format = logging.Formatter(
     "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -115,15 +116,19 @@ class Utilities:
         """expects driver's instance as a argument, and it scrolls down page to the most bottom till the height"""
         try:
             if layout == "old":
+                loaded_posts = Waits._Waits__count(driver, "div.userContentWrapper")
                 driver.execute_script(
                     "window.scrollTo(0, document.body.scrollHeight);")
+                Waits._Waits__new_elements(driver, "div.userContentWrapper", loaded_posts)
             elif layout == "new":
+                loaded_posts = Waits._Waits__count(driver, "[aria-posinset]")
                 body = driver.find_element(By.CSS_SELECTOR, "body")
                 for _ in range(randint(1, 3)):
                     body.send_keys(Keys.PAGE_UP)
-                time.sleep(randint(5, 6))
                 for _ in range(randint(5, 8)):
                     body.send_keys(Keys.PAGE_DOWN)
+                # returns as soon as the scroll loaded new posts, at most after the 6s the fixed sleep used to take
+                Waits._Waits__new_elements(driver, "[aria-posinset]", loaded_posts, timeout=6)
                 # driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
                 # Utilities.__close_modern_layout_signup_modal(driver)
         except Exception as ex:
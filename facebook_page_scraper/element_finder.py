@@ -18,7 +18,9 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.keys import Keys
 
 from .driver_utilities import Utilities
+from .graphql_parser import Graphql_parser
 from .scraping_utilities import Scraping_utilities
+from .waits import Waits
 
 logger = logging.getLogger(__name__)
 format = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -32,6 +34,9 @@ class Finder:
     Holds the collections of methods that finds element of the facebook's posts using selenium's webdriver's methods
     """
 
+    # parts of the URL of a post's time link, once hovered, see find_post_key
+    STATUS_LINK_PARTS = ("/posts/", "/permalink", "story_fbid=", "/videos/", "/reel", "fbid=", "/photos/")
+
     @staticmethod
     def __get_status_link(link_list):
         status = ""
@@ -63,6 +68,27 @@ class Finder:
                 break
         return status
 
+    @staticmethod
+    def __find_post_key(post, layout, driver):
+        """returns the ID of the post read from its own time link with a single script call and without hovering
+        anything, to tell cheaply if the post was scraped before. Empty list if it can't be read, e.g the time link of
+        the new layout only gets its URL once hovered. The other links of the post aren't read, the album of a photo
+        or the post it shares would be the key of other posts as well"""
+        try:
+            hrefs = driver.execute_script(
+                "return Array.prototype.map.call(arguments[0].querySelectorAll(arguments[1]), function (link) {"
+                " return link.getAttribute('href') === '#' ? '#' : link.href; });",
+                post, "a._5pcq" if layout == "old" else 'span > a[role="link"]') or []
+            for href in hrefs:
+                if layout == "old" or href == "#" or any(part in href for part in Finder.STATUS_LINK_PARTS):
+                    # the first time link is the post's own, the next ones belong to the post it shares
+                    key = Scraping_utilities._Scraping_utilities__extract_id_from_link(href) if href != "#" else None
+                    return [key] if key and key != "NA" else []
+            return []
+        except Exception as ex:
+            logger.exception("Error at find_post_key method : {}".format(ex))
+            return []
+
     @staticmethod
     def __find_status(post, layout, isGroup, driver, page_or_group_name, single_post = False):
         """finds URL of the post, then extracts link from that URL and returns it"""
@@ -112,9 +138,11 @@ class Finder:
                     driver.execute_script(scrolling_script, link)
                 Utilities._Utilities__close_force_login_popup(driver)
                 driver.execute_script("arguments[0].style.border='2px solid black'", link);
+                previous_href = link.get_dom_attribute("href")
                 actions.move_to_element(link).perform()
                 Utilities._Utilities__close_force_login_popup(driver)
-                time.sleep(2)
+                # the hover gives the time link its real URL, wait for it rather than a fixed 2s
+                Waits._Waits__href_changed(driver, link, previous_href, timeout=2)
 
                 # actually not  useful to trigger the hover witht he mouse event
                 # should be deleted in the future
@@ -429,7 +457,7 @@ class Finder:
                             driver.execute_script("arguments[0].scrollIntoView({block:'center',inline:'nearest'});", link_element)
                         if single_post:
                             driver.execute_script("arguments[0].scrollIntoView();", link_element)
-                        actions.move_to_element(link_element).pause(1).perform()
+                        actions.move_to_element(link_element).perform()
 
                         parent_element = link_element.find_element_by_xpath("..")
                         parent_element_described_by = parent_element.get_attribute("aria-describedby")
@@ -444,8 +472,10 @@ class Finder:
                             logger.debug(f"parent_element_described_by : {parent_element.get_attribute('outerHTML')} in retry {retries}")
                             retries += 1
 
-                        tooltipElement = driver.find_element(By.CSS_SELECTOR,
-                                                             f"[id*={parent_element_described_by.replace(':', '').replace(':', '')}]")
+                        tooltip_selector = f"[id*={parent_element_described_by.replace(':', '').replace(':', '')}]"
+                        # the tooltip is only rendered once the hover is noticed
+                        Waits._Waits__element(driver, tooltip_selector, timeout=3)
+                        tooltipElement = driver.find_element(By.CSS_SELECTOR, tooltip_selector)
                         timestampContent = tooltipElement.get_attribute("innerText")
                         logger.debug(f"tooltipElement content : {timestampContent}")
                         timestamp = (
@@ -532,31 +562,23 @@ class Finder:
 
     @staticmethod
     def __find_post_id(post, layout):
-        """finds all image of the facebook post using selenium's webdriver's method"""
+        """finds ID of the post from the link of its first photo, returns None if it has none. The old layout's
+        photos don't link to their set, the post keeps the ID of its status link there"""
+        post_id = None
         try:
-            if layout == "old":
-                # find all img tag that looks like <img class="scaledImageFitWidth img" src=""> div > img[referrerpolicy]
-                images = post.find_elements(
-                    By.CSS_SELECTOR, "img.scaledImageFitWidth.img"
-                )
-                # extract src attribute from all the img tag,store it in list
-            elif layout == "new":
+            if layout == "new":
                 images = post.find_elements(
                     By.CSS_SELECTOR, "a[href*='/photo/']"
                 )
                 if(len(images) > 0):
                     url = images[0].get_attribute("href")
-                    return Finder.__get_post_id(url)
-                else:
-                    return None
+                    post_id = Finder.__get_post_id(url)
         except NoSuchElementException:
-            sources = None
             pass
         except Exception as ex:
-            logger.exception("Error at find_image_url method : {}".format(ex))
-            sources = None
+            logger.exception("Error at find_post_id method : {}".format(ex))
 
-        return sources
+        return post_id
 
     @staticmethod
     def __get_post_id(url):
@@ -578,7 +600,92 @@ class Finder:
 
         return None
 
+    @staticmethod
+    def __get_photo_id(url):
+        """returns ID of the photo a /photo link points to, unlike __get_post_id it ignores the set"""
+        photo_id = parse_qs(urlparse(url).query).get('fbid', [None])[0]
+        if photo_id is None:
+            match = re.search(r"/photos/[^/]+/(\d+)", url)
+            photo_id = match.group(1) if match else None
+        return photo_id
+
+    @staticmethod
+    def __photo_set_url(url):
+        """returns URL of the page listing every photo of the set the /photo link belongs to"""
+        photo_set = parse_qs(urlparse(url).query).get('set', [None])[0]
+        if photo_set:
+            return "https://www.facebook.com/media/set/?set={}&type=3".format(photo_set)
+        return url
 
+    @staticmethod
+    def __fetch_page(driver, url, timeout=10):
+        """fetches url from inside the page, with the session's cookies, returns its body or None"""
+        try:
+            return driver.execute_async_script("""
+                var done = arguments[arguments.length - 1];
+                var controller = new AbortController();
+                setTimeout(function () { controller.abort(); }, arguments[1] * 1000);
+                fetch(arguments[0], {credentials: 'include', signal: controller.signal})
+                    .then(function (response) { return response.ok ? response.text() : null; })
+                    .then(done, function () { done(null); });
+            """, url, min(timeout, Waits.MAX_TIMEOUT))
+        except Exception as ex:
+            logger.debug("fetching {} failed : {}".format(url, ex))
+            return None
+
+    @staticmethod
+    def __find_images(post, layout, driver, strategy="fast"):
+        """finds all images of the post, with the "fast" strategy the photo viewer is only opened when neither the page
+        nor the photo set's page list the hidden "+N" images, with "carousel" it always is"""
+        if strategy == "fast" and layout == "new":
+            image = Finder.__find_images_fast(post, driver)
+            if image is not None:
+                return image
+        return Finder.__find_all_image_url(post, layout, driver)
+
+    @staticmethod
+    def __find_images_fast(post, driver):
+        """reads the post's images from the page in one script, and the hidden "+N" ones from one fetch of the photo set,
+        returns None if they couldn't be found this way"""
+        try:
+            found = driver.execute_script("""
+                var images = arguments[0].querySelectorAll("a[href*='/photo'] div > img[referrerpolicy]");
+                var sources = [], links = [], hidden = 0;
+                images.forEach(function (image) {
+                    var link = image.closest('a');
+                    sources.push(image.getAttribute('src'));
+                    links.push(link ? link.href : '');
+                });
+                if (images.length > 0) {
+                    // the last tile of a set holds the "+N" count of the images that aren't shown
+                    var link = images[images.length - 1].closest("a[href*='/photo']");
+                    var match = link && link.parentElement ? (link.parentElement.innerText || '').match(/\\+(\\d+)/) : null;
+                    hidden = match ? parseInt(match[1], 10) : 0;
+                }
+                return {sources: sources, links: links, hidden: hidden};
+            """, post)
+        except Exception as ex:
+            logger.debug("reading the images failed : {}".format(ex))
+            return None
+        sources, links = found['sources'], found['links']
+        if len(sources) == 0:
+            return {'images': [], 'post_id': None}
+        # the images are only looked for under the photo links, links[0] is one of them
+        post_id = Finder.__get_post_id(links[0])
+        if not found['hidden']:
+            return {'images': sources, 'post_id': post_id}
+        expected = len(sources) + int(found['hidden'])
+        body = Finder.__fetch_page(driver, Finder.__photo_set_url(links[0]))
+        photos = Graphql_parser._Graphql_parser__photo_set(body) if body else []
+        # the set's page can list photos around the post's ones, e.g for an album, start at the post's first photo
+        photo_ids = [photo_id for photo_id, _ in photos]
+        first_photo_id = Finder.__get_photo_id(links[0])
+        start = photo_ids.index(first_photo_id) if first_photo_id in photo_ids else 0
+        images = [uri for _, uri in photos[start:start + expected]]
+        if len(images) < expected:
+            logger.debug("the photo set listed {} of the {} images".format(len(images), expected))
+            return None
+        return {'images': images, 'post_id': post_id}
 
     @staticmethod
     def __find_all_image_url(post, layout, driver):
@@ -591,6 +698,7 @@ class Finder:
                     By.CSS_SELECTOR, "img.scaledImageFitWidth.img"
                 )
                 # extract src attribute from all the img tag,store it in list
+                sources = [image.get_attribute("src") for image in images]
             elif layout == "new":
                 images = post.find_elements(
                     By.CSS_SELECTOR, "a[href*='/photo'] div > img[referrerpolicy]"
@@ -604,7 +712,7 @@ class Finder:
                     carousel_close_button = carousel.find_element(By.XPATH, '//div[@aria-label="Close"]')
                     carousel_close_button = carousel_close_button.find_element(By.XPATH, './ancestor::div[@role="banner"]/*[1]')
                     ActionChains(driver).move_to_element_with_offset(carousel_close_button, 0, 0).click().perform()
-                    time.sleep(3)
+                    Waits._Waits__element_gone(driver, 'div[aria-label="Photo Viewer"]', timeout=3)
                 except Exception as exception:
                     logger.debug("carousel open not found")
                     logger.debug(exception)
@@ -659,16 +767,14 @@ class Finder:
                     if post_id is None:
                         post_id = Finder.__get_post_id(driver.current_url)
 
-                def is_image_loaded(driver, img_element):
-                    return driver.execute_script(
-                        "return arguments[0].complete && typeof arguments[0].naturalWidth != 'undefined' && arguments[0].naturalWidth > 0",
-                        img_element)
                 image_src = []
 
                 while (next_button is not None) & (len(image_src) < max_images_count):
                     try:
                         logger.debug("waiting for the image to render")
-                        time.sleep(2)
+                        if image_src:
+                            # the viewer swaps the image in place after a click on next
+                            Waits._Waits__image_changed(driver, 'img[data-visualcompletion]', image_src[-1], timeout=4)
                         i=0
                         image = None
                         while i < 2:
@@ -679,7 +785,7 @@ class Finder:
                                 i = 2
                             except:
                                 logger.debug("image not found, retrying")
-                                time.sleep(2 * (i+1))
+                                Waits._Waits__element(driver, 'img[data-visualcompletion]', timeout=2 * (i+1))
                                 i += 1
                                 continue
 
@@ -689,7 +795,7 @@ class Finder:
                             if image.get_attribute('src') in image_src:
                                 next_button = None
                                 break
-                            WebDriverWait(driver, 30).until(lambda driver: is_image_loaded(driver, image))
+                            Waits._Waits__image_loaded(driver, image, timeout=20)
                             images.append(image)
                             image_src.append(image.get_attribute('src'))
                             logger.info(f"image url : {image.get_attribute('src')}")
@@ -774,7 +880,8 @@ class Finder:
             url = None
             if name is not None:
                 try:
-                    url_elem = name.find_element(By.XPATH, "./ancestor::a")
+                    # the old layout's name element is the anchor itself
+                    url_elem = name.find_element(By.XPATH, "./ancestor-or-self::a")
                     url = url_elem.get_attribute('href')
                 except NoSuchElementException:
                     url_elem = name.find_element(By.XPATH, ".//a")
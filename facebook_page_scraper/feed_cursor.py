@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Feed_cursor:
+    """
+    Keeps track of how far the feed was processed, so that every scroll only hands over the posts it loaded.
+    Returned posts are marked inside the page and the query skips marked ones, so neither the browser nor python
+    compare the new posts with all the previous ones. Posts the page renders again, which lose their mark, are
+    told apart by their aria-posinset, lower than the cursor's position.
+
+    The IDs of the scraped posts are kept in a bounded dictionary, the most recent max_keys, which is enough to tell
+    the duplicates of a feed apart as they are always close to each other
+    """
+
+    MARKER = "data-fps-seen"
+
+    NEW_POSTS_SCRIPT = """
+        var nodes = document.querySelectorAll(arguments[0] + ':not([' + arguments[1] + '])');
+        var last = arguments[2], posts = [], positions = [];
+        for (var i = 0; i < nodes.length; i++) {
+            var node = nodes[i];
+            node.setAttribute(arguments[1], '');
+            var positioned = node.hasAttribute('aria-posinset') ? node : node.querySelector('[aria-posinset]');
+            var position = positioned ? parseInt(positioned.getAttribute('aria-posinset'), 10) || null : null;
+            if (last !== null && position !== null && position <= last) { continue; }
+            posts.push(node);
+            positions.push(position);
+        }
+        return [posts, positions];
+    """
+
+    def __init__(self, driver, layout, isGroup, max_keys=1000):
+        self.driver = driver
+        self.selector = self.__selector(layout, isGroup)
+        self.max_keys = max_keys
+        # highest aria-posinset handed over so far, None for the old layout
+        self.position = None
+        self.__keys = OrderedDict()
+
+    @staticmethod
+    def __selector(layout, isGroup):
+        """same posts as Finder's find_all_posts"""
+        if layout == "old":
+            return "div.userContentWrapper"
+        return "div[role='feed'] > div" if isGroup else "div[data-virtualized]"
+
+    def next_posts(self):
+        """returns the posts loaded since the last call, in the feed's order"""
+        try:
+            posts, positions = self.driver.execute_script(
+                self.NEW_POSTS_SCRIPT, self.selector, self.MARKER, self.position)
+        except Exception as ex:
+            logger.exception("Error at next_posts method : {}".format(ex))
+            return []
+        positions = [position for position in positions if position is not None]
+        if positions:
+            self.position = max(positions + [self.position or 0])
+        return posts
+
+    def seen(self, key):
+        """returns True if the post was handed over before"""
+        if key not in self.__keys:
+            return False
+        self.__keys.move_to_end(key)
+        return True
+
+    def add(self, key):
+        """remembers the post, forgetting the oldest one once max_keys are kept"""
+        self.__keys[key] = None
+        self.__keys.move_to_end(key)
+        if len(self.__keys) > self.max_keys:
+            self.__keys.popitem(last=False)
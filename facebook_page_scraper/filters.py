@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import logging
+import re
+
+import ciso8601
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Post_filter:
+    """
+    Predicate on the posts, given to Facebook_scraper's filters. Every filter declares the fields it reads, the scraper
+    extracts those first, cheapest first, and drops the post as soon as a filter rejects it, before its other steps.
+    A filter whose fields can't be extracted, e.g posted_on for groups, is ignored
+    """
+
+    # fields of the post read by accepts
+    fields = ()
+
+    def accepts(self, post):
+        """returns True if the post must be kept, post holds at least the fields of the filter"""
+        raise NotImplementedError
+
+    def ends_feed(self, post):
+        """returns True if, the post being rejected, no later post of the feed can be accepted either, so the scroll stops"""
+        return False
+
+
+class Time_window(Post_filter):
+    """keeps the posts published between since and until, unix timestamps, either can be None. The feed goes from the
+    newest post to the oldest so the scroll stops at the first post older than since, like minimum_timestamp does"""
+
+    fields = ("posted_on",)
+
+    def __init__(self, since=None, until=None):
+        self.since = int(since) if since else None
+        self.until = int(until) if until else None
+
+    @staticmethod
+    def __timestamp(post):
+        """returns the post's unix timestamp, None if its date is unknown, the post is then kept"""
+        try:
+            return ciso8601.parse_datetime(post["posted_on"]).timestamp() if post.get("posted_on") else None
+        except ValueError:
+            logger.setLevel(logging.INFO)
+            logger.warning("Time_window: unparseable posted_on {!r}, post kept".format(post["posted_on"]))
+            return None
+
+    def accepts(self, post):
+        timestamp = self.__timestamp(post)
+        if timestamp is None:
+            return True
+        return (self.since is None or timestamp >= self.since) and (self.until is None or timestamp <= self.until)
+
+    def ends_feed(self, post):
+        timestamp = self.__timestamp(post)
+        return timestamp is not None and self.since is not None and timestamp < self.since
+
+
+class Content_match(Post_filter):
+    """keeps the posts whose text matches the regular expression pattern"""
+
+    fields = ("content",)
+
+    def __init__(self, pattern, flags=re.IGNORECASE):
+        self.pattern = re.compile(pattern, flags)
+
+    def accepts(self, post):
+        return self.pattern.search(post.get("content") or "") is not None
+
+
+class Min_reactions(Post_filter):
+    """keeps the posts with at least minimum reactions"""
+
+    fields = ("reaction_count",)
+
+    def __init__(self, minimum):
+        self.minimum = int(minimum)
+
+    def accepts(self, post):
+        return (post.get("reaction_count") or 0) >= self.minimum
+
+
+class Author(Post_filter):
+    """keeps the posts written by one of names, e.g some members of a group"""
+
+    fields = ("name",)
+
+    def __init__(self, *names):
+        self.names = {name.casefold() for name in names}
+
+    def accepts(self, post):
+        return (post.get("name") or "").casefold() in self.names
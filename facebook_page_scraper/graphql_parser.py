@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+import json
+import logging
+import re
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlparse
+
+from .post import Post
+from .scraping_utilities import Scraping_utilities
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Graphql_parser:
+    """
+    Parses posts out of the JSON facebook's feed is rendered from: the api/graphql responses fetched while scrolling,
+    and the payload embedded in the page's HTML for the first posts. Gives every field, full photo sets included,
+    without hovering or opening anything in the page
+    """
+
+    GRAPHQL_PATH = "/api/graphql"
+    # reaction types are identified by fixed IDs when their localized name is missing
+    REACTION_IDS = {
+        "1635855486666999": "Like",
+        "1678524932434102": "Love",
+        "613557422527858": "Care",
+        "115940658764963": "Haha",
+        "478547315650144": "Wow",
+        "908563459236466": "Sad",
+        "444813342392137": "Angry",
+    }
+    # the JSON payloads of the page, e.g <script type="application/json" data-sjs>{...}</script>
+    EMBEDDED_JSON = re.compile(r'<script type="application/json"[^>]*>(.*?)</script>', re.S)
+    # keys holding another story, e.g the original post of a share, their fields must not leak into the sharing post
+    NESTED_STORY_KEYS = ("attached_story", "attached_story_layout")
+
+    @staticmethod
+    def __payloads(text):
+        """yields the JSON documents of a response body: graphql responses stream one document per line,
+        pages embed them in script tags"""
+        text = text.strip()
+        if text.startswith("for (;;);"):
+            text = text[len("for (;;);"):]
+        if text.startswith("<"):
+            chunks = Graphql_parser.EMBEDDED_JSON.findall(text)
+        else:
+            chunks = text.splitlines()
+        for chunk in chunks:
+            chunk = chunk.strip()
+            if not chunk:
+                continue
+            try:
+                yield json.loads(chunk)
+            except ValueError:
+                logger.debug("skipping a payload that isn't JSON")
+
+    @staticmethod
+    def __is_story(node):
+        return isinstance(node, dict) and node.get("__typename") == "Story" and node.get("post_id") is not None \
+            and "comet_sections" in node
+
+    @staticmethod
+    def __stories(node):
+        """yields every top level story of the payload, depth first so they come in the feed's order"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if Graphql_parser.__is_story(node):
+                yield node
+                continue
+            if isinstance(node, dict):
+                stack.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+
+    @staticmethod
+    def __walk(node):
+        """yields every dictionary of the story, closest to the story first, without entering the stories nested in it"""
+        queue = deque([node])
+        while queue:
+            node = queue.popleft()
+            if isinstance(node, dict):
+                yield node
+                queue.extend(value for key, value in node.items() if key not in Graphql_parser.NESTED_STORY_KEYS)
+            elif isinstance(node, list):
+                queue.extend(node)
+
+    @staticmethod
+    def __first(story, key, accept=lambda value: value is not None):
+        """returns the first value of key found in the story"""
+        for node in Graphql_parser.__walk(story):
+            if key in node and accept(node[key]):
+                return node[key]
+        return None
+
+    @staticmethod
+    def __count(value):
+        """counts are either numbers or {"count": n} objects"""
+        if isinstance(value, dict):
+            value = value.get("count", value.get("total_count"))
+        return int(value) if isinstance(value, (int, float)) else None
+
+    @staticmethod
+    def __reactions(story):
+        reactions = {key: 0 for key, _ in Scraping_utilities.REACTION_LABELS}
+        labels = {label: key for key, label in Scraping_utilities.REACTION_LABELS}
+        top_reactions = Graphql_parser.__first(story, "top_reactions", lambda value: isinstance(value, dict))
+        for edge in (top_reactions or {}).get("edges", []):
+            node = edge.get("node") or {}
+            label = node.get("localized_name") or Graphql_parser.REACTION_IDS.get(str(node.get("id")))
+            if label in labels:
+                reactions[labels[label]] = int(edge.get("reaction_count") or 0)
+        return reactions
+
+    @staticmethod
+    def __media(story):
+        """returns image URLs and video URLs of the story, every photo of a set is listed even the hidden "+N" ones"""
+        images = []
+        videos = []
+        for node in Graphql_parser.__walk(story):
+            media = node.get("media")
+            if not isinstance(media, dict):
+                continue
+            typename = media.get("__typename")
+            if typename == "Photo":
+                image = media.get("photo_image") or media.get("image") or media.get("viewer_image") or {}
+                if image.get("uri") and image["uri"] not in images:
+                    images.append(image["uri"])
+            elif typename == "Video":
+                video = media.get("browser_native_hd_url") or media.get("playable_url") or media.get("url") \
+                    or media.get("permalink_url")
+                if video and video not in videos:
+                    videos.append(video)
+        return images, videos
+
+    @staticmethod
+    def __parse_story(story):
+        """returns (post ID, Post) of the story"""
+        post_id = str(story["post_id"])
+        actor = (Graphql_parser.__first(story, "actors", lambda value: isinstance(value, list) and value) or [{}])[0]
+        message = Graphql_parser.__first(story, "message", lambda value: isinstance(value, dict) and "text" in value)
+        creation_time = Graphql_parser.__first(story, "creation_time", lambda value: isinstance(value, int))
+        post_url = story.get("wwwURL") or story.get("url") or Graphql_parser.__first(
+            story, "url", lambda value: isinstance(value, str) and post_id in value)
+        reactions = Graphql_parser.__reactions(story)
+        reaction_count = Graphql_parser.__count(Graphql_parser.__first(
+            story, "reaction_count", lambda value: isinstance(value, dict)))
+        comments = Graphql_parser.__count(Graphql_parser.__first(story, "total_comment_count")) \
+            or Graphql_parser.__count(Graphql_parser.__first(
+                story, "comments", lambda value: isinstance(value, dict) and "total_count" in value))
+        images, videos = Graphql_parser.__media(story)
+        return post_id, Post(
+            name=actor.get("name"),
+            user_url=actor.get("url"),
+            content=(message or {}).get("text", ""),
+            images=images,
+            post_id=post_id,
+            post_url=post_url,
+            error=None,
+            shares=Graphql_parser.__count(Graphql_parser.__first(story, "share_count")) or 0,
+            reactions=reactions,
+            reaction_count=reaction_count if reaction_count is not None
+            else Scraping_utilities._Scraping_utilities__count_reaction(reactions),
+            comments=comments or 0,
+            posted_on=datetime.fromtimestamp(creation_time).isoformat() if creation_time else "",
+            video=videos,
+        )
+
+    @staticmethod
+    def __parse_response(text):
+        """expects body of a graphql response or of a page, returns list of (post ID, post) in the feed's order"""
+        posts = []
+        seen = set()
+        for payload in Graphql_parser.__payloads(text):
+            for story in Graphql_parser.__stories(payload):
+                try:
+                    post_id, post = Graphql_parser.__parse_story(story)
+                except Exception as ex:
+                    logger.exception("Error at parse_story method : {}".format(ex))
+                    continue
+                if post_id not in seen:
+                    seen.add(post_id)
+                    posts.append((post_id, post))
+        return posts
+
+    @staticmethod
+    def __photo_set(text):
+        """expects body of a photo set or photo page, returns list of (photo ID, image URL) in the set's order"""
+        photos = []
+        seen = set()
+        for payload in Graphql_parser.__payloads(text):
+            stack = [payload]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, dict):
+                    if node.get("__typename") == "Photo":
+                        image = node.get("image") or node.get("photo_image") or node.get("viewer_image") or {}
+                        photo_id = str(node.get("id"))
+                        if isinstance(image, dict) and image.get("uri") and photo_id not in seen:
+                            seen.add(photo_id)
+                            photos.append((photo_id, image["uri"]))
+                    stack.extend(reversed(list(node.values())))
+                elif isinstance(node, list):
+                    stack.extend(reversed(node))
+        return photos
+
+    @staticmethod
+    def __captured_posts(driver, page_url, processed):
+        """returns posts of the responses selenium-wire captured since the last call. processed is the set of IDs of
+        the requests read by the previous calls, the requests read are added to it. The capture isn't cleared, a
+        response captured between reading and clearing it would be lost"""
+        posts = []
+        try:
+            requests = list(driver.requests)
+        except Exception as ex:
+            logger.exception("Error at captured_posts method : {}".format(ex))
+            return posts
+        from seleniumwire.utils import decode
+        page_path = urlparse(page_url).path.rstrip("/")
+        for request in requests:
+            response = request.response
+            # a request still waiting for its response is read by a later call
+            if request.id in processed or response is None:
+                continue
+            processed.add(request.id)
+            if response.status_code != 200 or not response.body:
+                continue
+            # the page itself holds the first posts, the others come from graphql
+            if Graphql_parser.GRAPHQL_PATH not in request.url and urlparse(request.url).path.rstrip("/") != page_path:
+                continue
+            try:
+                body = decode(response.body, response.headers.get("Content-Encoding", "identity"))
+                posts.extend(Graphql_parser.__parse_response(body.decode("utf-8", "replace")))
+            except Exception as ex:
+                logger.exception("Error at captured_posts method : {}".format(ex))
+        return posts
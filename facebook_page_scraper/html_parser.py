@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+import importlib.util
+import logging
+import re
+from urllib.parse import urljoin
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Html_parser:
+    """
+    Holds the collections of methods that finds the fields of the facebook's posts in an HTML snapshot using lxml,
+    it reads the same fields as Finder without making any WebDriver call
+    """
+
+    BASE_URL = "https://www.facebook.com"
+
+    STATUS_SELECTORS = [
+        'span > a[attributionsrc][role="link"][href*="/posts/"]',
+        'span > a[attributionsrc][role="link"][href*="/permalink"]',
+        'span > a[attributionsrc][role="link"][href*="/videos"]',
+        'span > a[attributionsrc][role="link"][href*="/reel"]',
+        'span > a[attributionsrc][role="link"][href="#"]',
+        None,  # replaced by the group or page specific selector
+        'span > a[role="link"][href*="/reel"]',
+        'span > a[role="link"][href*="/posts/"]',
+        'span > a[role="link"][href*="/permalink"]',
+        'span > a[role="link"][href*="/videos"]',
+    ]
+    STATUS_HREF = re.compile(r"/posts/|/permalink|/videos/|/reel|fbid=|/photos/")
+    VIDEO_SELECTORS = [
+        'a[attributionsrc][role="link"][href*="/reel"]',
+        'a[attributionsrc][role="link"][href*="/videos"]',
+        'a[role="link"][href*="/reel"]',
+        'a[role="link"][href*="/videos"]',
+    ]
+
+    # arguments: posts, layout, callback
+    # expands the "See more" of every post before serializing them, so the snapshot holds the full text
+    SNAPSHOT_SCRIPT = """
+        var posts = arguments[0];
+        var layout = arguments[1];
+        var done = arguments[arguments.length - 1];
+        for (var i = 0; i < posts.length; i++) {
+            var seeMore = layout === 'old'
+                ? posts[i].querySelector('.userContent span.see_more_link_inner')
+                : posts[i].querySelector('[data-ad-preview="message"] div[dir="auto"] > div[role]:not([target])');
+            if (seeMore) {
+                try { seeMore.click(); } catch (err) {}
+            }
+        }
+        requestAnimationFrame(function () {
+            setTimeout(function () {
+                done(Array.prototype.map.call(posts, function (post) { return post.outerHTML; }));
+            }, 300);
+        });
+    """
+
+    @staticmethod
+    def __load_lxml():
+        """imports lxml lazily as it is an optional dependency, only needed for the "html" extraction mode"""
+        try:
+            import lxml.html
+            # lxml's cssselect() needs it installed
+            if importlib.util.find_spec("cssselect") is None:
+                raise ImportError("No module named 'cssselect'")
+        except ImportError:
+            raise ImportError(
+                'The "html" extraction mode requires lxml and cssselect, install them with: '
+                'pip install "facebook_page_scraper[html]"')
+        return lxml.html
+
+    @staticmethod
+    def __snapshot_posts(driver, posts, layout):
+        """expects driver's instance and list of post elements, returns the outerHTML of every post with a single call"""
+        try:
+            return driver.execute_async_script(Html_parser.SNAPSHOT_SCRIPT, posts, layout) or []
+        except Exception as ex:
+            logger.exception("Error at snapshot_posts method : {}".format(ex))
+            return []
+
+    @staticmethod
+    def __text(element):
+        """returns the text of lxml element, empty string if element is None"""
+        if element is None:
+            return ""
+        return element.text_content()
+
+    @staticmethod
+    def __select(element, selector):
+        """returns descendants of element matching the CSS selector, like selenium's find_elements
+        (lxml's cssselect() would also return the element itself if it matches)"""
+        return [found for found in element.cssselect(selector) if found is not element]
+
+    @staticmethod
+    def __first(element, selector):
+        """returns first descendant matching the CSS selector or None"""
+        found = Html_parser.__select(element, selector)
+        return found[0] if found else None
+
+    @staticmethod
+    def __href(element):
+        """returns absolute URL of the anchor, just like the href property of a live element"""
+        href = element.get("href") if element is not None else None
+        return urljoin(Html_parser.BASE_URL, href) if href else ""
+
+    @staticmethod
+    def __ancestor(element, tag, href_contains=None):
+        """returns the closest ancestor of element with the given tag, optionally containing a text in its href"""
+        for ancestor in element.iterancestors(tag):
+            if href_contains is None or href_contains in (ancestor.get("href") or ""):
+                return ancestor
+        return None
+
+    @staticmethod
+    def __find_status(post, layout, isGroup):
+        """returns the anchor holding post's URL"""
+        if layout == "old":
+            return Html_parser.__first(post, "a._5pcq")
+        selectors = [selector if selector is not None else
+                     ('span > a[role="link"]' if isGroup else 'span > a[target="_blank"][role="link"]')
+                     for selector in Html_parser.STATUS_SELECTORS]
+        fallback = None
+        for selector in selectors:
+            for link in Html_parser.__select(post, selector):
+                if fallback is None:
+                    fallback = link
+                if Html_parser.STATUS_HREF.search(Html_parser.__href(link)):
+                    return link
+        if isGroup:
+            group_link = Html_parser.__first(post, 'a[href*="/groups/"]')
+            if group_link is not None:
+                return group_link
+        return fallback
+
+    @staticmethod
+    def __find_name(post, layout):
+        """returns dictionary holding name of the page or post's author and its URL"""
+        name = Html_parser.__first(post, "a._64-f" if layout == "old" else "b.html-b")
+        if name is None:
+            return {'name': None, 'url': None}
+        # the old layout's name element is the anchor itself
+        anchor = name if name.tag == "a" else Html_parser.__ancestor(name, "a")
+        if anchor is None:
+            anchor = Html_parser.__first(name, "a")
+        return {
+            'name': name.text_content(),
+            'url': Html_parser.__href(anchor) if anchor is not None else None
+        }
+
+    @staticmethod
+    def __find_content(post, layout):
+        """returns text content of the post"""
+        if layout == "old":
+            return Html_parser.__text(Html_parser.__first(post, ".userContent"))
+        message = Html_parser.__first(post, '[data-ad-preview="message"]')
+        if message is None:
+            return ""
+        # innerText puts every block on its own line, text_content() would glue the paragraphs together
+        paragraphs = [paragraph.text_content() for paragraph in Html_parser.__select(message, 'div[dir="auto"]')
+                      if not Html_parser.__select(paragraph, 'div[dir="auto"]')]
+        return "\n".join(paragraphs) if paragraphs else message.text_content()
+
+    @staticmethod
+    def __find_reactions(post, layout):
+        """returns the aria-labels of the reaction elements, e.g ["54 Like", "5 Love"]"""
+        reactions_all = Html_parser.__first(post, '[aria-label="See who reacted to this"]')
+        if reactions_all is None:
+            return []
+        return [element.get("aria-label") or "" for element in Html_parser.__select(reactions_all, "a" if layout == "old" else "div")]
+
+    @staticmethod
+    def __find_images(post, layout):
+        """returns image's URLs, URLs of the anchors wrapping them and number of images hidden behind the "+N" tile"""
+        if layout == "old":
+            images = Html_parser.__select(post, "img.scaledImageFitWidth.img")
+            return [image.get("src") for image in images], [], 0
+        images = Html_parser.__select(post, "a[href*='/photo'] div > img[referrerpolicy]")
+        image_links = []
+        for image in images:
+            anchor = Html_parser.__ancestor(image, "a")
+            image_links.append(Html_parser.__href(anchor) if anchor is not None else "")
+        more_images = 0
+        if images:
+            parent = Html_parser.__ancestor(images[-1], "a", "/photo")
+            if parent is not None and parent.getparent() is not None:
+                for counter in parent.getparent().iter("div"):
+                    match = re.match(r"^\+(\d+)$", counter.text_content().strip())
+                    if match:
+                        more_images = int(match.group(1))
+                        break
+        return [image.get("src") for image in images], image_links, more_images
+
+    @staticmethod
+    def __find_videos(post):
+        """returns src of every video tag and links of every video or reel of the post"""
+        video_links = []
+        for selector in Html_parser.VIDEO_SELECTORS:
+            video_links.extend(Html_parser.__href(link) for link in Html_parser.__select(post, selector))
+        return [video.get("src") for video in post.iter("video") if video.get("src")], video_links
+
+    @staticmethod
+    def __extract_post(post, layout, isGroup):
+        """expects lxml element of a post, returns dictionary of raw values with the same keys as Script_extractor's"""
+        status_link = Html_parser.__find_status(post, layout, isGroup)
+        name = Html_parser.__find_name(post, layout)
+        images, image_links, more_images = Html_parser.__find_images(post, layout)
+        videos, video_links = Html_parser.__find_videos(post)
+        if layout == "old":
+            abbr = Html_parser.__first(post, "abbr[data-utime]")
+            shares = Html_parser.__text(Html_parser.__first(post, "._355t._4vn2"))
+            comments = [Html_parser.__text(Html_parser.__first(post, "a._3hg-"))]
+            posted_time = abbr.get("data-utime") if abbr is not None else ""
+        else:
+            shares_element = Html_parser.__first(post, "div:nth-child(2) > span > div > div > div:nth-child(1) > span")
+            shares = shares_element.text_content().strip() if shares_element is not None else "0"
+            comments = [span.text_content().strip() for span in
+                        Html_parser.__select(post, "div:nth-child(1) > span > div > div > div:nth-child(1) > span")]
+            posted_time = ""
+            if status_link is not None:
+                posted_time = status_link.get("aria-label") or status_link.text_content().strip()
+        return {
+            "status_url": Html_parser.__href(status_link) if status_link is not None else None,
+            "name": name.get('name'),
+            "user_url": name.get('url'),
+            "content": Html_parser.__find_content(post, layout),
+            "shares": shares,
+            "comments": comments,
+            "reactions": Html_parser.__find_reactions(post, layout),
+            "time": posted_time,
+            "images": images,
+            "image_links": image_links,
+            "photo_links": [Html_parser.__href(link) for link in Html_parser.__select(post, "a[href*='/photo/']")],
+            "more_images": more_images,
+            "videos": videos,
+            "video_links": video_links,
+        }
+
+    @staticmethod
+    def __extract_posts(html_list, layout, isGroup):
+        """expects list of outerHTML of posts, returns a list of dictionaries holding raw values of every post"""
+        lxml_html = Html_parser.__load_lxml()
+        raw_posts = []
+        for html in html_list:
+            try:
+                raw_posts.append(Html_parser.__extract_post(lxml_html.fromstring(html), layout, isGroup))
+            except Exception as ex:
+                logger.exception("Error at extract_posts method : {}".format(ex))
+                raw_posts.append({"error": str(ex)})
+        return raw_posts
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Media_downloader:
+    """
+    Downloads the images and videos of the posts while the page is being scrolled, before their signed CDN URLs expire.
+    Downloads run on a bounded thread pool sharing keep-alive connections, and files are stored under their content's
+    SHA-256, <directory>/<first 2 hex digits>/<sha256><extension>, so the same media found in several posts or pages
+    is stored once.
+
+    Every post gets a "media" list, one entry per URL: {"url", "type", "status", "path", "sha256", "bytes", "error"}
+    where status is "downloaded", "exists" (same content stored before), "skipped" (the URL isn't a media file,
+    e.g the link to a video's page) or "failed"
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    MEDIA_TYPES = ("image/", "video/")
+
+    def __init__(self, directory, workers=8, timeout=30, retries=2):
+        self.directory = directory
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+        self.__open()
+
+    def __getstate__(self):
+        # only the settings are sent to other processes, e.g Orchestrator's workers, they start their own threads
+        return {"directory": self.directory, "workers": self.workers, "timeout": self.timeout, "retries": self.retries}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__open()
+
+    def __open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # one connection pool per CDN host, as many keep-alive connections as threads
+        self.__http = urllib3.PoolManager(
+            maxsize=self.workers, block=True, retries=urllib3.Retry(self.retries, backoff_factor=0.5),
+            timeout=urllib3.Timeout(connect=10, read=self.timeout))
+        self.__executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media")
+        # one download per URL, posts sharing a URL share its result. Only the running downloads are kept so that a
+        # long-running scraper doesn't hold every URL, a URL met again later is stored once all the same, as "exists"
+        self.__downloads = {}
+        self.__lock = threading.Lock()
+        self.stats = {"downloaded": 0, "exists": 0, "skipped": 0, "failed": 0, "bytes": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __path(self, sha256, content_type):
+        extension = (mimetypes.guess_extension(content_type) or "") if content_type else ""
+        return os.path.join(self.directory, sha256[:2], sha256 + extension)
+
+    def __download(self, url, kind):
+        """downloads url to a temporary file while hashing it, then moves it to its content-addressed path"""
+        result = {"url": url, "type": kind, "status": "failed", "path": None, "sha256": None, "bytes": 0, "error": None}
+        temporary_path = None
+        try:
+            response = self.__http.request("GET", url, preload_content=False)
+            try:
+                content_type = (response.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+                if response.status != 200:
+                    result["error"] = "HTTP {}".format(response.status)
+                    return result
+                if not content_type.startswith(self.MEDIA_TYPES):
+                    result["status"] = "skipped"
+                    result["error"] = "not a media file : {}".format(content_type)
+                    return result
+                digest = hashlib.sha256()
+                descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+                with os.fdopen(descriptor, "wb") as media_file:
+                    for chunk in response.stream(self.CHUNK_SIZE):
+                        digest.update(chunk)
+                        media_file.write(chunk)
+                        result["bytes"] += len(chunk)
+            finally:
+                response.release_conn()
+            result["sha256"] = digest.hexdigest()
+            result["path"] = self.__path(result["sha256"], content_type)
+            if os.path.exists(result["path"]):
+                os.remove(temporary_path)
+                result["status"] = "exists"
+            else:
+                os.makedirs(os.path.dirname(result["path"]), exist_ok=True)
+                os.replace(temporary_path, result["path"])
+                result["status"] = "downloaded"
+            temporary_path = None
+        except Exception as ex:
+            logger.debug("downloading {} failed : {}".format(url, ex))
+            result["error"] = str(ex)
+        finally:
+            if temporary_path is not None and os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            with self.__lock:
+                self.stats[result["status"]] += 1
+                self.stats["bytes"] += result["bytes"] if result["status"] == "downloaded" else 0
+        return result
+
+    def submit(self, post):
+        """starts downloading the post's images and videos, returns list of futures of their results"""
+        media = [(url, "image") for url in post.get("images") or []] + \
+                [(url, "video") for url in post.get("video") or []]
+        futures = []
+        started = []
+        with self.__lock:
+            for url, kind in media:
+                if not url:
+                    continue
+                if url not in self.__downloads:
+                    self.__downloads[url] = self.__executor.submit(self.__download, url, kind)
+                    started.append((url, self.__downloads[url]))
+                futures.append(self.__downloads[url])
+        # added once the lock is released, the callback runs right away if the download is done already
+        for url, future in started:
+            future.add_done_callback(lambda future, url=url: self.__forget(url, future))
+        return futures
+
+    def __forget(self, url, future):
+        """drops the finished download of url"""
+        with self.__lock:
+            if self.__downloads.get(url) is future:
+                del self.__downloads[url]
+
+    @staticmethod
+    def __completed(post_id, post, futures):
+        post["media"] = [future.result() for future in futures]
+        return post_id, post
+
+    def download_posts(self, posts):
+        """generator wrapping an iterable of (post ID, post) tuples, e.g Facebook_scraper.iter_posts, the media of every
+        post is downloaded in the background while the next posts are scraped. Posts are yielded in the same order
+        once their media are downloaded, the last ones are waited for at the end"""
+        pending = deque()
+        try:
+            for post_id, post in posts:
+                pending.append((post_id, post, self.submit(post)))
+                while pending and all(future.done() for future in pending[0][2]):
+                    yield self.__completed(*pending.popleft())
+            while pending:
+                yield self.__completed(*pending.popleft())
+        finally:
+            close = getattr(posts, "close", None)
+            if close is not None:
+                close()
+
+    def close(self):
+        """waits for the running downloads and closes the connections"""
+        self.__executor.shutdown(wait=True)
+        self.__http.clear()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+import json
+import logging
+import multiprocessing
+import multiprocessing.util
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .driver_pool import Driver_pool
+from .scraper import Facebook_scraper
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+# browser of the worker process, started by _init_worker and reused for every target the process scrapes
+_worker_pool = None
+
+
+def _init_worker(pool_options, worker_counter):
+    """starts the browser of a worker process, each process gets its own worker id so that with fast_startup
+    every browser has its own profile"""
+    global _worker_pool
+    with worker_counter.get_lock():
+        worker_id = worker_counter.value
+        worker_counter.value += 1
+    _worker_pool = Driver_pool(size=1, first_worker_id=worker_id, **pool_options)
+    # closes the browser when the process exits
+    multiprocessing.util.Finalize(_worker_pool, _worker_pool.close, exitpriority=10)
+
+
+def _scrape_target(target, scraper_options):
+    """scrapes one target in a worker process, returns its posts and phase timings"""
+    options = dict(scraper_options)
+    options.update({key: value for key, value in target.items()
+                    if key not in ("page_or_group_name", "minimum_timestamp", "single_post")})
+    scraper = Facebook_scraper(target["page_or_group_name"], driver_pool=_worker_pool, **options)
+    posts = scraper.scrap_to_json(target.get("minimum_timestamp"), target.get("single_post", False))
+    return json.loads(posts), scraper.phase_timings
+
+
+class Orchestrator:
+    """
+    Scrapes many pages and groups in parallel, across worker processes that each own a browser,
+    and streams the results back as the targets complete
+
+    targets are page or group names, or dictionaries holding "page_or_group_name" and any of the Facebook_scraper
+    arguments (posts_count, isGroup, ...) along with "minimum_timestamp" and "single_post"
+    """
+
+    def __init__(self, workers=2, retries=1, browser="chrome", proxy=None, headless=True, username=None, password=None,
+                 driver_install_config=None, remoteBrowser=None, fast_startup=False, cache_directory=None,
+                 session_store=None, max_jobs=50, **scraper_options):
+        self.workers = workers
+        # how many times a failed target is tried again
+        self.retries = retries
+        # every worker owns a Driver_pool of one browser, the login happens once per worker
+        self.pool_options = {
+            "browser": browser,
+            "proxy": proxy,
+            "headless": headless,
+            "username": username,
+            "password": password,
+            "driver_install_config": driver_install_config,
+            "remoteBrowser": remoteBrowser,
+            "fast_startup": fast_startup,
+            "cache_directory": cache_directory,
+            "session_store": session_store,
+            "max_jobs": max_jobs,
+        }
+        # default Facebook_scraper arguments of every target, e.g timeout or extraction_mode
+        self.scraper_options = scraper_options
+
+    @staticmethod
+    def __target(target):
+        """returns target as a dictionary"""
+        if isinstance(target, str):
+            return {"page_or_group_name": target}
+        if "page_or_group_name" not in target:
+            raise Exception("Target must have a page_or_group_name! got {}".format(target))
+        return dict(target)
+
+    def run(self, targets):
+        """expects list of targets, yields a result dictionary for every target as soon as it is completed:
+        target, status ("done" or "failed"), attempts, seconds, posts and error"""
+        targets = [self.__target(target) for target in targets]
+        if not targets:
+            return
+        worker_counter = multiprocessing.Value("i", 0)
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(targets)), initializer=_init_worker,
+                                 initargs=(self.pool_options, worker_counter)) as executor:
+            pending = {}
+
+            def submit(target, attempt, started):
+                future = executor.submit(_scrape_target, target, self.scraper_options)
+                pending[future] = (target, attempt, started)
+
+            for target in targets:
+                submit(target, 1, time.time())
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    target, attempt, started = pending.pop(future)
+                    try:
+                        posts, phase_timings = future.result()
+                    except Exception as ex:
+                        if attempt <= self.retries:
+                            logger.setLevel(logging.INFO)
+                            logger.info("Orchestrator: {} failed ({}), retrying".format(
+                                target["page_or_group_name"], ex))
+                            try:
+                                submit(target, attempt + 1, started)
+                                continue
+                            except Exception as submit_ex:
+                                # a worker process died, the executor can't take more work
+                                ex = submit_ex
+                        logger.exception("Error at orchestrator run : {}".format(ex))
+                        yield {"target": target, "status": "failed", "attempts": attempt,
+                               "seconds": time.time() - started, "posts": {}, "phase_timings": {}, "error": str(ex)}
+                        continue
+                    yield {"target": target, "status": "done", "attempts": attempt, "seconds": time.time() - started,
+                           "posts": posts, "phase_timings": phase_timings, "error": None}
+
+    def run_to_json(self, targets):
+        """expects list of targets, returns dictionary of the results keyed by page or group name"""
+        return {result["target"]["page_or_group_name"]: result for result in self.run(targets)}
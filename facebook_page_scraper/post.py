@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import json
+import sys
+from collections.abc import MutableMapping
+
+from .scraping_utilities import Scraping_utilities
+
+
+class Post(MutableMapping):
+    """
+    Compact record of one scraped post, every field in a slot and the reactions in a fixed-order tuple of counts
+    instead of nested dictionaries, so that holding many posts costs a fraction of the memory.
+
+    It reads and writes like the post dictionaries the scraper used to return, post["content"], post.get("reactions"),
+    dict(post)..., keys are only present once set, e.g the page only fields are never set for groups. Fields:
+    post_id, post_url, name, user_url (str), content (str), posted_on (ISO 8601 str), shares, comments, reaction_count
+    (int), reactions ({"likes": int, ...} read from reaction_vector), images, video (lists of URLs), error (str),
+    media (list, set by Media_downloader)
+    """
+
+    # keys of the post, in the order they are serialized
+    KEYS = ("name", "user_url", "content", "images", "post_id", "post_url", "error", "shares", "reactions",
+            "reaction_count", "comments", "posted_on", "video", "media")
+    # fields repeated across the posts of a feed, stored once
+    INTERNED_KEYS = ("name", "user_url")
+    # order of the counts in reaction_vector
+    REACTION_KEYS = tuple(key for key, _ in Scraping_utilities.REACTION_LABELS)
+
+    __slots__ = ("name", "user_url", "content", "images", "post_id", "post_url", "error", "shares", "reaction_vector",
+                 "reaction_count", "comments", "posted_on", "video", "media")
+
+    def __init__(self, **fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        try:
+            if key == "reactions":
+                vector = self.reaction_vector
+                return None if vector is None else dict(zip(self.REACTION_KEYS, vector))
+            if key in self.KEYS:
+                return getattr(self, key)
+        except AttributeError:
+            pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "reactions":
+            self.reaction_vector = None if value is None else tuple(value.get(name, 0) for name in self.REACTION_KEYS)
+        elif key in self.INTERNED_KEYS and isinstance(value, str):
+            setattr(self, key, sys.intern(value))
+        elif key in self.KEYS:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        try:
+            delattr(self, "reaction_vector" if key == "reactions" else key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.KEYS and hasattr(self, "reaction_vector" if key == "reactions" else key)
+
+    def __iter__(self):
+        return (key for key in self.KEYS if key in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return "Post({})".format(self.to_dict())
+
+    def to_dict(self):
+        """returns the post as a dictionary, the reactions as a nested dictionary"""
+        return {key: self[key] for key in self}
+
+    def to_json(self, **options):
+        return json.dumps(self.to_dict(), ensure_ascii=False, **options)
+
+    @staticmethod
+    def json_default(value):
+        """default of json.dumps, serializes the posts nested in the dumped object"""
+        if isinstance(value, Post):
+            return value.to_dict()
+        raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Post_index:
+    """
+    Persistent index, in SQLite, of the posts already scraped per page or group, so that re-scrapes skip them
+    before the expensive steps and stop once they reach the posts scraped by the previous run
+
+    a post is indexed under its status ID only, the post_id of a photo post is its album, shared by other posts
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "facebook_page_scraper", "post_index.sqlite3")
+
+    def __init__(self, path=None):
+        self.path = path or self.DEFAULT_PATH
+        self.__open()
+
+    def __getstate__(self):
+        # only the path is sent to other processes, e.g Orchestrator's workers, they open their own connection
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.__open()
+
+    def __open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # one connection shared by the threads of the process, e.g Async_facebook_scraper ones
+        self.__lock = threading.Lock()
+        # waits for the other processes writing to the same index instead of failing right away
+        self.__connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                " page TEXT NOT NULL, post_key TEXT NOT NULL, posted_on TEXT,"
+                " first_seen REAL NOT NULL, last_seen REAL NOT NULL,"
+                " PRIMARY KEY (page, post_key))")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def __keys(keys):
+        return [str(key) for key in keys if key and key != "NA"]
+
+    def contains(self, page, keys):
+        """returns True if any of the post's keys was indexed for page"""
+        keys = self.__keys(keys)
+        if not keys:
+            return False
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT 1 FROM posts WHERE page = ? AND post_key IN ({}) LIMIT 1".format(",".join("?" * len(keys))),
+                [page] + keys).fetchone()
+        return row is not None
+
+    def add(self, page, keys, posted_on=None):
+        """indexes the post under all of its keys, or updates when it was last seen"""
+        now = time.time()
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT INTO posts (page, post_key, posted_on, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (page, post_key) DO UPDATE SET last_seen = excluded.last_seen,"
+                " posted_on = COALESCE(excluded.posted_on, posted_on)",
+                [(page, key, posted_on, now, now) for key in self.__keys(keys)])
+
+    def touch(self, page, keys):
+        """updates when the known post was last seen"""
+        keys = self.__keys(keys)
+        if not keys:
+            return
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "UPDATE posts SET last_seen = ? WHERE page = ? AND post_key IN ({})".format(",".join("?" * len(keys))),
+                [time.time(), page] + keys)
+
+    def last_seen(self, page):
+        """returns time the page was last scraped, None if it never was"""
+        with self.__lock:
+            return self.__connection.execute("SELECT MAX(last_seen) FROM posts WHERE page = ?", (page,)).fetchone()[0]
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
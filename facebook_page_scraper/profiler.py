@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Driver_profiler:
+    """
+    Counts every WebDriver command of a driver and its latency, and attributes it to the Finder/Utilities method
+    that issued it and to the post being processed at that time
+    """
+
+    # modules whose methods the commands are attributed to, with the name of the class they hold
+    ATTRIBUTED_MODULES = {
+        "element_finder.py": "Finder",
+        "driver_utilities.py": "Utilities",
+        "scraping_utilities.py": "Scraping_utilities",
+        "script_extractor.py": "Script_extractor",
+        "html_parser.py": "Html_parser",
+        "waits.py": "Waits",
+        "feed_cursor.py": "Feed_cursor",
+        "filters.py": "Post_filter",
+        "graphql_parser.py": "Graphql_parser",
+        "scraper.py": "Facebook_scraper",
+    }
+    PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+    NO_POST = "(outside of posts)"
+
+    def __init__(self):
+        self.current_post = None
+        self.__lock = threading.Lock()
+        # every stat is a list of [commands count, seconds]
+        self.__commands = {}
+        self.__methods = {}
+        self.__posts = {}
+
+    def wrap(self, driver):
+        """expects driver's instance, routes all of its commands through the profiler and returns it.
+        WebElement and ActionChains commands all go through driver.execute, so they are counted as well"""
+        execute = driver.execute
+        profiler = self
+
+        def profiled_execute(driver_command, params=None):
+            method = profiler.__caller()
+            started = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                profiler.__record(driver_command, method, time.perf_counter() - started)
+
+        profiled_execute.original_execute = execute
+        driver.execute = profiled_execute
+        return driver
+
+    @staticmethod
+    def unwrap(driver):
+        """stops profiling the driver, e.g before giving it back to a Driver_pool"""
+        original_execute = getattr(driver.execute, "original_execute", None)
+        if original_execute is not None:
+            driver.execute = original_execute
+
+    def __caller(self):
+        """returns name of the closest package method in the stack, preferring the Finder/Utilities ones over
+        the scraper loop that called them"""
+        frame = sys._getframe(2)
+        fallback = None
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if os.path.dirname(os.path.abspath(filename)) == self.PACKAGE_DIRECTORY:
+                module = os.path.basename(filename)
+                if module in self.ATTRIBUTED_MODULES:
+                    name = "{}.{}".format(self.ATTRIBUTED_MODULES[module], frame.f_code.co_name)
+                    if module != "scraper.py":
+                        return name
+                    fallback = fallback or name
+            frame = frame.f_back
+        return fallback or "(outside of the scraper)"
+
+    def __record(self, driver_command, method, seconds):
+        post = self.current_post if self.current_post is not None else self.NO_POST
+        with self.__lock:
+            for stats, key in ((self.__commands, driver_command), (self.__methods, method), (self.__posts, post)):
+                stat = stats.setdefault(key, [0, 0.0])
+                stat[0] += 1
+                stat[1] += seconds
+
+    def start_post(self, key):
+        """attributes the next commands to the post key, None for the commands made outside of any post"""
+        with self.__lock:
+            self.current_post = key
+            if key is not None:
+                self.__posts.setdefault(key, [0, 0.0])
+
+    def rename_current_post(self, key):
+        """gives the post being processed its final key, e.g its ID once __find_status found it"""
+        with self.__lock:
+            if self.current_post in self.__posts:
+                stat = self.__posts.pop(self.current_post)
+                merged = self.__posts.setdefault(key, [0, 0.0])
+                merged[0] += stat[0]
+                merged[1] += stat[1]
+            self.current_post = key
+
+    @staticmethod
+    def __rows(stats, key_name, limit=None):
+        rows = [{key_name: key, "commands": stat[0], "seconds": stat[1]}
+                for key, stat in sorted(stats.items(), key=lambda item: item[1][1], reverse=True)]
+        return rows[:limit] if limit else rows
+
+    def report(self, slowest_posts=10):
+        """returns dictionary holding the profile: commands per post, time per method and command, and slowest posts"""
+        with self.__lock:
+            posts = {key: stat for key, stat in self.__posts.items() if key != self.NO_POST}
+            commands = sum(stat[0] for stat in self.__commands.values())
+            return {
+                "commands": commands,
+                "seconds": sum(stat[1] for stat in self.__commands.values()),
+                "posts": len(posts),
+                # all commands of the run, page load and scrolling included, so every extraction mode compares fairly
+                "commands_per_post": commands / len(posts) if posts else None,
+                "commands_outside_posts": self.__posts.get(self.NO_POST, [0, 0.0])[0],
+                "by_command": self.__rows(self.__commands, "command"),
+                "by_method": self.__rows(self.__methods, "method"),
+                "slowest_posts": self.__rows(posts, "post", slowest_posts),
+            }
+
+    def log_report(self, slowest_posts=10):
+        """logs the profile and returns it"""
+        profile = self.report(slowest_posts)
+        logger.setLevel(logging.INFO)
+        lines = ["WebDriver profile: {} commands in {:.1f}s, {} posts, {} commands per post".format(
+            profile["commands"], profile["seconds"], profile["posts"],
+            "-" if profile["commands_per_post"] is None else "{:.1f}".format(profile["commands_per_post"]))]
+        lines.append("time per method:")
+        lines.extend("  {:<60} {:>6} commands {:>9.2f}s".format(row["method"], row["commands"], row["seconds"])
+                     for row in profile["by_method"])
+        lines.append("slowest posts:")
+        lines.extend("  {:<60} {:>6} commands {:>9.2f}s".format(str(row["post"]), row["commands"], row["seconds"])
+                     for row in profile["slowest_posts"])
+        logger.info("\n".join(lines))
+        return profile
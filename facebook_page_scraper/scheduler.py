@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from .orchestrator import Orchestrator
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Scheduler:
+    """
+    Polls many pages and groups at a pace learned from each one's posting rate, instead of a fixed interval.
+
+    After every poll the rate, in posts per hour, is updated (exponentially weighted with alpha) from the posted_on of
+    the posts published since the previous poll. The next poll is planned once posts_per_poll new posts are expected,
+    between min_interval and max_interval seconds later, targets whose posts have no date are polled every
+    default_interval seconds. Every poll passes minimum_timestamp, the newest post seen minus overlap seconds, so the
+    scraper stops at the first post older than it and only walks the new posts, and a posts_count sized for the
+    posts expected.
+
+    Due targets are packed onto the free browsers, the ones with the most expected new posts first, within
+    budget_minutes_per_hour browser minutes in any hour (every browser counted) when given. What the targets are
+    learned is kept in the JSON file state_path, when given, across runs.
+
+    targets are page or group names, or dictionaries holding "page_or_group_name" and job options, like for
+    Orchestrator
+    """
+
+    # browser seconds expected from a target never polled
+    DEFAULT_POLL_SECONDS = 120
+
+    def __init__(self, targets=(), budget_minutes_per_hour=None, posts_per_poll=5, min_interval=15 * 60,
+                 max_interval=24 * 3600, default_interval=3600, initial_window=24 * 3600, overlap=3600,
+                 max_posts=200, alpha=0.3, state_path=None):
+        self.budget_minutes_per_hour = budget_minutes_per_hour
+        self.posts_per_poll = posts_per_poll
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        # how far back the first poll of a target goes
+        self.initial_window = initial_window
+        self.overlap = overlap
+        self.max_posts = max_posts
+        self.alpha = alpha
+        self.state_path = state_path
+        # per target: target, rate (posts per hour), newest_post (timestamp), last_poll, next_poll, poll_seconds
+        # (browser seconds per poll), failures, and while it runs: running, posts_count, minimum_timestamp
+        self.__states = self.__load_states()
+        # (end, browser seconds) of the polls of the last hour, for the budget
+        self.__spent = deque()
+        self.__lock = threading.Lock()
+        for target in targets:
+            self.add(target)
+
+    def __load_states(self):
+        if self.state_path is None:
+            return {}
+        try:
+            with open(self.state_path, encoding="utf-8") as state_file:
+                states = json.load(state_file)
+        except (OSError, ValueError):
+            return {}
+        for state in states.values():
+            state["running"] = False
+        return states
+
+    def __save_states(self):
+        if self.state_path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".json")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as state_file:
+            json.dump(self.__states, state_file, indent=2)
+        os.replace(temporary_path, self.state_path)
+
+    def add(self, target):
+        """adds the target, due right away unless it was polled before, or updates its job options"""
+        target = Orchestrator._Orchestrator__target(target)
+        with self.__lock:
+            state = self.__states.setdefault(target["page_or_group_name"], {
+                "rate": None, "newest_post": None, "last_poll": None, "next_poll": 0, "poll_seconds": None,
+                "failures": 0, "running": False})
+            state["target"] = target
+
+    def state(self, name):
+        """returns a copy of what was learned about the target"""
+        with self.__lock:
+            return dict(self.__states[name])
+
+    @staticmethod
+    def __timestamp(posted_on):
+        try:
+            return datetime.fromisoformat(posted_on).timestamp() if posted_on else None
+        except (TypeError, ValueError):
+            return None
+
+    def __interval(self, state):
+        """returns seconds until posts_per_poll new posts are expected"""
+        if state["rate"] is None:
+            return self.default_interval
+        if state["rate"] <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.posts_per_poll / state["rate"] * 3600))
+
+    def __expected_posts(self, state, now):
+        """returns number of posts expected to be published since the last poll"""
+        if state["last_poll"] is None:
+            return math.inf
+        return (state["rate"] or 0) * (now - state["last_poll"]) / 3600
+
+    def __spent_seconds(self, now):
+        """returns browser seconds spent in the last hour, forgetting the older polls"""
+        while self.__spent and self.__spent[0][0] < now - 3600:
+            self.__spent.popleft()
+        return sum(seconds for _, seconds in self.__spent)
+
+    def __poll_seconds(self, state):
+        return state["poll_seconds"] if state["poll_seconds"] is not None else self.DEFAULT_POLL_SECONDS
+
+    def plan(self, slots, now=None):
+        """returns up to slots [(target, priority)] due now and within the budget, the target dictionary holds
+        posts_count and minimum_timestamp for the scraper. The targets are marked running until record() or failed()"""
+        now = time.time() if now is None else now
+        with self.__lock:
+            due = [state for state in self.__states.values() if not state["running"] and state["next_poll"] <= now]
+            due.sort(key=lambda state: -self.__expected_posts(state, now))
+            # polls already running take their expected time out of the budget
+            committed = self.__spent_seconds(now) + sum(
+                self.__poll_seconds(state) for state in self.__states.values() if state["running"])
+            planned = []
+            for state in due:
+                if len(planned) >= slots:
+                    break
+                if self.budget_minutes_per_hour is not None and \
+                        committed + self.__poll_seconds(state) > self.budget_minutes_per_hour * 60:
+                    continue
+                committed += self.__poll_seconds(state)
+                planned.append((self.__job(state, now), self.__expected_posts(state, now)))
+        return [(target, int(min(expected, 10 ** 6))) for target, expected in planned]
+
+    def __job(self, state, now):
+        """marks the target running and returns its job"""
+        if state["newest_post"] is None:
+            minimum_timestamp = int(now - self.initial_window)
+        else:
+            minimum_timestamp = int(state["newest_post"] - self.overlap)
+        expected = self.__expected_posts(state, now)
+        posts_count = self.max_posts if math.isinf(expected) else int(expected * 1.5) + self.posts_per_poll
+        state.update(running=True, minimum_timestamp=minimum_timestamp,
+                     posts_count=min(self.max_posts, max(self.posts_per_poll, posts_count)))
+        return dict(state["target"], posts_count=state["posts_count"], minimum_timestamp=minimum_timestamp)
+
+    def record(self, name, posts, seconds, now=None):
+        """learns from a poll of the target, posts being its (post ID, post) tuples and seconds the browser time it
+        took, and plans its next poll. Returns the posts per hour observed, None if no post had a date"""
+        now = time.time() if now is None else now
+        with self.__lock:
+            state = self.__states[name]
+            timestamps = [timestamp for timestamp in (self.__timestamp(post.get("posted_on")) for _, post in posts)
+                          if timestamp is not None]
+            # posts published since the previous poll, or in the window of the first one
+            period_start = state["last_poll"] if state["last_poll"] is not None \
+                else state.get("minimum_timestamp", now - self.initial_window)
+            new_posts = [timestamp for timestamp in timestamps
+                         if timestamp > max(period_start, state["newest_post"] or period_start)]
+            # the poll stopped at posts_count before reaching the start of the period
+            if len(posts) >= state.get("posts_count", self.max_posts) and new_posts:
+                period_start = max(period_start, min(new_posts))
+            observed = None
+            if timestamps:
+                observed = len(new_posts) / max((now - period_start) / 3600, 1 / 60)
+                state["rate"] = observed if state["rate"] is None \
+                    else self.alpha * observed + (1 - self.alpha) * state["rate"]
+                state["newest_post"] = max(timestamps + [state["newest_post"] or 0])
+            state["poll_seconds"] = seconds if state["poll_seconds"] is None \
+                else self.alpha * seconds + (1 - self.alpha) * state["poll_seconds"]
+            state.update(running=False, failures=0, last_poll=now, next_poll=now + self.__interval(state))
+            self.__spent.append((now, seconds))
+            self.__save_states()
+        logger.setLevel(logging.INFO)
+        logger.info("Scheduler: {} posts {:.2f}/h, next poll in {:.0f} min".format(
+            name, state["rate"] or 0, (state["next_poll"] - now) / 60))
+        return observed
+
+    def failed(self, name, seconds, now=None):
+        """plans the next poll of a target whose poll failed, backing off after every failure in a row"""
+        now = time.time() if now is None else now
+        with self.__lock:
+            state = self.__states[name]
+            state["failures"] += 1
+            retry = min(self.max_interval, self.min_interval * 2 ** (state["failures"] - 1))
+            state.update(running=False, next_poll=now + retry)
+            self.__spent.append((now, seconds))
+            self.__save_states()
+
+    def next_due(self):
+        """returns time of the earliest planned poll, None if every target is running"""
+        with self.__lock:
+            polls = [state["next_poll"] for state in self.__states.values() if not state["running"]]
+        return min(polls) if polls else None
+
+    def run(self, service, stop_event=None, callback=None, check_interval=5):
+        """polls the targets on the workers of service, a Scrape_service (see facebook_page_scraper.serve), until
+        stop_event is set. callback(name, job) is called with every finished Scrape_job"""
+        stop_event = stop_event or threading.Event()
+        running = {}
+        while not stop_event.is_set():
+            for job_id, (name, job) in list(running.items()):
+                if not job.finished:
+                    continue
+                del running[job_id]
+                seconds = job.finished_at - job.started_at if job.started_at else 0.0
+                if job.status == "done":
+                    self.record(name, job.posts, seconds, now=job.finished_at)
+                else:
+                    self.failed(name, seconds, now=job.finished_at)
+                if callback is not None:
+                    callback(name, job)
+            for target, priority in self.plan(service.workers - len(running)):
+                try:
+                    job = service.submit(target, priority)
+                except Exception as ex:
+                    logger.exception("Error at scheduler run : {}".format(ex))
+                    self.failed(target["page_or_group_name"], 0.0)
+                    continue
+                running[job.id] = (target["page_or_group_name"], job)
+            stop_event.wait(check_interval)
+        for _, job in running.values():
+            job.cancel()
@@ -3,14 +3,25 @@ import csv
 import json
 import logging
 import os
+import re
 import time
 from datetime import datetime
+from urllib.parse import urlparse
 
-import ciso8601
+from dateutil.parser import parse
 
 from .driver_initialization import Initializer
 from .driver_utilities import Utilities
+from .feed_cursor import Feed_cursor
+from .filters import Time_window
 from .element_finder import Finder
+from .html_parser import Html_parser
+from .post import Post
+from .profiler import Driver_profiler
+from .graphql_parser import Graphql_parser
+from .session_store import Session_store
+from .sinks import Csv_sink, Jsonl_sink, Parquet_sink, Sqlite_sink
+from .script_extractor import Script_extractor
 from .scraping_utilities import Scraping_utilities
 
 logger = logging.getLogger(__name__)
@@ -41,8 +52,47 @@ class Facebook_scraper:
     # on each iteration __close_after_retry is called to check if retry have turned to 0
     # if it returns true,it will break the loop. After coming out of loop,driver will be closed and it will return post whatever was found
 
+    # "webdriver" runs every Finder method against the live elements of each post,
+    # "script" extracts every field of a batch of posts inside the browser with one execute_script call,
+    # "html" takes one HTML snapshot of the new posts and parses it with lxml, the browser is only used to scroll
+    # "network" parses the posts out of the graphql responses the page fetches, captured with selenium-wire,
+    # the DOM is only used when nothing could be captured
+    EXTRACTION_MODES = ("webdriver", "script", "html", "network")
+    # "fast" lists the images of a post from the page, and the hidden "+N" ones from one fetch of its photo set,
+    # the photo viewer is only walked when this fails. "carousel" always walks the photo viewer
+    IMAGE_STRATEGIES = ("fast", "carousel")
+    # fields of the posts, the ones that aren't passed in fields are neither extracted nor returned
+    FIELDS = ("name", "user_url", "content", "images", "post_id", "post_url", "error", "shares", "reactions",
+              "reaction_count", "comments", "posted_on", "video")
+    # extraction steps of the webdriver mode: (step, fields it gives, relative cost), from the cheapest one
+    # to the hover of the time link and the photo viewer
+    STEPS = (
+        ("name", ("name", "user_url"), 1),
+        ("content", ("content",), 2),
+        ("shares", ("shares",), 2),
+        ("comments", ("comments",), 2),
+        ("video", ("video",), 2),
+        ("reactions", ("reactions", "reaction_count"), 3),
+        ("posted_on", ("posted_on",), 5),
+        ("images", ("images", "post_id", "error"), 8),
+    )
+    # steps needing the post's time link, found by Finder's find_status which scrolls to the post and hovers the link,
+    # the steps before them and their filters run without it, so that a post they reject is never hovered
+    STATUS_STEPS = ("posted_on", "images")
+    # steps that haven't been tested for groups, their fields are left out of the group's posts
+    PAGE_ONLY_STEPS = ("shares", "comments", "video", "reactions", "posted_on")
+
     def __init__(self, page_or_group_name, posts_count=10, browser="chrome", proxy=None,
-                 timeout=600, headless=True, isGroup=False, username=None, password=None, driver_install_config=None, remoteBrowser=None):
+                 timeout=600, headless=True, isGroup=False, username=None, password=None, driver_install_config=None, remoteBrowser=None,
+                 extraction_mode="webdriver", profile=False, driver_pool=None, fast_startup=False, cache_directory=None,
+                 worker_id=0, session_store=None, post_callback=None, post_index=None, stop_after_known=5,
+                 wait_jitter=None, image_strategy="fast", media_downloader=None, fields=None, filters=None):
+        if extraction_mode not in self.EXTRACTION_MODES:
+            raise Exception("Extraction mode not supported! expected one of {}".format(self.EXTRACTION_MODES))
+        if image_strategy not in self.IMAGE_STRATEGIES:
+            raise Exception("Image strategy not supported! expected one of {}".format(self.IMAGE_STRATEGIES))
+        if fields is not None and not set(fields) <= set(self.FIELDS):
+            raise Exception("Fields not supported! expected some of {}".format(self.FIELDS))
         self.page_or_group_name = page_or_group_name
         self.posts_count = int(posts_count)
         #self.URL = "https://en-gb.facebook.com/pg/{}/posts".format(self.page_or_group_name)
@@ -58,16 +108,105 @@ class Facebook_scraper:
         self.password = password
         self.driver_install_config = driver_install_config
         self.remoteBrowser = remoteBrowser
-        self.__data_dict = {}  # this dictionary stores all post's data
-        # __extracted_post contains all the post's ID that have been scraped before and as it set() it avoids post's ID duplication.
-        self.__extracted_post = set()
-        self.previous_post_length = 0
+        self.extraction_mode = extraction_mode
+        # when profiling, every WebDriver command is counted and timed, see Driver_profiler
+        self.profiler = Driver_profiler() if profile else None
+        self.profile = None
+        # when given, the browser is borrowed from this Driver_pool and given back after the job instead of being closed
+        self.driver_pool = driver_pool
+        # with fast_startup the driver binary is cached and the browser keeps a persistent profile, see Initializer
+        self.fast_startup = fast_startup
+        self.cache_directory = cache_directory
+        self.worker_id = worker_id
+        # when given, the login session is saved to and restored from this Session_store instead of logging in every run
+        self.session_store = session_store
+        # called with the post's ID and data as soon as a post is scraped, e.g to forward it before the run ends
+        self.post_callback = post_callback
+        # when given, posts already in this Post_index are skipped before their expensive steps, and the scroll
+        # stops after stop_after_known known posts in a row, as the rest of the feed was scraped before
+        self.post_index = post_index
+        self.stop_after_known = stop_after_known
+        # (minimum, maximum) seconds of random delay added after every wait for the page, see Waits
+        self.wait_jitter = wait_jitter
+        self.image_strategy = image_strategy
+        # when given, the images and videos of the posts are downloaded by this Media_downloader while scrolling
+        self.media_downloader = media_downloader
+        # when given, only these fields are extracted, e.g ["post_id", "post_url", "posted_on", "content"]
+        self.fields = None if fields is None else tuple(fields)
+        # Post_filter instances, posts they reject are dropped before their remaining extraction steps, see filters.py
+        self.filters = list(filters or [])
+        # filters and extraction steps of the running iter_posts
+        self.__filters = []
+        self.__steps = []
+        self.__known_in_row = 0
+        # whether the driver captures the network, and number of posts captured, for the network mode
+        self.__network_capture = False
+        self.__network_posts = 0
+        # set by stop(), from another thread, to end the run after the current post
+        self.__stopped = False
+        self.__data_dict = {}  # this dictionary stores all post's data, once scrap_to_json is done
+        # number of the posts found by the running iter_posts, and IDs of the posts it must skip
+        self.__posts_found = 0
+        self.__skip_posts = set()
+        # position in the feed of the running iter_posts, hands over the new posts after every scroll, see Feed_cursor
+        self.__cursor = None
+        # highest aria-posinset loaded in the feed so far, None for the old layout
+        self.feed_position = None
+        # number of scrolls in a row that loaded no new post
         self.infinite_loop_counter = 0
+        # seconds spent in every phase of the last scrap_to_json call, e.g {"start_driver": 4.2, "load_page": 7.9, ...}
+        # and "time_to_first_post", seconds from the call until the first post was scraped
+        self.phase_timings = {}
+        self.__scrap_start = None
 
     def __start_driver(self):
         """changes the class member __driver value to driver on call"""
-        self.__driver = Initializer(
-            self.browser, self.proxy, self.headless).init(self.driver_install_config, remoteBrowser=self.remoteBrowser)
+        if self.driver_pool is not None:
+            self.__driver = self.driver_pool.borrow()
+        else:
+            self.__driver = Initializer(
+                self.browser, self.proxy, self.headless, fast_startup=self.fast_startup,
+                cache_directory=self.cache_directory, worker_id=self.worker_id).init(
+                self.driver_install_config, remoteBrowser=self.remoteBrowser)
+        self.__driver.wait_jitter = self.wait_jitter
+        if self.extraction_mode == "network":
+            self.__start_network_capture()
+        if self.profiler is not None:
+            self.profiler.wrap(self.__driver)
+
+    def __start_network_capture(self):
+        """restricts selenium-wire's capture to the page and its graphql requests, the network mode reads posts from them"""
+        self.__network_posts = 0
+        # IDs of the captured requests already read
+        self.__network_requests = set()
+        self.__network_capture = hasattr(self.__driver, "requests")
+        if not self.__network_capture:
+            logger.setLevel(logging.INFO)
+            logger.info("Network capture needs a selenium-wire driver (remote browsers aren't), falling back to the DOM")
+            return
+        self.__driver.scopes = [r".*{}.*".format(re.escape(Graphql_parser.GRAPHQL_PATH)),
+                                r".*{}/?(\?.*)?$".format(re.escape(urlparse(self.URL).path.rstrip("/")))]
+        del self.__driver.requests
+
+    def __close_driver(self):
+        """closes the browser, or gives it back to the driver pool it was borrowed from"""
+        if self.extraction_mode == "network" and self.__network_capture:
+            self.__driver.scopes = []
+        if self.profiler is not None:
+            self.profiler.unwrap(self.__driver)
+        if self.driver_pool is not None:
+            self.driver_pool.release(self.__driver)
+        else:
+            Utilities._Utilities__close_driver(self.__driver)
+
+    def __profile_post(self, key, rename=False):
+        """attributes the next WebDriver commands to the post key, or gives the current post its final key, when profiling"""
+        if self.profiler is None:
+            return
+        if rename:
+            self.profiler.rename_current_post(key)
+        else:
+            self.profiler.start_post(key)
 
     def __handle_popup(self, layout, close_regular_signup_modal = True):
         # while scrolling, wait for login popup to show, it can be skipped by clicking "Not Now" button
@@ -89,115 +228,354 @@ class Facebook_scraper:
     def __check_timeout(self, start_time, current_time):
         return (current_time-start_time) > self.timeout
 
-    def scrap_to_json(self, minimum_timestamp = None, single_post = False):
+    def __end_phase(self, phase, phase_start):
+        """records the time spent in phase since phase_start and returns the current time, as start of the next phase"""
+        now = time.time()
+        self.phase_timings[phase] = now - phase_start
+        return now
+
+    def __post_stored(self, status, post):
+        """counts the post, records time to first post once the first post of the run is found, and hands the post to post_callback"""
+        self.__posts_found += 1
+        if self.post_index is not None:
+            self.post_index.add(self.page_or_group_name, [status], post.get("posted_on"))
+            self.__known_in_row = 0
+        if "time_to_first_post" not in self.phase_timings:
+            self.phase_timings["time_to_first_post"] = time.time() - self.__scrap_start
+            logger.setLevel(logging.INFO)
+            logger.info("Time to first post: {:.1f}s".format(self.phase_timings["time_to_first_post"]))
+        if self.post_callback is not None:
+            self.post_callback(status, post)
+
+    def __known_post(self, keys):
+        """returns True if the post is in post_index, and counts the known posts met in a row"""
+        if self.post_index is None or not self.post_index.contains(self.page_or_group_name, keys):
+            return False
+        self.post_index.touch(self.page_or_group_name, keys)
+        self.__known_in_row += 1
+        return True
+
+    def __reached_known_posts(self):
+        """returns True once stop_after_known known posts were met in a row"""
+        if self.__known_in_row < self.stop_after_known:
+            return False
+        logger.setLevel(logging.INFO)
+        logger.info("Found {} posts scraped before in a row, stopping".format(self.__known_in_row))
+        return True
+
+    def stop(self):
+        """asks a running scrap_to_json to stop after the current post, it closes the browser and returns the posts
+        scraped so far. Safe to call from another thread"""
+        self.__stopped = True
+
+    def __log_in(self, restored):
+        """keeps the restored session if it is still valid, else logs in with the login form and saves the new session"""
+        if restored and Session_store.is_logged_in(self.__driver):
+            return
+        if restored:
+            logger.setLevel(logging.INFO)
+            logger.info("Saved session expired, logging in")
+            self.session_store.invalidate(self.username)
+        Finder._Finder__login(self.__driver, self.username, self.password)
+        if self.session_store is not None:
+            self.session_store.save(self.__driver, self.username)
+
+    def iter_posts(self, minimum_timestamp = None, single_post = False, skip_posts = None):
+        """generator of (post ID, post) tuples, every post is yielded as soon as it is scraped, so it can be written or
+        forwarded without waiting for the end of the run. Stops once posts_count posts were yielded, closing the
+        generator early closes the browser as well. Posts whose ID is in skip_posts are neither extracted nor counted.
+        With a media_downloader, posts are yielded once their media are downloaded, with their "media" field"""
+        # a stop() of the previous run doesn't end this one, a stop() sent once the generator is returned does,
+        # even before its first post is asked for
+        self.__stopped = False
+        posts = self.__iter_posts(minimum_timestamp, single_post, skip_posts)
+        if self.media_downloader is not None:
+            return self.media_downloader.download_posts(posts)
+        return posts
+
+    def __iter_posts(self, minimum_timestamp, single_post, skip_posts):
+        self.phase_timings = {}
+        if self.profiler is not None:
+            # every run is profiled on its own, a scraper run twice doesn't add up both runs
+            self.profiler = Driver_profiler()
+            self.profile = None
+        self.__posts_found = 0
+        self.__skip_posts = set(skip_posts or ())
+        # minimum_timestamp is a time window without upper bound, it stops the scroll at the first older post
+        self.__filters = self.filters + ([Time_window(since=minimum_timestamp)] if minimum_timestamp else [])
+        self.__steps = self.__plan_steps()
+        self.infinite_loop_counter = 0
+        self.__known_in_row = 0
+        self.feed_position = None
+        phase_start = self.__scrap_start = time.time()
         # call the __start_driver and override class member __driver to webdriver's instance
         self.__start_driver()
-        starting_time = time.time()
-        # navigate to URL
-        self.__driver.get(self.URL)
-        #set window size
-        self.__driver.set_window_size(1920, 1080)
-        # only login if username is provided
-        self.username is not None and Finder._Finder__login(self.__driver, self.username, self.password)
-        Finder._Finder__accept_cookies(self.__driver)
-        self.__layout = Finder._Finder__detect_ui(self.__driver)
-        # sometimes we get popup that says "your request couldn't be processed", however
-        # posts are loading in background if popup is closed, so call this method in case if it pops up.
-        Utilities._Utilities__close_error_popup(self.__driver)
-        # wait for post to load
-        elements_have_loaded = Utilities._Utilities__wait_for_element_to_appear(
-            self.__driver, self.__layout, self.timeout)
-        # scroll down to bottom most
-        Utilities._Utilities__scroll_down(self.__driver, self.__layout)
-        self.__handle_popup(self.__layout, close_regular_signup_modal=not single_post)
-        # timestamp limitation for scraping posts
-        timestamp_edge_hit = False
-        while (not timestamp_edge_hit) and (len(self.__data_dict) < self.posts_count) and elements_have_loaded:
+        starting_time = phase_start = self.__end_phase("start_driver", phase_start)
+        try:
+            # only login if username is provided, and if the pooled browser isn't logged in already
+            pool_logged_in = self.driver_pool is not None and self.driver_pool.logged_in
+            must_log_in = self.username is not None and not pool_logged_in
+            # a saved session is restored before the page loads, so the page is loaded logged in straight away
+            restored = must_log_in and self.session_store is not None and self.session_store.restore(self.__driver, self.username)
+            # navigate to URL
+            self.__driver.get(self.URL)
+            #set window size
+            self.__driver.set_window_size(1920, 1080)
+            must_log_in and self.__log_in(restored)
+            Finder._Finder__accept_cookies(self.__driver)
+            # a warm browser of the pool knows its layout from its previous jobs
+            self.__layout = self.driver_pool.layout(self.__driver) if self.driver_pool is not None else None
+            if self.__layout is None:
+                self.__layout = Finder._Finder__detect_ui(self.__driver)
+                if self.driver_pool is not None:
+                    self.driver_pool.remember_layout(self.__driver, self.__layout)
+            self.__cursor = Feed_cursor(self.__driver, self.__layout, self.isGroup)
+            # sometimes we get popup that says "your request couldn't be processed", however
+            # posts are loading in background if popup is closed, so call this method in case if it pops up.
+            Utilities._Utilities__close_error_popup(self.__driver)
+            # wait for post to load
+            elements_have_loaded = Utilities._Utilities__wait_for_element_to_appear(
+                self.__driver, self.__layout, self.timeout)
+            phase_start = self.__end_phase("load_page", phase_start)
+            # scroll down to bottom most
+            Utilities._Utilities__scroll_down(self.__driver, self.__layout)
             self.__handle_popup(self.__layout, close_regular_signup_modal=not single_post)
-            # self.__find_elements(name)
-            timestamp_edge_hit = self.__find_elements(minimum_timestamp, single_post)
-            current_time = time.time()
-            if self.__check_timeout(starting_time, current_time) is True:
-                logger.setLevel(logging.INFO)
-                logger.info('Timeout...')
-                break
-            Utilities._Utilities__scroll_down(
-                self.__driver, self.__layout)  # scroll down
-        # close the browser window after job is done.
-        Utilities._Utilities__close_driver(self.__driver)
-        # dict trimming, might happen that we find more posts than it was asked, so just trim it
-        self.__data_dict = dict(list(self.__data_dict.items())[
-                                0:int(self.posts_count)])
-
-        return json.dumps(self.__data_dict, ensure_ascii=False)
-
-    def __json_to_csv(self, filename, json_data, directory):
-
-        os.chdir(directory)  # change working directory to given directory
-        # headers of the CSV file
-        fieldnames = ['id', 'name', 'shares', 'likes', 'loves', 'wow', 'cares', 'sad', 'angry', 'haha', 'reactions_count', 'comments',
-                      'content', 'posted_on', 'video', 'images', 'post_url']
+            # timestamp limitation for scraping posts
+            timestamp_edge_hit = False
+            while (not timestamp_edge_hit) and (self.__posts_found < self.posts_count) and elements_have_loaded and not self.__stopped:
+                self.__handle_popup(self.__layout, close_regular_signup_modal=not single_post)
+                # posts are handed to the caller while they are found, the return value tells if the scroll must stop
+                timestamp_edge_hit = yield from self.__find_elements(single_post)
+                self.__profile_post(None)
+                self.feed_position = self.__cursor.position
+                current_time = time.time()
+                if self.__check_timeout(starting_time, current_time) is True:
+                    logger.setLevel(logging.INFO)
+                    logger.info('Timeout...')
+                    break
+                if self.__posts_found < self.posts_count:
+                    Utilities._Utilities__scroll_down(
+                        self.__driver, self.__layout)  # scroll down
+        finally:
+            phase_start = self.__end_phase("extract", phase_start)
+            # close the browser window after job is done, or when the consumer stopped early
+            self.__close_driver()
+            self.__end_phase("close_driver", phase_start)
+            if self.profiler is not None:
+                self.profile = self.profiler.log_report()
+
+    def scrap_to_sink(self, sink, minimum_timestamp = None, single_post = False):
+        """writes the posts to sink (Jsonl_sink, Csv_sink, Parquet_sink or Sqlite_sink) while they are scraped and closes it, returns number
+        of posts written. When the sink resumed a previous run, its posts are skipped and count towards posts_count"""
+        remaining = self.posts_count - len(sink.seen_ids)
+        written = 0
+        try:
+            if remaining <= 0:
+                return written
+            posts = self.iter_posts(minimum_timestamp, single_post, skip_posts=sink.seen_ids)
+            try:
+                for key, post in posts:
+                    sink.write(key, post, posinset=self.feed_position)
+                    written += 1
+                    if written >= remaining:
+                        break
+            finally:
+                # closes the browser when leaving early
+                posts.close()
+            return written
+        finally:
+            sink.close()
+
+    def scrap_to_json(self, minimum_timestamp = None, single_post = False):
+        return self.__posts_to_json(self.iter_posts(minimum_timestamp, single_post))
+
+    def __posts_to_json(self, posts):
+        """runs posts, generator of iter_posts, to its end and returns JSON string of its posts"""
+        self.__data_dict = dict(posts)
+        return json.dumps(self.__data_dict, ensure_ascii=False, default=Post.json_default)
+
+    def __json_to_csv(self, path, posts):
+        """writes posts, iterable of (post ID, post) tuples, to the CSV file at path row by row, the rows are built
+        straight from the posts, without any JSON round trip"""
+        # the columns are the ones of Csv_sink for the requested fields
+        columns = Csv_sink.columns(self.fields)
         # open and start writing to CSV files
         mode = 'w'
-        if os.path.exists("{}.csv".format(filename)):
-            # if the CSV file already exists then switch to append mode
-            mode = 'a'
-        with open("{}.csv".format(filename), mode, newline='', encoding="utf-8") as data_file:
-            # instantiate DictWriter for writing CSV file
-            writer = csv.DictWriter(data_file, fieldnames=fieldnames)
-            if mode == 'w':
-                # if writing mode is
-                writer.writeheader()  # write headers to CSV file
-            # iterate over entire dictionary, write each posts as a row to CSV file
-            for key in json_data:
-                post = json_data[key]  # For better readability
-                reactions = post.get('reactions', {})  # Default to an empty dict if 'reactions' does not exist
-                row = {
-                    'id': key,
-                    'name': post.get('name', ''),
-                    'shares': post.get('shares', 0),
-                    'likes': reactions.get('likes', 0),
-                    'loves': reactions.get('loves', 0),
-                    'wow': reactions.get('wow', 0),
-                    'cares': reactions.get('cares', 0),
-                    'sad': reactions.get('sad', 0),
-                    'angry': reactions.get('angry', 0),
-                    'haha': reactions.get('haha', 0),
-                    'reactions_count': post.get('reaction_count', 0),
-                    'comments': post.get('comments', ''),
-                    'content': post.get('content', ''),
-                    'posted_on': post.get('posted_on', ''),
-                    'video': post.get('video', ''),
-                    'images': " ".join(post.get('images', [])),  # Join images list into a string, defaulting to an empty list
-                    'post_url': post.get('post_url', '')
-                }
-                writer.writerow(row)  # write row to CSV file
-
-            data_file.close()  # after writing close the file
-
-    def scrap_to_csv(self, filename, directory=os.getcwd(),):
+        if os.path.exists(path):
+            with open(path, newline='', encoding="utf-8") as data_file:
+                header = next(csv.reader(data_file), None)
+            if header is not None:
+                # the rows appended must line up with the columns of the existing file
+                if header != columns:
+                    raise Exception("CSV file {} has columns {}, expected {}".format(path, header, columns))
+                # if the CSV file already exists then switch to append mode
+                mode = 'a'
+        # the file is opened on the first post, so that a run scraping nothing doesn't leave a header-only file
+        data_file = None
         try:
-            data = self.scrap_to_json()  # get the data in JSON format from the same class method
-            # convert it and write to CSV
-            self.__json_to_csv(filename, json.loads(data), directory)
+            # write each post as a row to CSV file, as soon as it is scraped
+            for key, post in posts:
+                if data_file is None:
+                    data_file = open(path, mode, newline='', encoding="utf-8")
+                    writer = csv.writer(data_file)
+                    if mode == 'w':
+                        # if writing mode is
+                        writer.writerow(columns)  # write headers to CSV file
+                writer.writerow(Csv_sink._Csv_sink__values(key, post, columns))  # write row to CSV file
+        finally:
+            if data_file is not None:
+                data_file.close()
+
+    def scrap_to_csv(self, filename=None, directory=os.getcwd(), path=None):
+        """writes the posts to <directory>/<filename>.csv, or to path when given, while they are scraped,
+        appends to the file if it exists with the same columns, else nothing is scraped. Returns True if the file was written"""
+        try:
+            # the working directory is left alone so that scrapers running concurrently in the same process
+            # don't write to each other's directory
+            path = path or os.path.join(directory, "{}.csv".format(filename))
+            # posts are written while they are scraped, rather than kept until the end of the run
+            self.__json_to_csv(path, self.iter_posts())
             return True
         except Exception as ex:
             logger.exception('Error at scrap_to_csv : {}'.format(ex))
             return False
 
-    def __remove_duplicates(self, all_posts):
-        """takes a list of posts and removes duplicates from it and returns the list"""
-        if len(self.__extracted_post) == 0:  # if self.__extracted_post is empty that means it is first extraction
-            # if it does than just add all the elements from the lists to __extracted_post set()
-            self.__extracted_post.update(all_posts)
-            return all_posts  # return the all_posts without any changes as it is first time and no duplicate is present
-        else:
-            # if self.extracted posts have some element than compare it with all_posts's element and return a new list containing new element
-            removed_duplicated = [
-                post for post in all_posts if post not in self.__extracted_post]
-            # after removing duplicates, add all those new element to extracted_posts, as it
-            self.__extracted_post.update(all_posts)
-            return removed_duplicated  # is set() it won't have duplicate elements
+    def scrap_to_jsonl(self, path, minimum_timestamp = None, single_post = False, compression = None):
+        """writes the posts to the JSON lines file at path while they are scraped, see Jsonl_sink,
+        returns number of posts written"""
+        return self.scrap_to_sink(Jsonl_sink(path, compression=compression), minimum_timestamp, single_post)
+
+    def scrap_to_parquet(self, path, minimum_timestamp = None, single_post = False, row_group_size = 10000):
+        """writes the posts to the Parquet file at path while they are scraped, one row group every row_group_size
+        posts, see Parquet_sink. Returns number of posts written"""
+        sink = Parquet_sink(path, row_group_size=row_group_size, fields=self.fields)
+        return self.scrap_to_sink(sink, minimum_timestamp, single_post)
+
+    def scrap_to_sqlite(self, path, minimum_timestamp = None, single_post = False, batch_size = 500):
+        """upserts the posts into the SQLite database at path while they are scraped, see Sqlite_sink,
+        returns number of posts written"""
+        sink = Sqlite_sink(path, page=self.page_or_group_name, batch_size=batch_size)
+        return self.scrap_to_sink(sink, minimum_timestamp, single_post)
+
+    def scrap_to_arrow(self, minimum_timestamp = None, single_post = False):
+        """returns the posts as a pyarrow Table with the columns of scrap_to_parquet"""
+        return Parquet_sink.table(self.iter_posts(minimum_timestamp, single_post), fields=self.fields)
+
+    def __wants(self, *fields):
+        """returns True if any of fields is requested, all of them are when fields wasn't given"""
+        return self.fields is None or any(field in self.fields for field in fields)
+
+    def __project(self, post_data):
+        """returns the post as a Post record, keeping the requested fields only"""
+        post = post_data if isinstance(post_data, Post) else Post(**post_data)
+        for field in list(post):
+            if not self.__wants(field):
+                del post[field]
+        return post
+
+    def __plan_steps(self):
+        """returns the extraction steps of the webdriver mode to run for every post: the ones the filters read,
+        cheapest filter first, then the other requested ones"""
+        steps = [step for step in self.STEPS if not (self.isGroup and step[0] in self.PAGE_ONLY_STEPS)]
+
+        def filter_steps(post_filter):
+            return [step for step in steps if set(step[1]) & set(post_filter.fields)]
+
+        planned = []
+        for post_filter in sorted(self.__filters, key=lambda post_filter: sum(step[2] for step in filter_steps(post_filter))):
+            planned.extend(step for step in filter_steps(post_filter) if step not in planned)
+        return planned + [step for step in steps if step not in planned and self.__wants(*step[1])]
+
+    @staticmethod
+    def __apply_filters(post_data, pending_filters):
+        """evaluates the pending filters whose fields were extracted and forgets them, returns "reject" if one
+        rejected the post, "stop" if the scroll must stop as well, None if the post is kept so far"""
+        for post_filter in list(pending_filters):
+            if not all(field in post_data for field in post_filter.fields):
+                continue
+            pending_filters.remove(post_filter)
+            if not post_filter.accepts(post_data):
+                return "stop" if post_filter.ends_feed(post_data) else "reject"
+        return None
+
+    def __run_step(self, step, post, status, link_element, single_post):
+        """runs one extraction step of the webdriver mode on post, returns the fields it found"""
+        step_name = step[0]
+        if step_name == "name":
+            # finds name depending on if this facebook site is a page or group (we pass a post obj or a webDriver)
+            name = Finder._Finder__find_name(
+                post, self.__layout)  # find name element for page or for each post if this is used for group pages
+            return {"name": name.get('name'), "user_url": name.get('url')}
+        if step_name == "content":
+            return {"content": Finder._Finder__find_content(post, self.__driver, self.__layout)}
+        # NOTE below is  additional fields to scrape, all of which have not been thoroughly tested for groups
+        if step_name == "shares":
+            # find share from the post
+            shares = Finder._Finder__find_share(post, self.__layout)
+            # converting shares to number
+            # e.g if 5k than it should be 5000
+            return {"shares": int(Scraping_utilities._Scraping_utilities__value_to_float(shares))}
+        if step_name == "comments":
+            comments = Finder._Finder__find_comments(post, self.__layout)
+            return {"comments": int(Scraping_utilities._Scraping_utilities__value_to_float(comments))}
+        if step_name == "video":
+            return {"video": Finder._Finder__find_video_url(post)}
+        if step_name == "reactions":
+            # find all reactions
+            reactions_all = Finder._Finder__find_reactions(post)
+            # find all anchor tags in reactions_all list
+            all_hrefs_in_react = Finder._Finder__find_reaction(self.__layout, reactions_all,) if type(
+                reactions_all) != str else ""
+            # if hrefs were found
+            # all_hrefs contains elements like
+            # ["5 comments","54 Likes"] and so on
+            if type(all_hrefs_in_react) == list:
+                l = [i.get_attribute("aria-label")
+                    for i in all_hrefs_in_react]
+            else:
+                l = []
+            # extract that aria-label from all_hrefs_in_react list and than extract numbers from them seperately
+            # e,g reactions may contain counts like "5k","5m", so converting them to actual number
+            reactions = Scraping_utilities._Scraping_utilities__reactions_from_labels(l)
+            # count number of total reactions
+            return {"reactions": reactions,
+                    "reaction_count": Scraping_utilities._Scraping_utilities__count_reaction(reactions)}
+        if step_name == "posted_on":
+            # extract time
+            return {"posted_on": Finder._Finder__find_posted_time(
+                post, self.__layout, link_element, self.__driver, self.isGroup, single_post = single_post)}
+        if step_name == "images":
+            if self.__wants("images", "error"):
+                image = Finder._Finder__find_images(post, self.__layout, self.__driver, self.image_strategy)
+            else:
+                # photo posts are identified by their photo set, read from the first photo's link without resolving the images
+                image = {'post_id': Finder._Finder__find_post_id(post, self.__layout)}
+            return {"images": image.get('images'), "post_id": image.get('post_id') if image.get('post_id') else status,
+                    "error": image.get('error')}
+        return {}
+
+    def __locate_post(self, post, post_data, single_post):
+        """hovers the post's time link to find its ID and URL, set in post_data. Returns (status, post_url, link_element),
+        "skip" if the post must be left out, "stop" once stop_after_known posts scraped before were met in a row"""
+        status, post_url, link_element = Finder._Finder__find_status(
+            post, self.__layout, self.isGroup, self.__driver, self.page_or_group_name, single_post = single_post)
+        if post_url is None:
+            print("no post_url, skipping")
+            return "skip"
+        if self.__already_seen(status):
+            return "skip"
+        if self.__known_post([status]):
+            return "stop" if self.__reached_known_posts() else "skip"
+        self.__profile_post(status, rename=True)
+        if not ('permalink.php' in post_url):
+            # Only when the link doesn't have permalink in it Split the URL on the '?' character, to detach the referer or uneeded query info
+            post_url = post_url.split('?')[0]
+        post_data.update(post_id=status, post_url=post_url)
+        return status, post_url, link_element
+
+    def __already_seen(self, status):
+        """returns True if the post was scraped before in this run, or must be skipped"""
+        return status in self.__skip_posts or self.__cursor.seen(status)
 
     def __close_after_retry(self):
         """returns if class member retry is 0"""
@@ -209,165 +587,242 @@ class Facebook_scraper:
             # if length of posts is 0,decrement retry by 1
             self.retry -= 1
 
-    def __find_elements(self, minimum_timestamp, single_post = False):
-        """find elements of posts and add them to data_dict"""
-        all_posts = Finder._Finder__find_all_posts(
-            self.__driver, self.__layout, self.isGroup)  # find all posts
+    def __find_elements(self, single_post = False):
+        """generator of the (post ID, post) tuples of the posts found on the page, returns True once
+        the scroll must stop: posts_count reached, a post ending the feed for the filters (e.g older than minimum_timestamp),
+        stop() called or no new posts"""
+        # only the posts loaded since the last iteration
+        all_posts = self.__cursor.next_posts()
         print("all_posts length: " + str(len(all_posts)))
-        self.previous_post_length = len(all_posts)
-        # when the length of the posts is the same for 3 iterations, it means the script is going to loop indefinitely, so we are cutting it off
-        if self.previous_post_length == len(all_posts):
-            self.infinite_loop_counter +=1
+        # when no new post loads for 5 iterations, it means the script is going to loop indefinitely, so we are cutting it off
+        self.infinite_loop_counter = self.infinite_loop_counter + 1 if len(all_posts) == 0 else 0
 
         if self.infinite_loop_counter >= 5:
             logger.info(f"Infinite loop counter reached : {self.infinite_loop_counter}, breaking loop")
             self.infinite_loop_counter = 0
             return True
 
-         # remove duplicates from the list
-        all_posts = self.__remove_duplicates(
-            all_posts) 
+        if self.extraction_mode == "network" and self.__network_capture:
+            return (yield from self.__find_elements_in_network(all_posts, single_post))
+
+        if self.extraction_mode in ("script", "html", "network"):
+            return (yield from self.__find_elements_in_page(all_posts, single_post))
 
         # iterate over all the posts and find details from the same
         for post in all_posts:
+            if self.__stopped or self.__posts_found >= self.posts_count:
+                return True
             try:
-                # find post ID from post
-                status, post_url, link_element = Finder._Finder__find_status(
-                    post, self.__layout, self.isGroup, self.__driver, self.page_or_group_name, single_post = single_post)
-                if post_url is None:
-                    print("no post_url, skipping")
+                self.__profile_post("post #{}".format(self.__posts_found + 1))
+                # the IDs in the post's links tell, without any hover, if it was scraped before
+                keys = Finder._Finder__find_post_key(post, self.__layout, self.__driver)
+                if self.post_index is not None and self.__known_post(keys):
+                    if self.__reached_known_posts():
+                        return True
                     continue
-
+                if any(self.__already_seen(key) for key in keys):
+                    continue
+                # the fields are extracted step by step, the ones the filters read first so that a rejected post
+                # doesn't go through the expensive steps, the steps whose fields aren't requested are skipped.
+                # The time link is only hovered once a step needs it, or once the filters accepted the post
+                post_data = Post()
+                pending_filters = list(self.__filters)
+                decision = self.__apply_filters(post_data, pending_filters)
+                location = None
+                for step in self.__steps:
+                    if decision is not None:
+                        break
+                    if location is None and step[0] in self.STATUS_STEPS:
+                        location = self.__locate_post(post, post_data, single_post)
+                        if isinstance(location, str):
+                            break
+                    status, _, link_element = location or (None, None, None)
+                    post_data.update(self.__run_step(step, post, status, link_element, single_post))
+                    decision = self.__apply_filters(post_data, pending_filters)
+                if location is None and decision is None:
+                    location = self.__locate_post(post, post_data, single_post)
+                if location == "stop" or decision == "stop":
+                    # no new posts return true to signal the parent function stop trying to load more posts
+                    return True
+                if location == "skip":
+                    continue
+                for key in keys + ([location[0]] if location else []):
+                    self.__cursor.add(key)
+                if decision == "reject":
+                    continue
+                status = location[0]
+                post_data = self.__project(post_data)
+                self.__post_stored(status, post_data)
+            except Exception as ex:
+                logger.exception(
+                    "Error at find_elements method : {}".format(ex))
+            else:
+                yield status, post_data
+
+    def __find_elements_in_network(self, all_posts, single_post = False):
+        """yields the posts parsed by Graphql_parser from the responses captured since the last scroll, like
+        __find_elements. If nothing was ever captured, e.g the feed is served another way, the DOM is used instead"""
+        captured = Graphql_parser._Graphql_parser__captured_posts(self.__driver, self.URL, self.__network_requests)
+        if not captured and self.__network_posts == 0:
+            return (yield from self.__find_elements_in_page(all_posts, single_post))
+        self.__network_posts += len(captured)
+        for status, post_data in captured:
+            if self.__stopped or self.__posts_found >= self.posts_count:
+                return True
+            if self.__already_seen(status):
+                continue
+            if self.__known_post([status]):
+                if self.__reached_known_posts():
+                    return True
+                continue
+            decision = self.__apply_filters(post_data, list(self.__filters))
+            if decision == "stop":
+                # no new posts return true to signal the parent function stop trying to load more posts
+                return True
+            if decision == "reject":
+                self.__cursor.add(status)
+                continue
+            if self.isGroup:
+                # same fields as the other modes, the page only ones are left out for groups
+                for key in ("shares", "reactions", "reaction_count", "comments", "posted_on", "video"):
+                    post_data.pop(key, None)
+            post_data = self.__project(post_data)
+            self.__cursor.add(status)
+            self.__post_stored(status, post_data)
+            yield status, post_data
+
+    def __find_elements_in_page(self, all_posts, single_post = False):
+        """extracts every post of all_posts with Script_extractor or from an HTML snapshot with Html_parser and yields them
+        like __find_elements, the script mode falls back to the Finder methods for the fields that can't be read from the DOM"""
+        if self.extraction_mode == "html":
+            html_list = Html_parser._Html_parser__snapshot_posts(self.__driver, all_posts, self.__layout)
+            raw_posts = Html_parser._Html_parser__extract_posts(html_list, self.__layout, self.isGroup)
+        else:
+            raw_posts = Script_extractor._Script_extractor__extract_posts(
+                self.__driver, all_posts, self.__layout, self.isGroup)
+        for raw in raw_posts:
+            if self.__stopped or self.__posts_found >= self.posts_count:
+                return True
+            try:
+                if raw.get('error'):
+                    logger.debug("in-page extraction failed : {}".format(raw.get('error')))
+                    continue
+                post = raw.get('post')
+                post_url = raw.get('status_url')
+                status = Scraping_utilities._Scraping_utilities__extract_id_from_link(post_url) if post_url else None
+                if not status or status == "NA":
+                    # same fallback as __find_status, build the URL out of the post's photo link
+                    photo_links = raw.get('photo_links') or []
+                    post_id = Finder._Finder__get_post_id(photo_links[0]) if photo_links else None
+                    if post_id is None:
+                        logger.debug("no post_url, skipping")
+                        continue
+                    status = post_id
+                    post_url = "https://www.facebook.com/{}/posts/{}".format(self.page_or_group_name, post_id)
+                if self.__already_seen(status):
+                    continue
+                # known posts are skipped before the hover and photo viewer fallbacks
+                if self.__known_post([status]):
+                    if self.__reached_known_posts():
+                        return True
+                    continue
+                # the batch call is shared by all posts, only the fallbacks below are attributed to this one
+                self.__profile_post(status)
 
                 if not ('permalink.php' in post_url):
                     # Only when the link doesn't have permalink in it Split the URL on the '?' character, to detach the referer or uneeded query info
-                    parts = post_url.split('?')
-                    # The first part of the list is the URL up to the '?'
-                    post_url = parts[0]
-
+                    post_url = post_url.split('?')[0]
 
-                # finds name depending on if this facebook site is a page or group (we pass a post obj or a webDriver)
-                name = Finder._Finder__find_name(
-                    post, self.__layout)  # find name element for page or for each post if this is used for group pages
-                
-
-                post_content = Finder._Finder__find_content(
-                    post, self.__driver, self.__layout)
-                # print("comments: " + post_content)
-                
-                # NOTE below is  additional fields to scrape, all of which have not been thoroughly tested for groups
                 if not self.isGroup:
-                    # find share from the post
-                    shares = Finder._Finder__find_share(post, self.__layout)
-                    # converting shares to number
-                    # e.g if 5k than it should be 5000
-                    shares = int(
-                        Scraping_utilities._Scraping_utilities__value_to_float(shares))
-                    # find all reactions
-                    reactions_all = Finder._Finder__find_reactions(post)
-                    # find all anchor tags in reactions_all list
-                    all_hrefs_in_react = Finder._Finder__find_reaction(self.__layout, reactions_all,) if type(
-                        reactions_all) != str else ""
-                    # if hrefs were found
-                    # all_hrefs contains elements like
-                    # ["5 comments","54 Likes"] and so on
-                    if type(all_hrefs_in_react) == list:
-                        l = [i.get_attribute("aria-label")
-                            for i in all_hrefs_in_react]
+                    shares = raw.get('shares') or "0"
+                    comments = [text for text in raw.get('comments') or [] if text]
+                    if self.__layout == "old":
+                        shares = Scraping_utilities._Scraping_utilities__extract_numbers(shares)
+                        comments = Scraping_utilities._Scraping_utilities__extract_numbers(comments[0]) if comments else 0
                     else:
-                        l = []
-                    # extract that aria-label from all_hrefs_in_react list and than extract number from them seperately
-                    # if Like aria-label is in the list, than extract it and extract numbers from that text
-
-                    likes = Scraping_utilities._Scraping_utilities__find_reaction_by_text(
-                        l, "Like")
-
-                    # if Love aria-label is in the list, than extract it and extract numbers from that text
-                    loves = Scraping_utilities._Scraping_utilities__find_reaction_by_text(
-                        l, "Love")
-
-                    # if Wow aria-label is in the list, than extract it and extract numbers from that text
-                    wow = Scraping_utilities._Scraping_utilities__find_reaction_by_text(
-                        l, "Wow")
-
-                    # if Care aria-label is in the list, than extract it and extract numbers from that text
-                    cares = Scraping_utilities._Scraping_utilities__find_reaction_by_text(
-                        l, "Care")
-                    # if Sad aria-label is in the list, than extract it and extract numbers from that text
-                    sad = Scraping_utilities._Scraping_utilities__find_reaction_by_text(
-                        l, "Sad")
-                    # if Angry aria-label is in the list, than extract it and extract numbers from that text
-                    angry = Scraping_utilities._Scraping_utilities__find_reaction_by_text(
-                        l, "Angry")
-                    # if Haha aria-label is in the list, than extract it and extract numbers from that text
-                    haha = Scraping_utilities._Scraping_utilities__find_reaction_by_text(
-                        l, "Haha")
-
-                    # converting all reactions to numbers
-                    # e,g reactions may contain counts like "5k","5m", so converting them to actual number
-                    likes = Scraping_utilities._Scraping_utilities__value_to_float(
-                        likes)
-                    loves = Scraping_utilities._Scraping_utilities__value_to_float(
-                        loves)
-                    wow = Scraping_utilities._Scraping_utilities__value_to_float(
-                        wow)
-                    cares = Scraping_utilities._Scraping_utilities__value_to_float(
-                        cares)
-                    sad = Scraping_utilities._Scraping_utilities__value_to_float(
-                        sad)
-                    angry = Scraping_utilities._Scraping_utilities__value_to_float(
-                        angry)
-                    haha = Scraping_utilities._Scraping_utilities__value_to_float(
-                        haha)
-
-                    reactions = {"likes": int(likes), "loves": int(loves), "wow": int(wow), "cares": int(cares), "sad": int(sad),
-                                "angry":
-                                int(angry), "haha": int(haha)}
-
-                    # count number of total reactions
+                        # same as __find_comments, the only span holding a number is the comment count
+                        comments = next((text for text in comments if text.isdigit()), 0)
+                    shares = int(Scraping_utilities._Scraping_utilities__value_to_float(shares))
+                    comments = int(Scraping_utilities._Scraping_utilities__value_to_float(comments))
+                    reactions = Scraping_utilities._Scraping_utilities__reactions_from_labels(
+                        raw.get('reactions') or [])
                     total_reaction_count = Scraping_utilities._Scraping_utilities__count_reaction(
                         reactions)
 
-                    comments = Finder._Finder__find_comments(post, self.__layout)
-                    comments = int(
-                        Scraping_utilities._Scraping_utilities__value_to_float(comments))
-
-
-                    # extract time
-                    posted_time = Finder._Finder__find_posted_time(
-                        post, self.__layout, link_element, self.__driver, self.isGroup, single_post = single_post)
-
-                    #getting post time and checking for minimum timestamp
-                    if not self.isGroup:
-                        # extract time
-                        if minimum_timestamp:
-                            ts = ciso8601.parse_datetime(posted_time).timestamp()
-                            if ts < int(minimum_timestamp):
-                                # no new posts return true to signal the parent function stop trying to load more posts
-                                return True
-
-                    video = Finder._Finder__find_video_url(post)
-
-                image = Finder._Finder__find_all_image_url(post, self.__layout, self.__driver)
-
-                # post_url = "https://www.facebook.com/{}/posts/{}".format(self.page_or_group_name,status)
-
-                self.__data_dict[status] = {
-                    "name": name.get('name'),
-                    "user_url": name.get('url'),
-                    "content": post_content,
-                    "images": image.get('images'),
-                    "post_id": image.get('post_id') if image.get('post_id') else status,
-                    "post_url": post_url,
-                    "error": image.get('error'),
-                    # NOTE only include the following fields if scraping a page, not tested for groups yet
-                    **({"shares": shares} if not self.isGroup else {}),
-                    **({"reactions": reactions} if not self.isGroup else {}),
-                    **({"reaction_count": total_reaction_count} if not self.isGroup else {}),
-                    **({"comments": comments} if not self.isGroup else {}),
-                    **({"posted_on": posted_time} if not self.isGroup else {}),
-                    **({"video": video} if not self.isGroup else {}),
-                }
+                    posted_time = self.__parse_in_page_time(raw.get('time'))
+
+                    # same as __find_video_url, keep one link per video id
+                    video_links = {}
+                    for href in raw.get('video_links') or []:
+                        video_links.setdefault(urlparse(href).path.rsplit('/', 1)[-1], href)
+                    video = list(raw.get('videos') or []) + list(video_links.values())
+
+                image_links = raw.get('image_links') or []
+                image_post_id = Finder._Finder__get_post_id(image_links[0]) if image_links else None
+
+                # posted_on is only there once known, so that the filters reading it wait for the hover below
+                post_data = Post(
+                    name=raw.get('name'),
+                    user_url=raw.get('user_url'),
+                    content=raw.get('content') or "",
+                    images=raw.get('images') or [],
+                    post_id=image_post_id if image_post_id else status,
+                    post_url=post_url,
+                    error=None,
+                )
+                if not self.isGroup:
+                    post_data.update(shares=shares, reactions=reactions, reaction_count=total_reaction_count,
+                                     comments=comments, video=video)
+                    if posted_time:
+                        post_data["posted_on"] = posted_time
+                # the filters run on the fields read in the page, before the hover and photo viewer fallbacks
+                pending_filters = list(self.__filters)
+                decision = self.__apply_filters(post_data, pending_filters)
+
+                if decision is None and not self.isGroup and not posted_time and post is not None and (
+                        self.__wants("posted_on") or any("posted_on" in post_filter.fields for post_filter in pending_filters)):
+                    # the new layout only shows the date inside the hover tooltip, fall back to the hover for this post
+                    post_data["posted_on"] = Finder._Finder__find_posted_time(
+                        post, self.__layout, raw.get('status_link'), self.__driver, self.isGroup, single_post = single_post)
+                    decision = self.__apply_filters(post_data, pending_filters)
+
+                if decision is None and raw.get('more_images') and post is not None and self.__wants("images", "error"):
+                    # some images are hidden behind the "+N" tile, the page doesn't list them
+                    image = Finder._Finder__find_images(post, self.__layout, self.__driver, self.image_strategy)
+                    post_data.update({
+                        "images": image.get('images'),
+                        "post_id": image.get('post_id') if image.get('post_id') else status,
+                        "error": image.get('error'),
+                    })
+                    decision = self.__apply_filters(post_data, pending_filters)
+
+                if decision == "stop":
+                    # no new posts return true to signal the parent function stop trying to load more posts
+                    return True
+                self.__cursor.add(status)
+                if decision == "reject":
+                    continue
+                if not self.isGroup:
+                    post_data.setdefault("posted_on", "")
+                post_data = self.__project(post_data)
+                self.__post_stored(status, post_data)
             except Exception as ex:
                 logger.exception(
-                    "Error at find_elements method : {}".format(ex))
+                    "Error at find_elements_in_page method : {}".format(ex))
+            else:
+                yield status, post_data
+
+    def __parse_in_page_time(self, raw_time):
+        """converts the time read by Script_extractor, a unix timestamp for the old layout or the link's label for the new one,
+        to ISO 8601, returns empty string if it can't be parsed"""
+        if not raw_time:
+            return ""
+        try:
+            if self.__layout == "old":
+                return datetime.fromtimestamp(float(raw_time)).isoformat()
+            if len(raw_time) > 5:
+                return parse(raw_time).isoformat()
+            converted = Scraping_utilities._Scraping_utilities__convert_to_iso(raw_time)
+            return "" if converted == "Failed to fetch!" else converted
+        except (ValueError, OverflowError):
+            return ""
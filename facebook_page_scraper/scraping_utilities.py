@@ -15,6 +15,10 @@ ch.setFormatter(format)
 logger.addHandler(ch)
 
 class Scraping_utilities:
+    # output key of every reaction, paired with the text present in that reaction's aria-label
+    REACTION_LABELS = (("likes", "Like"), ("loves", "Love"), ("wow", "Wow"), ("cares", "Care"),
+                       ("sad", "Sad"), ("angry", "Angry"), ("haha", "Haha"))
+
     @staticmethod
     def __extract_numbers(string):
         """expects string and returns numbers from them as integer type,
@@ -117,6 +121,17 @@ class Scraping_utilities:
             return ''.join(reaction[0]) #list of tuple, return first tuple's first result
         return '0'
 
+    @staticmethod
+    def __reactions_from_labels(labels):
+        """expects list of reaction's aria-labels e.g ["54 Like", "5 Love"], returns dictionary holding the count of every reaction
+        e.g => {"likes": 54, "loves": 5, "wow": 0, "cares": 0, "sad": 0, "angry": 0, "haha": 0}"""
+        reactions = {}
+        for key, text in Scraping_utilities.REACTION_LABELS:
+            # extract the number next to the reaction's label, e.g "5k" than convert it to actual number
+            reactions[key] = int(Scraping_utilities.__value_to_float(
+                Scraping_utilities.__find_reaction_by_text(labels, text)))
+        return reactions
+
     @staticmethod
     def __convert_to_iso(t):
         past_date = "Failed to fetch!"
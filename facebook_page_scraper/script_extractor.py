@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+import logging
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Script_extractor:
+    """
+    Extracts every field of a batch of posts inside the browser, with a single execute_async_script call per batch,
+    instead of the dozens of WebDriver round trips the Finder methods make for each post
+    """
+
+    # number of posts sent to the browser in one call, keeps a single script run short
+    BATCH_SIZE = 25
+
+    # arguments: posts, layout, isGroup, callback
+    # every post is returned as a plain object holding raw strings, they are converted to numbers/dates on the python side
+    # with the same Scraping_utilities helpers the Finder flow uses, so both modes return the same values
+    EXTRACTION_SCRIPT = """
+        var posts = arguments[0];
+        var layout = arguments[1];
+        var isGroup = arguments[2];
+        var done = arguments[arguments.length - 1];
+
+        var STATUS_SELECTORS = [
+            'span > a[attributionsrc][role="link"][href*="/posts/"]',
+            'span > a[attributionsrc][role="link"][href*="/permalink"]',
+            'span > a[attributionsrc][role="link"][href*="/videos"]',
+            'span > a[attributionsrc][role="link"][href*="/reel"]',
+            'span > a[attributionsrc][role="link"][href="#"]',
+            isGroup ? 'span > a[role="link"]' : 'span > a[target="_blank"][role="link"]',
+            'span > a[role="link"][href*="/reel"]',
+            'span > a[role="link"][href*="/posts/"]',
+            'span > a[role="link"][href*="/permalink"]',
+            'span > a[role="link"][href*="/videos"]'
+        ];
+        var STATUS_HREF = /\\/posts\\/|\\/permalink|\\/videos\\/|\\/reel|fbid=|\\/photos\\//;
+        var VIDEO_SELECTORS = [
+            'a[attributionsrc][role="link"][href*="/reel"]',
+            'a[attributionsrc][role="link"][href*="/videos"]',
+            'a[role="link"][href*="/reel"]',
+            'a[role="link"][href*="/videos"]'
+        ];
+
+        function textOf(element, property) {
+            if (!element) {
+                return '';
+            }
+            return element[property || 'textContent'] || '';
+        }
+
+        function hrefs(elements) {
+            var values = [];
+            for (var i = 0; i < elements.length; i++) {
+                values.push(elements[i].href || elements[i].getAttribute('href') || '');
+            }
+            return values;
+        }
+
+        function findStatusLink(post) {
+            var fallback = null;
+            for (var i = 0; i < STATUS_SELECTORS.length; i++) {
+                var links = post.querySelectorAll(STATUS_SELECTORS[i]);
+                for (var j = 0; j < links.length; j++) {
+                    fallback = fallback || links[j];
+                    if (STATUS_HREF.test(links[j].href || '')) {
+                        return links[j];
+                    }
+                }
+            }
+            if (isGroup) {
+                return post.querySelector('a[href*="/groups/"]') || fallback;
+            }
+            return fallback;
+        }
+
+        function findName(post) {
+            var name = post.querySelector(layout === 'old' ? 'a._64-f' : 'b.html-b');
+            if (!name) {
+                return {name: null, url: null};
+            }
+            var anchor = name.closest('a') || name.querySelector('a');
+            return {name: name.textContent, url: anchor ? anchor.href : null};
+        }
+
+        function findVideos(post) {
+            var videoLinks = [];
+            for (var i = 0; i < VIDEO_SELECTORS.length; i++) {
+                videoLinks = videoLinks.concat(hrefs(post.querySelectorAll(VIDEO_SELECTORS[i])));
+            }
+            return {
+                videos: Array.prototype.map.call(post.querySelectorAll('video'), function (video) { return video.src; }),
+                video_links: videoLinks
+            };
+        }
+
+        function findMoreImagesCount(images) {
+            if (images.length === 0) {
+                return 0;
+            }
+            var parent = images[images.length - 1].closest('a[href*="/photo"]');
+            if (!parent || !parent.parentElement) {
+                return 0;
+            }
+            var counters = parent.parentElement.querySelectorAll('div');
+            for (var i = 0; i < counters.length; i++) {
+                var match = /^\\+(\\d+)$/.exec((counters[i].innerText || '').trim());
+                if (match) {
+                    return parseInt(match[1], 10);
+                }
+            }
+            return 0;
+        }
+
+        function extractOld(post) {
+            var statusLink = post.querySelector('a._5pcq');
+            var abbr = post.querySelector('abbr[data-utime]');
+            var reactions = post.querySelector('[aria-label="See who reacted to this"]');
+            var images = post.querySelectorAll('img.scaledImageFitWidth.img');
+            return {
+                status_link: statusLink,
+                status_url: statusLink ? statusLink.href : null,
+                content: textOf(post.querySelector('.userContent')),
+                shares: textOf(post.querySelector('._355t._4vn2')),
+                comments: [textOf(post.querySelector('a._3hg-'))],
+                reactions: reactions ? Array.prototype.map.call(reactions.querySelectorAll('a'), function (a) {
+                    return a.getAttribute('aria-label') || '';
+                }) : [],
+                time: abbr ? abbr.getAttribute('data-utime') : '',
+                images: Array.prototype.map.call(images, function (img) { return img.src; }),
+                image_links: [],
+                photo_links: [],
+                more_images: 0
+            };
+        }
+
+        function extractNew(post) {
+            var statusLink = findStatusLink(post);
+            var message = post.querySelector('[data-ad-preview="message"]');
+            var shares = post.querySelector('div:nth-child(2) > span > div > div > div:nth-child(1) > span');
+            var comments = post.querySelectorAll('div:nth-child(1) > span > div > div > div:nth-child(1) > span');
+            var reactions = post.querySelector('[aria-label="See who reacted to this"]');
+            var images = post.querySelectorAll('a[href*="/photo"] div > img[referrerpolicy]');
+            var imageLinks = [];
+            for (var j = 0; j < images.length; j++) {
+                var anchor = images[j].closest('a');
+                imageLinks.push(anchor ? anchor.href : '');
+            }
+            return {
+                status_link: statusLink,
+                status_url: statusLink ? statusLink.href : null,
+                content: textOf(message, 'innerText'),
+                shares: shares ? shares.innerText : '0',
+                comments: Array.prototype.map.call(comments, function (span) { return span.innerText; }),
+                reactions: reactions ? Array.prototype.map.call(reactions.querySelectorAll('div'), function (div) {
+                    return div.getAttribute('aria-label') || '';
+                }) : [],
+                time: statusLink ? (statusLink.getAttribute('aria-label') || statusLink.innerText || '') : '',
+                images: Array.prototype.map.call(images, function (img) { return img.src; }),
+                image_links: imageLinks,
+                photo_links: hrefs(post.querySelectorAll('a[href*="/photo/"]')),
+                more_images: findMoreImagesCount(images)
+            };
+        }
+
+        // expand every "See more" of the batch first, then read the texts once the page re-rendered them
+        for (var p = 0; p < posts.length; p++) {
+            var seeMore = layout === 'old'
+                ? posts[p].querySelector('.userContent span.see_more_link_inner')
+                : posts[p].querySelector('[data-ad-preview="message"] div[dir="auto"] > div[role]:not([target])');
+            if (seeMore) {
+                try { seeMore.click(); } catch (err) {}
+            }
+        }
+
+        requestAnimationFrame(function () {
+            setTimeout(function () {
+                var results = [];
+                for (var k = 0; k < posts.length; k++) {
+                    try {
+                        var record = layout === 'old' ? extractOld(posts[k]) : extractNew(posts[k]);
+                        var name = findName(posts[k]);
+                        var videos = findVideos(posts[k]);
+                        record.post = posts[k];
+                        record.videos = videos.videos;
+                        record.video_links = videos.video_links;
+                        record.name = name.name;
+                        record.user_url = name.url;
+                        results.push(record);
+                    } catch (err) {
+                        results.push({post: posts[k], error: err.toString()});
+                    }
+                }
+                done(results);
+            }, 300);
+        });
+    """
+
+    @staticmethod
+    def __extract_posts(driver, posts, layout, isGroup):
+        """expects driver's instance and a list of post elements, returns a list of dictionaries holding the raw
+        values of every post, one execute_async_script call is made per BATCH_SIZE posts"""
+        raw_posts = []
+        for index in range(0, len(posts), Script_extractor.BATCH_SIZE):
+            batch = posts[index:index + Script_extractor.BATCH_SIZE]
+            try:
+                raw_posts.extend(driver.execute_async_script(
+                    Script_extractor.EXTRACTION_SCRIPT, batch, layout, isGroup) or [])
+            except Exception as ex:
+                logger.exception("Error at extract_posts method : {}".format(ex))
+        return raw_posts
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""Long running scrape service, keeps a Driver_pool of warm, logged in browsers and runs the scrape jobs it is sent
+over a local HTTP or Unix socket API, so that several tools share the same browsers.
+
+    python -m facebook_page_scraper.serve --workers 2 --browser firefox --port 8765
+    python -m facebook_page_scraper.serve --socket /tmp/facebook_page_scraper.sock --username me@example.com
+
+API, JSON bodies:
+    POST   /jobs               {"page_or_group_name": "Meta", "posts_count": 10, "priority": 5, ...}, returns the job
+    GET    /jobs               every job, without their posts
+    GET    /jobs/<id>          the job and the posts scraped so far
+    GET    /jobs/<id>/stream   one JSON line per post as soon as it is scraped, then a last line with the job
+    DELETE /jobs/<id>          cancels the job, a running one stops after its current post
+    GET    /stats              workers, utilization and queue
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .driver_pool import Driver_pool
+from .orchestrator import Orchestrator
+from .post import Post
+from .scraper import Facebook_scraper
+from .session_store import Session_store
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Scrape_job:
+    """one target of the service, its posts are kept as they are scraped so they can be streamed back"""
+
+    STATUSES = ("queued", "running", "done", "failed", "cancelled")
+
+    def __init__(self, target, priority=0):
+        self.id = uuid.uuid4().hex
+        self.target = target
+        self.priority = priority
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.worker = None
+        self.cancelled = False
+        # (post ID, post) tuples in the order they were scraped
+        self.posts = []
+        # Facebook_scraper running the job, to stop it when the job is cancelled
+        self.scraper = None
+        self.__condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def add_post(self, post_id, post):
+        with self.__condition:
+            self.posts.append((post_id, post))
+            self.__condition.notify_all()
+
+    def finish(self, status, error=None):
+        with self.__condition:
+            if not self.finished:
+                self.status = status
+                self.error = error
+                self.finished_at = time.time()
+            self.__condition.notify_all()
+
+    def cancel(self):
+        """cancels the job, a running job stops after its current post"""
+        self.cancelled = True
+        scraper = self.scraper
+        if scraper is not None:
+            scraper.stop()
+        if self.status == "queued":
+            self.finish("cancelled")
+
+    def iter_posts(self, start=0, timeout=None):
+        """generator of the (post ID, post) tuples from index start, waits for the next posts until the job is
+        finished, or up to timeout seconds of inactivity"""
+        index = start
+        while True:
+            with self.__condition:
+                if index >= len(self.posts) and not self.finished:
+                    if not self.__condition.wait(timeout) and index >= len(self.posts):
+                        return
+                batch = self.posts[index:]
+                finished = self.finished
+            index += len(batch)
+            yield from batch
+            if finished and not batch:
+                return
+
+    def to_dict(self, posts=False):
+        job = {
+            "id": self.id,
+            "target": self.target,
+            "priority": self.priority,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "worker": self.worker,
+            "posts_count": len(self.posts),
+        }
+        if posts:
+            job["posts"] = OrderedDict(self.posts)
+        return job
+
+
+class Scrape_service:
+    """
+    Runs scrape jobs on the warm browsers of driver_pool, one worker thread per browser. Jobs wait in a priority
+    queue, the highest priority first and then the oldest. Finished jobs are kept, with their posts, until
+    max_finished_jobs newer ones finished.
+
+    every keyword argument is a default Facebook_scraper argument of the jobs, e.g timeout or extraction_mode, jobs
+    can only override the ones of JOB_OPTIONS
+    """
+
+    # Facebook_scraper arguments a job may set, along with page_or_group_name, minimum_timestamp and single_post
+    JOB_OPTIONS = ("posts_count", "isGroup", "timeout", "extraction_mode", "fields", "image_strategy", "wait_jitter",
+                   "stop_after_known")
+
+    def __init__(self, driver_pool, max_finished_jobs=100, **scraper_options):
+        self.driver_pool = driver_pool
+        self.workers = driver_pool.size
+        self.max_finished_jobs = max_finished_jobs
+        self.scraper_options = scraper_options
+        self.started_at = None
+        self.__queue = queue.PriorityQueue()
+        # breaks priority ties, the oldest job first
+        self.__sequence = itertools.count()
+        self.__jobs = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__threads = []
+        # per worker: running job, jobs run, seconds spent running jobs and start of the running job
+        self.__worker_stats = [{"job": None, "jobs": 0, "busy_seconds": 0.0, "busy_since": None}
+                               for _ in range(self.workers)]
+        self.__closed = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        """launches the browsers of the pool and the workers"""
+        self.driver_pool.start()
+        self.started_at = time.time()
+        for worker in range(self.workers):
+            thread = threading.Thread(target=self.__work, args=(worker,), name="scrape-worker-{}".format(worker),
+                                      daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+        return self
+
+    def submit(self, target, priority=0):
+        """expects target as for Orchestrator, a page or group name or a dictionary, returns the queued Scrape_job"""
+        target = Orchestrator._Orchestrator__target(target)
+        unknown = set(target) - set(self.JOB_OPTIONS) - {"page_or_group_name", "minimum_timestamp", "single_post"}
+        if unknown:
+            raise Exception("Job options not supported! expected some of {}, got {}".format(
+                self.JOB_OPTIONS, sorted(unknown)))
+        job = Scrape_job(target, int(priority))
+        with self.__lock:
+            if self.__closed:
+                raise Exception("Scrape service is closed!")
+            self.__jobs[job.id] = job
+        self.__queue.put((-job.priority, next(self.__sequence), job))
+        return job
+
+    def job(self, job_id):
+        """returns the Scrape_job, None if it is unknown or was forgotten"""
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+    def jobs(self):
+        with self.__lock:
+            return list(self.__jobs.values())
+
+    def cancel(self, job_id):
+        job = self.job(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def __forget_finished_jobs(self):
+        with self.__lock:
+            finished = [job_id for job_id, job in self.__jobs.items() if job.finished]
+            for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+                del self.__jobs[job_id]
+
+    def __work(self, worker):
+        stats = self.__worker_stats[worker]
+        while True:
+            _, _, job = self.__queue.get()
+            if job is None:
+                return
+            if job.finished:
+                continue
+            with self.__lock:
+                stats.update(job=job.id, busy_since=time.time())
+            try:
+                self.__run(job, worker)
+            finally:
+                with self.__lock:
+                    stats["busy_seconds"] += time.time() - stats["busy_since"]
+                    stats.update(job=None, busy_since=None, jobs=stats["jobs"] + 1)
+                self.__forget_finished_jobs()
+
+    def __run(self, job, worker):
+        options = dict(self.scraper_options)
+        options.update({key: value for key, value in job.target.items()
+                        if key not in ("page_or_group_name", "minimum_timestamp", "single_post")})
+        job.worker = worker
+        job.started_at = time.time()
+        job.status = "running"
+        try:
+            job.scraper = Facebook_scraper(job.target["page_or_group_name"], driver_pool=self.driver_pool, **options)
+            posts = job.scraper.iter_posts(job.target.get("minimum_timestamp"), job.target.get("single_post", False))
+            # cancelled while the run was created, the stop() may have come before iter_posts reset it
+            if job.cancelled:
+                posts.close()
+                job.finish("cancelled")
+                return
+            try:
+                for post_id, post in posts:
+                    job.add_post(post_id, post)
+            finally:
+                # gives the browser back to the pool when the job was cancelled
+                posts.close()
+            job.finish("cancelled" if job.cancelled else "done")
+        except Exception as ex:
+            logger.exception("Error at scrape service run : {}".format(ex))
+            job.finish("failed", str(ex))
+        finally:
+            job.scraper = None
+
+    def stats(self):
+        """returns dictionary of the workers' utilization, since the start and per worker, and of the jobs"""
+        now = time.time()
+        uptime = now - self.started_at if self.started_at else 0.0
+        workers = []
+        with self.__lock:
+            for worker, stats in enumerate(self.__worker_stats):
+                busy_seconds = stats["busy_seconds"] + (now - stats["busy_since"] if stats["busy_since"] else 0.0)
+                workers.append({"worker": worker, "job": stats["job"], "jobs": stats["jobs"],
+                                "busy_seconds": busy_seconds, "utilization": busy_seconds / uptime if uptime else 0.0})
+            jobs = {status: 0 for status in Scrape_job.STATUSES}
+            for job in self.__jobs.values():
+                jobs[job.status] += 1
+        return {
+            "uptime": uptime,
+            "workers": len(workers),
+            "busy_workers": sum(1 for worker in workers if worker["job"] is not None),
+            "utilization": sum(worker["utilization"] for worker in workers) / len(workers) if workers else 0.0,
+            "queued": jobs["queued"],
+            "jobs": jobs,
+            "browsers_busy": self.driver_pool.busy,
+            "per_worker": workers,
+        }
+
+    def close(self):
+        """cancels the queued and running jobs, waits for the workers and closes the browsers"""
+        with self.__lock:
+            self.__closed = True
+            jobs = list(self.__jobs.values())
+        for job in jobs:
+            job.cancel()
+        for _ in self.__threads:
+            self.__queue.put((float("-inf"), next(self.__sequence), None))
+        for thread in self.__threads:
+            thread.join()
+        self.driver_pool.close()
+
+    def __handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+            def __send(self, status, body):
+                data = json.dumps(body, ensure_ascii=False, default=Post.json_default).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def __job(self, parts):
+                job = service.job(parts[1])
+                if job is None:
+                    self.__send(404, {"error": "unknown job {}".format(parts[1])})
+                return job
+
+            def __stream(self, job):
+                """writes one JSON line per post, until the job is finished or the client went away"""
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for post_id, post in job.iter_posts():
+                        line = json.dumps({"id": post_id, "post": post}, ensure_ascii=False,
+                                          default=Post.json_default)
+                        self.wfile.write(line.encode("utf-8") + b"\n")
+                        self.wfile.flush()
+                    self.wfile.write(json.dumps({"job": job.to_dict()}).encode("utf-8") + b"\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts == ["stats"]:
+                    return self.__send(200, service.stats())
+                if parts == ["jobs"]:
+                    return self.__send(200, [job.to_dict() for job in service.jobs()])
+                if len(parts) == 2 and parts[0] == "jobs":
+                    job = self.__job(parts)
+                    return job and self.__send(200, job.to_dict(posts=True))
+                if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "stream":
+                    job = self.__job(parts)
+                    return job and self.__stream(job)
+                self.__send(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path.split("?")[0].strip("/") != "jobs":
+                    return self.__send(404, {"error": "not found"})
+                try:
+                    target = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+                    priority = target.pop("priority", 0) if isinstance(target, dict) else 0
+                    job = service.submit(target, priority)
+                except Exception as ex:
+                    return self.__send(400, {"error": str(ex)})
+                self.__send(202, job.to_dict())
+
+            def do_DELETE(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if len(parts) != 2 or parts[0] != "jobs":
+                    return self.__send(404, {"error": "not found"})
+                job = service.cancel(parts[1])
+                if job is None:
+                    return self.__send(404, {"error": "unknown job {}".format(parts[1])})
+                self.__send(200, job.to_dict())
+
+        return Handler
+
+    def http_server(self, host="127.0.0.1", port=8765):
+        """returns the HTTP server of the API, serve_forever() serves it"""
+        return ThreadingHTTPServer((host, port), self.__handler())
+
+    def unix_server(self, path):
+        """returns the server of the API on the Unix socket at path, only reachable by the users allowed to open it"""
+        if os.path.exists(path):
+            os.remove(path)
+        handler = self.__handler()
+
+        class Unix_handler(handler):
+            def address_string(self):
+                return path
+
+        server = socketserver.ThreadingUnixStreamServer(path, Unix_handler)
+        server.daemon_threads = True
+        os.chmod(path, 0o600)
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="long running facebook_page_scraper service sharing warm browsers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="serves the API on this Unix socket instead of host and port")
+    parser.add_argument("--workers", type=int, default=2, help="browsers, and jobs run at the same time")
+    parser.add_argument("--browser", default="chrome", choices=("chrome", "firefox"))
+    parser.add_argument("--proxy")
+    parser.add_argument("--no-headless", dest="headless", action="store_false")
+    parser.add_argument("--username", help="account the browsers log in with")
+    parser.add_argument("--password-env", default="fb_password",
+                        help="environment variable holding the account's password")
+    parser.add_argument("--session-directory", help="directory of the saved login sessions, see Session_store")
+    parser.add_argument("--fast-startup", action="store_true")
+    parser.add_argument("--max-jobs", type=int, default=50, help="jobs a browser runs before it is replaced")
+    parser.add_argument("--timeout", type=int, default=600, help="default timeout of the jobs, in seconds")
+    parser.add_argument("--extraction-mode", default="webdriver", choices=Facebook_scraper.EXTRACTION_MODES)
+    args = parser.parse_args(argv)
+    session_store = Session_store(args.session_directory) if args.username else None
+    pool = Driver_pool(size=args.workers, browser=args.browser, proxy=args.proxy, headless=args.headless,
+                       username=args.username, password=os.getenv(args.password_env) if args.username else None,
+                       max_jobs=args.max_jobs, fast_startup=args.fast_startup, session_store=session_store)
+    with Scrape_service(pool, timeout=args.timeout, extraction_mode=args.extraction_mode) as service:
+        server = service.unix_server(args.socket) if args.socket else service.http_server(args.host, args.port)
+        logger.setLevel(logging.INFO)
+        logger.info("Scrape service: {} workers, listening on {}".format(
+            service.workers, args.socket or "http://{}:{}".format(args.host, args.port)))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Session_store:
+    """
+    Saves the cookies and localStorage of a logged in browser, per account, and restores them into new browsers
+    so that they start logged in instead of going through the login form on every run
+    """
+
+    DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "facebook_page_scraper", "sessions")
+    # cookies can only be set for the domain of the current page, this one is small and loads no script
+    RESTORE_URL = "https://www.facebook.com/robots.txt"
+    # facebook sets it once logged in and drops it when the session ends
+    SESSION_COOKIE = "c_user"
+
+    def __init__(self, directory=None):
+        self.directory = directory or self.DEFAULT_DIRECTORY
+
+    def __path(self, account):
+        """returns path of the session file of account, the account name is hashed so it doesn't end up in file names"""
+        return os.path.join(self.directory, "{}.json".format(hashlib.sha256(str(account).encode("utf-8")).hexdigest()))
+
+    def load(self, account):
+        """returns the saved session of account, None if there is none or if its session cookie expired"""
+        try:
+            with open(self.__path(account), encoding="utf-8") as session_file:
+                session = json.load(session_file)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        for cookie in session.get("cookies", []):
+            if cookie.get("name") == self.SESSION_COOKIE and cookie.get("expiry", now + 1) > now:
+                return session
+        return None
+
+    def save(self, driver, account, timeout=10):
+        """expects a logged in driver, saves its cookies and localStorage for account.
+        Waits up to timeout seconds for the session cookie, as it is only set once the login redirect completed,
+        returns False if the driver isn't logged in"""
+        try:
+            WebDriverWait(driver, timeout).until(lambda driver: driver.get_cookie(self.SESSION_COOKIE) is not None)
+        except TimeoutException:
+            logger.setLevel(logging.INFO)
+            logger.info("Session store: not logged in, session not saved")
+            return False
+        try:
+            session = {
+                "saved_at": time.time(),
+                "cookies": driver.get_cookies(),
+                "local_storage": driver.execute_script(
+                    "var items = {}; for (var i = 0; i < localStorage.length; i++) {"
+                    " var key = localStorage.key(i); items[key] = localStorage.getItem(key); } return items;"),
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".json")
+            with os.fdopen(descriptor, "w", encoding="utf-8") as session_file:
+                json.dump(session, session_file)
+            # the file holds the account's credentials in all but name, keep it private
+            os.chmod(temporary_path, 0o600)
+            os.replace(temporary_path, self.__path(account))
+            return True
+        except Exception as ex:
+            logger.exception("Error at session store save : {}".format(ex))
+            return False
+
+    def restore(self, driver, account):
+        """restores the saved session of account into driver, must be called before the page to scrape is loaded.
+        returns True if a session was restored, it still has to be checked with is_logged_in once the page loaded"""
+        session = self.load(account)
+        if session is None:
+            return False
+        try:
+            driver.get(self.RESTORE_URL)
+            for cookie in session["cookies"]:
+                # the "sameSite" values returned by some drivers are refused when adding the cookie back
+                cookie = {key: value for key, value in cookie.items() if key != "sameSite"}
+                driver.add_cookie(cookie)
+            driver.execute_script(
+                "var items = arguments[0]; for (var key in items) { localStorage.setItem(key, items[key]); }",
+                session.get("local_storage") or {})
+            return True
+        except Exception as ex:
+            logger.exception("Error at session store restore : {}".format(ex))
+            return False
+
+    @staticmethod
+    def is_logged_in(driver):
+        """checks that the loaded page belongs to a logged in session, facebook shows the login form again
+        once a session expired or was revoked"""
+        try:
+            return (driver.get_cookie(Session_store.SESSION_COOKIE) is not None
+                    and len(driver.find_elements(By.CSS_SELECTOR, "input[name='pass']")) == 0)
+        except Exception:
+            return False
+
+    def invalidate(self, account):
+        """removes the saved session of account"""
+        try:
+            os.remove(self.__path(account))
+        except OSError:
+            pass
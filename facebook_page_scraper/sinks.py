@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+def _integer(value):
+    """counts are numbers, or strings of digits depending on how they were read"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _datetime(value):
+    """posted_on is in the local time of the scraper, unless it holds its UTC offset"""
+    try:
+        return datetime.fromisoformat(value).astimezone(timezone.utc) if value else None
+    except ValueError:
+        return None
+
+
+def _older(posted_on, oldest_timestamp):
+    """returns True if posted_on is older than oldest_timestamp, they are compared as dates as their UTC offsets
+    can differ"""
+    posted = _datetime(posted_on)
+    if posted is None:
+        return False
+    oldest = _datetime(oldest_timestamp)
+    return oldest is None or posted < oldest
+
+
+class Post_sink:
+    """
+    Appends posts to a file while they are scraped, see Jsonl_sink and Csv_sink.
+
+    Posts are buffered and flushed every flush_every posts or flush_interval seconds. Every flush appends one
+    complete chunk (one gzip member or zstd frame when compressed), appends the IDs of its posts to
+    <path>.checkpoint.ids and then writes the checkpoint, <path>.checkpoint.json, holding the length of both files,
+    the feed position (last aria-posinset) and the oldest timestamp reached. With resume=True both files are cut
+    back to the last checkpoint and the posts are skipped, else the file and its checkpoint are started over.
+    Resuming a file without its checkpoint, or shorter than its checkpoint, raises an exception rather than starting
+    it over
+    """
+
+    COMPRESSIONS = (None, "gzip", "zstd")
+
+    def __init__(self, path, compression=None, flush_every=50, flush_interval=10, resume=False):
+        if compression not in self.COMPRESSIONS:
+            raise Exception("Compression not supported! expected one of {}".format(self.COMPRESSIONS))
+        self.path = path
+        self.compression = compression
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.checkpoint_path = "{}.checkpoint.json".format(path)
+        # IDs of the written posts, one JSON string per line, appended on every flush
+        self.ids_path = "{}.checkpoint.ids".format(path)
+        self.__compressor = self.__load_compressor(compression)
+        self.__buffer = []
+        self.__buffered_ids = []
+        self.__last_flush = time.time()
+        checkpoint = self.__read_checkpoint() if resume else None
+        if checkpoint is None:
+            if resume and os.path.exists(path) and os.path.getsize(path) > 0:
+                raise Exception("Can't resume {}, its checkpoint {} is missing".format(path, self.checkpoint_path))
+            checkpoint = {"offset": 0, "ids_offset": 0, "last_posinset": None, "oldest_timestamp": None}
+        else:
+            self.__check_offsets(checkpoint)
+        self.last_posinset = checkpoint["last_posinset"]
+        self.oldest_timestamp = checkpoint["oldest_timestamp"]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.__file = self.__open(path, checkpoint["offset"])
+        self.__ids_file = self.__open(self.ids_path, checkpoint["ids_offset"])
+        # IDs of the posts already in the file, the scraper skips them
+        self.seen_ids = set(json.loads(line) for line in self.__read_ids(checkpoint["ids_offset"]))
+        self.written = len(self.seen_ids)
+        if not resume:
+            # a checkpoint left by a previous run would point past the started over files
+            self.__write_checkpoint()
+
+    @staticmethod
+    def __load_compressor(compression):
+        """returns function compressing one chunk of bytes into a self-contained gzip member or zstd frame"""
+        if compression == "gzip":
+            return gzip.compress
+        if compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError('zstd compression requires the zstandard package, '
+                                  'install it with: pip install "facebook_page_scraper[zstd]"')
+            return zstandard.ZstdCompressor().compress
+        return None
+
+    @staticmethod
+    def __open(path, offset):
+        """opens the file for writing after offset, whatever was appended after the last checkpoint, e.g by a crashed
+        run, is dropped"""
+        opened = open(path, "r+b" if offset and os.path.exists(path) else "wb")
+        opened.truncate(offset)
+        opened.seek(offset)
+        return opened
+
+    def __check_offsets(self, checkpoint):
+        """raises an exception if the file or the IDs file is shorter than the checkpoint says, e.g it was replaced
+        or cut since, instead of padding it up to the checkpoint"""
+        for path, offset in ((self.path, checkpoint["offset"]), (self.ids_path, checkpoint["ids_offset"])):
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if offset > size:
+                raise Exception("Can't resume {}, {} is {} bytes long but its checkpoint {} expects {}".format(
+                    self.path, path, size, self.checkpoint_path, offset))
+
+    def __read_ids(self, offset):
+        """returns the lines of the IDs file up to offset"""
+        if not offset:
+            return []
+        self.__ids_file.seek(0)
+        lines = self.__ids_file.read(offset).decode("utf-8").splitlines()
+        self.__ids_file.seek(offset)
+        return lines
+
+    def __read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as checkpoint_file:
+                return json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+
+    def __write_checkpoint(self):
+        checkpoint = {
+            "offset": self.__file.tell(),
+            "ids_offset": self.__ids_file.tell(),
+            "last_posinset": self.last_posinset,
+            "oldest_timestamp": self.oldest_timestamp,
+            "updated_at": time.time(),
+        }
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.checkpoint_path)),
+                                                      suffix=".json")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def header(self):
+        """returns text written once at the top of the file"""
+        return ""
+
+    def serialize(self, post_id, post):
+        """returns text of one post, implemented by the sinks"""
+        raise NotImplementedError
+
+    def write(self, post_id, post, posinset=None):
+        """appends the post, posinset is the feed position reached when it was scraped"""
+        if post_id in self.seen_ids:
+            return False
+        if self.__file.tell() == 0 and not self.__buffer:
+            self.__buffer.append(self.header())
+        self.__buffer.append(self.serialize(post_id, post))
+        self.__buffered_ids.append(post_id)
+        self.seen_ids.add(post_id)
+        self.written += 1
+        if posinset is not None:
+            self.last_posinset = posinset
+        if _older(post.get("posted_on"), self.oldest_timestamp):
+            self.oldest_timestamp = post.get("posted_on")
+        if len(self.__buffered_ids) >= self.flush_every or time.time() - self.__last_flush >= self.flush_interval:
+            self.flush()
+        return True
+
+    def flush(self):
+        """appends the buffered posts to the file, their IDs to the IDs file and writes the checkpoint"""
+        if self.__buffer:
+            data = "".join(self.__buffer).encode("utf-8")
+            self.__file.write(self.__compressor(data) if self.__compressor else data)
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__buffer = []
+        if self.__buffered_ids:
+            self.__ids_file.write("".join(json.dumps(post_id) + "\n" for post_id in self.__buffered_ids).encode("utf-8"))
+            self.__ids_file.flush()
+            os.fsync(self.__ids_file.fileno())
+            self.__buffered_ids = []
+        self.__write_checkpoint()
+        self.__last_flush = time.time()
+
+    def close(self):
+        if self.__file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.__file.close()
+            self.__ids_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Jsonl_sink(Post_sink):
+    """writes one JSON object per line, the post's data along with its "id" """
+
+    def serialize(self, post_id, post):
+        return json.dumps(dict(post, id=post_id), ensure_ascii=False) + "\n"
+
+
+class Csv_sink(Post_sink):
+    """writes the posts as rows of the same CSV file as Facebook_scraper.scrap_to_csv"""
+
+    FIELDNAMES = ['id', 'name', 'shares', 'likes', 'loves', 'wow', 'cares', 'sad', 'angry', 'haha', 'reactions_count',
+                  'comments', 'content', 'posted_on', 'video', 'images', 'post_url']
+    REACTION_COLUMNS = ('likes', 'loves', 'wow', 'cares', 'sad', 'angry', 'haha')
+    # value written when the post doesn't have the column's key
+    COLUMN_DEFAULTS = {'name': '', 'shares': 0, 'comments': '', 'content': '', 'posted_on': '', 'video': '', 'post_url': ''}
+    # columns written for each of the post's fields, "id" is always written
+    FIELD_COLUMNS = {
+        'name': ['name'],
+        'shares': ['shares'],
+        'reactions': list(REACTION_COLUMNS),
+        'reaction_count': ['reactions_count'],
+        'comments': ['comments'],
+        'content': ['content'],
+        'posted_on': ['posted_on'],
+        'video': ['video'],
+        'images': ['images'],
+        'post_url': ['post_url'],
+    }
+
+    def __init__(self, path, compression=None, flush_every=50, flush_interval=10, resume=False, fields=None):
+        # the columns follow the fields the scraper extracts, see Facebook_scraper's fields
+        self.fieldnames = self.columns(fields)
+        super().__init__(path, compression, flush_every, flush_interval, resume)
+
+    @staticmethod
+    def columns(fields=None):
+        """returns the CSV columns of the given post's fields, all of them if fields is None"""
+        if fields is None:
+            return list(Csv_sink.FIELDNAMES)
+        projected = {column for field in fields for column in Csv_sink.FIELD_COLUMNS.get(field, [])}
+        return [column for column in Csv_sink.FIELDNAMES if column == 'id' or column in projected]
+
+    @staticmethod
+    def __values(post_id, post, columns):
+        """returns the values of the post's CSV row in the order of columns, read straight from the post"""
+        reactions = post.get('reactions') or {}
+        values = []
+        for column in columns:
+            if column == 'id':
+                values.append(post_id)
+            elif column in Csv_sink.REACTION_COLUMNS:
+                values.append(reactions.get(column, 0))
+            elif column == 'reactions_count':
+                values.append(post.get('reaction_count', 0))
+            elif column == 'images':
+                values.append(" ".join(post.get('images') or []))  # Join images list into a string
+            else:
+                values.append(post.get(column, Csv_sink.COLUMN_DEFAULTS[column]))
+        return values
+
+    def __to_text(self, values):
+        text = io.StringIO()
+        csv.writer(text).writerow(values)
+        return text.getvalue()
+
+    def header(self):
+        return self.__to_text(self.fieldnames)
+
+    def serialize(self, post_id, post):
+        return self.__to_text(self.__values(post_id, post, self.fieldnames))
+
+
+class Parquet_sink:
+    """
+    Writes the posts to a Parquet file while they are scraped, one row group every row_group_size posts, with the
+    columns of Csv_sink along with user_url: one per reaction, images and video as list columns, posted_on as a UTC
+    timestamp and the counts as integers, missing values are nulls. The columns of dictionary_columns, repeated across the posts of a feed,
+    are dictionary encoded. Requires pyarrow, install it with: pip install "facebook_page_scraper[parquet]".
+
+    Parquet files can't be appended to: the file is started over on every run, and is only readable once the sink
+    is closed
+    """
+
+    DICTIONARY_COLUMNS = ('name', 'user_url')
+    INTEGER_COLUMNS = ('shares', 'reactions_count', 'comments') + Csv_sink.REACTION_COLUMNS
+    LIST_COLUMNS = ('images', 'video')
+
+    def __init__(self, path, row_group_size=10000, compression="snappy", fields=None,
+                 dictionary_columns=DICTIONARY_COLUMNS):
+        pyarrow, parquet = self.__load_pyarrow()
+        self.path = path
+        self.row_group_size = row_group_size
+        # the columns follow the fields the scraper extracts, see Facebook_scraper's fields
+        self.fieldnames = self.columns(fields)
+        self.dictionary_columns = [column for column in dictionary_columns if column in self.fieldnames]
+        self.schema = self.__schema(pyarrow, self.fieldnames, self.dictionary_columns)
+        # IDs of the posts already in the file, the scraper skips them
+        self.seen_ids = set()
+        self.last_posinset = None
+        self.oldest_timestamp = None
+        self.written = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.__pyarrow = pyarrow
+        self.__writer = parquet.ParquetWriter(path, self.schema, compression=compression,
+                                              use_dictionary=self.dictionary_columns or False)
+        self.__columns = {column: [] for column in self.fieldnames}
+        self.__buffered_posts = 0
+
+    @staticmethod
+    def columns(fields=None):
+        """returns the columns written for fields, the ones of Csv_sink along with user_url, after name"""
+        columns = Csv_sink.columns(fields)
+        if fields is None or 'user_url' in fields:
+            columns.insert(columns.index('name') + 1 if 'name' in columns else 1, 'user_url')
+        return columns
+
+    @staticmethod
+    def __load_pyarrow():
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Parquet and Arrow outputs require the pyarrow package, '
+                              'install it with: pip install "facebook_page_scraper[parquet]"')
+        return pyarrow, pyarrow.parquet
+
+    @staticmethod
+    def __schema(pyarrow, columns, dictionary_columns):
+        types = []
+        for column in columns:
+            if column in Parquet_sink.INTEGER_COLUMNS:
+                column_type = pyarrow.int64()
+            elif column in Parquet_sink.LIST_COLUMNS:
+                column_type = pyarrow.list_(pyarrow.string())
+            elif column == 'posted_on':
+                column_type = pyarrow.timestamp('ms', tz='UTC')
+            elif column in dictionary_columns:
+                column_type = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+            else:
+                column_type = pyarrow.string()
+            types.append(pyarrow.field(column, column_type))
+        return pyarrow.schema(types)
+
+    @staticmethod
+    def __append(columns, post_id, post):
+        """appends the values of the post to columns, dictionary of column name: list of values"""
+        reactions = post.get('reactions') or {}
+        for column, values in columns.items():
+            if column == 'id':
+                value = post_id
+            elif column in Csv_sink.REACTION_COLUMNS:
+                value = reactions.get(column)
+            elif column == 'reactions_count':
+                value = post.get('reaction_count')
+            elif column == 'posted_on':
+                value = _datetime(post.get('posted_on'))
+            else:
+                value = post.get(column)
+            if column in Parquet_sink.INTEGER_COLUMNS:
+                value = _integer(value)
+            elif column in Parquet_sink.LIST_COLUMNS and isinstance(value, str):
+                value = [value] if value else []
+            values.append(value)
+
+    @staticmethod
+    def __to_table(pyarrow, schema, columns):
+        """returns the buffered columns as an Arrow table of schema"""
+        arrays = []
+        for field in schema:
+            if pyarrow.types.is_dictionary(field.type):
+                arrays.append(pyarrow.array(columns[field.name], type=field.type.value_type).dictionary_encode())
+            else:
+                arrays.append(pyarrow.array(columns[field.name], type=field.type))
+        return pyarrow.Table.from_arrays(arrays, schema=schema)
+
+    @staticmethod
+    def table(posts, fields=None, dictionary_columns=DICTIONARY_COLUMNS, batch_size=10000):
+        """expects iterable of (post ID, post) tuples, returns pyarrow Table with the columns of the Parquet file.
+        Posts are converted batch_size at a time, so only the table is held in memory"""
+        pyarrow, _ = Parquet_sink.__load_pyarrow()
+        fieldnames = Parquet_sink.columns(fields)
+        dictionary_columns = [column for column in dictionary_columns if column in fieldnames]
+        schema = Parquet_sink.__schema(pyarrow, fieldnames, dictionary_columns)
+        batches = []
+        columns = {column: [] for column in fieldnames}
+        for index, (post_id, post) in enumerate(posts, 1):
+            Parquet_sink.__append(columns, post_id, post)
+            if index % batch_size == 0:
+                batches.append(Parquet_sink.__to_table(pyarrow, schema, columns))
+                columns = {column: [] for column in fieldnames}
+        batches.append(Parquet_sink.__to_table(pyarrow, schema, columns))
+        # batches have their own dictionaries, unified so that the table has a single one per column
+        return pyarrow.concat_tables(batches).unify_dictionaries().combine_chunks()
+
+    def write(self, post_id, post, posinset=None):
+        """appends the post, posinset is the feed position reached when it was scraped"""
+        if post_id in self.seen_ids:
+            return False
+        self.__append(self.__columns, post_id, post)
+        self.__buffered_posts += 1
+        self.seen_ids.add(post_id)
+        self.written += 1
+        if posinset is not None:
+            self.last_posinset = posinset
+        if _older(post.get("posted_on"), self.oldest_timestamp):
+            self.oldest_timestamp = post.get("posted_on")
+        if self.__buffered_posts >= self.row_group_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """writes the buffered posts as one row group"""
+        if not self.__buffered_posts:
+            return
+        table = self.__to_table(self.__pyarrow, self.schema, self.__columns)
+        self.__writer.write_table(table, row_group_size=self.__buffered_posts)
+        self.__columns = {column: [] for column in self.fieldnames}
+        self.__buffered_posts = 0
+
+    def close(self):
+        if self.__writer is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self.__writer.close()
+            self.__writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Sqlite_sink:
+    """
+    Keeps the latest state of every scraped post in a SQLite database, so that pages re-scraped many times a day
+    update their posts rather than adding rows. Tables:
+
+    posts (post_id, page, name, user_url, content, post_url, posted_on, shares, reaction_count, comments, error,
+    first_seen, last_seen), reactions (post_id, reaction, count) and media (post_id, kind, position, url, path, sha256),
+    kind being "image" or "video" and path, sha256 set by Media_downloader.
+
+    Posts are upserted by post ID in one transaction every batch_size posts or flush_interval seconds. Fields missing
+    from the post, e.g not requested with Facebook_scraper's fields, keep their stored value. The database is in WAL
+    mode, readers don't block the writer. The error of a post is the one of its last scrape
+    """
+
+    POST_COLUMNS = ('page', 'name', 'user_url', 'content', 'post_url', 'posted_on', 'shares', 'reaction_count',
+                    'comments', 'error')
+    INTEGER_COLUMNS = ('shares', 'reaction_count', 'comments')
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS posts ("
+        " post_id TEXT PRIMARY KEY, page TEXT, name TEXT, user_url TEXT, content TEXT, post_url TEXT, posted_on TEXT,"
+        " shares INTEGER, reaction_count INTEGER, comments INTEGER, error TEXT,"
+        " first_seen REAL NOT NULL, last_seen REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS posts_page ON posts (page, posted_on)",
+        "CREATE TABLE IF NOT EXISTS reactions ("
+        " post_id TEXT NOT NULL REFERENCES posts (post_id), reaction TEXT NOT NULL, count INTEGER NOT NULL,"
+        " PRIMARY KEY (post_id, reaction)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS media ("
+        " post_id TEXT NOT NULL REFERENCES posts (post_id), kind TEXT NOT NULL, position INTEGER NOT NULL,"
+        " url TEXT NOT NULL, path TEXT, sha256 TEXT, PRIMARY KEY (post_id, kind, position)) WITHOUT ROWID",
+    )
+
+    def __init__(self, path, page=None, batch_size=500, flush_interval=10):
+        self.path = path
+        # page or group the posts come from, Facebook_scraper.scrap_to_sqlite sets it
+        self.page = page
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # IDs of the posts written by this run, stored posts are not skipped so that their counts are updated
+        self.seen_ids = set()
+        self.last_posinset = None
+        self.oldest_timestamp = None
+        self.written = 0
+        self.__buffer = []
+        self.__last_flush = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.__lock = threading.Lock()
+        # waits for the other processes writing to the same database instead of failing right away
+        self.__connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            # in WAL mode commits stay consistent without waiting for the disk on every transaction
+            self.__connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                self.__connection.execute(statement)
+
+    @staticmethod
+    def __media_rows(post_id, post):
+        """returns the (post_id, kind, position, url, path, sha256) rows of the post's images and videos"""
+        downloaded = {media["url"]: media for media in post.get("media") or [] if isinstance(media, dict)}
+        rows = []
+        for kind, key in (("image", "images"), ("video", "video")):
+            urls = post.get(key) or []
+            if isinstance(urls, str):
+                urls = [urls]
+            for position, url in enumerate(urls):
+                media = downloaded.get(url, {})
+                rows.append((post_id, kind, position, url, media.get("path"), media.get("sha256")))
+        return rows
+
+    def write(self, post_id, post, posinset=None):
+        """buffers the post's upsert, posinset is the feed position reached when it was scraped"""
+        if post_id in self.seen_ids:
+            return False
+        self.__buffer.append((post_id, post))
+        self.seen_ids.add(post_id)
+        self.written += 1
+        if posinset is not None:
+            self.last_posinset = posinset
+        if _older(post.get("posted_on"), self.oldest_timestamp):
+            self.oldest_timestamp = post.get("posted_on")
+        if len(self.__buffer) >= self.batch_size or time.time() - self.__last_flush >= self.flush_interval:
+            self.flush()
+        return True
+
+    def flush(self):
+        """upserts the buffered posts in one transaction"""
+        self.__last_flush = time.time()
+        if not self.__buffer:
+            return
+        now = time.time()
+        post_rows, reaction_rows, media_rows, media_posts = [], [], [], []
+        for post_id, post in self.__buffer:
+            values = dict(post, page=self.page)
+            for column in self.INTEGER_COLUMNS:
+                if column in values:
+                    values[column] = _integer(values[column])
+            post_rows.append([post_id] + [values.get(column) for column in self.POST_COLUMNS] + [now, now])
+            reactions = post.get("reactions")
+            if reactions:
+                reaction_rows.extend((post_id, reaction, _integer(count) or 0)
+                                     for reaction, count in reactions.items())
+            # the media are only replaced when the post has them, e.g not when images weren't requested
+            if "images" in post or "video" in post:
+                media_posts.append((post_id,))
+                media_rows.extend(self.__media_rows(post_id, post))
+        columns = ("post_id",) + self.POST_COLUMNS + ("first_seen", "last_seen")
+        # the error is the one of the last scrape, even when it had none
+        updates = ", ".join("{0} = COALESCE(excluded.{0}, {0})".format(column) if column != "error"
+                            else "error = excluded.error" for column in self.POST_COLUMNS)
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT INTO posts ({}) VALUES ({}) ON CONFLICT (post_id) DO UPDATE SET {},"
+                " last_seen = excluded.last_seen".format(", ".join(columns), ", ".join("?" * len(columns)), updates),
+                post_rows)
+            self.__connection.executemany(
+                "INSERT INTO reactions (post_id, reaction, count) VALUES (?, ?, ?)"
+                " ON CONFLICT (post_id, reaction) DO UPDATE SET count = excluded.count", reaction_rows)
+            self.__connection.executemany("DELETE FROM media WHERE post_id = ?", media_posts)
+            self.__connection.executemany(
+                "INSERT INTO media (post_id, kind, position, url, path, sha256) VALUES (?, ?, ?, ?, ?, ?)", media_rows)
+        self.__buffer = []
+
+    def close(self):
+        with self.__lock:
+            if self.__connection is None:
+                return
+        try:
+            self.flush()
+        finally:
+            with self.__lock:
+                self.__connection.close()
+                self.__connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+format = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ch = logging.StreamHandler()
+ch.setFormatter(format)
+logger.addHandler(ch)
+
+
+class Waits:
+    """
+    Waits for DOM conditions inside the browser, with a MutationObserver and load events, and returns as soon as the
+    condition is met instead of sleeping a fixed time. Every wait has its own timeout and returns False once it expires.
+
+    A politeness delay can be added after every wait by setting wait_jitter, a (minimum, maximum) seconds tuple,
+    on the driver, Facebook_scraper does it with its wait_jitter argument
+    """
+
+    # the script timeout of a WebDriver session defaults to 30s, waits must end before it
+    MAX_TIMEOUT = 25
+
+    CONDITION_SCRIPT = """
+        var kind = arguments[0], target = arguments[1], value = arguments[2], scope = arguments[3] || document;
+        var timeout = arguments[4] * 1000, done = arguments[arguments.length - 1];
+        function met() {
+            switch (kind) {
+                case 'count_above': return scope.querySelectorAll(target).length > value;
+                case 'exists': return scope.querySelector(target) !== null;
+                case 'absent': return scope.querySelector(target) === null;
+                case 'image_loaded': return target.complete && target.naturalWidth > 0;
+                case 'src_changed':
+                    var image = scope.querySelector(target);
+                    return image !== null && image.getAttribute('src') !== value && image.complete && image.naturalWidth > 0;
+                case 'href_changed':
+                    var href = target.getAttribute('href');
+                    return href !== null && href !== value && href.charAt(0) !== '#';
+            }
+            return true;
+        }
+        if (met()) { done(true); return; }
+        var finished = false;
+        function finish(result) {
+            if (finished) { return; }
+            finished = true;
+            observer.disconnect();
+            document.removeEventListener('load', check, true);
+            clearTimeout(timer);
+            done(result);
+        }
+        function check() { if (met()) { finish(true); } }
+        var observer = new MutationObserver(check);
+        observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+        // images completing don't mutate the DOM, their load event does not bubble but can be captured
+        document.addEventListener('load', check, true);
+        var timer = setTimeout(function () { finish(met()); }, timeout);
+    """
+
+    @staticmethod
+    def __until(driver, kind, target, value=None, scope=None, timeout=10):
+        """waits up to timeout seconds for the condition, returns True if it was met"""
+        started = time.time()
+        try:
+            met = bool(driver.execute_async_script(
+                Waits.CONDITION_SCRIPT, kind, target, value, scope, min(timeout, Waits.MAX_TIMEOUT)))
+        except Exception as ex:
+            logger.debug("wait for {} failed : {}".format(kind, ex))
+            met = False
+        logger.debug("waited {:.2f}s for {} {}".format(time.time() - started, kind, "" if met else "(timed out)"))
+        Waits.__jitter(driver)
+        return met
+
+    @staticmethod
+    def __jitter(driver):
+        jitter = getattr(driver, "wait_jitter", None)
+        if jitter:
+            time.sleep(random.uniform(*jitter))
+
+    @staticmethod
+    def __count(driver, selector):
+        """returns number of elements matching selector, to wait for new ones after an action"""
+        try:
+            return driver.execute_script("return document.querySelectorAll(arguments[0]).length;", selector)
+        except Exception:
+            return 0
+
+    @staticmethod
+    def __new_elements(driver, selector, known_count, timeout=6):
+        """waits until more than known_count elements match selector, e.g new posts loaded by a scroll"""
+        return Waits.__until(driver, "count_above", selector, known_count, timeout=timeout)
+
+    @staticmethod
+    def __element(driver, selector, scope=None, timeout=10):
+        """waits until an element matches selector, inside the scope element if given"""
+        return Waits.__until(driver, "exists", selector, scope=scope, timeout=timeout)
+
+    @staticmethod
+    def __element_gone(driver, selector, timeout=5):
+        """waits until no element matches selector anymore, e.g a dialog being closed"""
+        return Waits.__until(driver, "absent", selector, timeout=timeout)
+
+    @staticmethod
+    def __image_loaded(driver, image, timeout=20):
+        """waits until the img element finished loading"""
+        return Waits.__until(driver, "image_loaded", image, timeout=timeout)
+
+    @staticmethod
+    def __image_changed(driver, selector, previous_src, timeout=5):
+        """waits until the img matching selector shows, fully loaded, another source than previous_src"""
+        return Waits.__until(driver, "src_changed", selector, previous_src, timeout=timeout)
+
+    @staticmethod
+    def __href_changed(driver, link, previous_href, timeout=2):
+        """waits until the link element has a real URL other than previous_href, e.g a post's time link once hovered"""
+        return Waits.__until(driver, "href_changed", link, previous_href, timeout=timeout)
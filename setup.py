@@ -6,7 +6,16 @@ with open("README.md", "r", encoding="utf-8") as file:
 requirements = ['selenium==4.1.0',
                 'webdriver-manager==3.2.2',
                 'selenium-wire==5.1.0',
-                'python-dateutil==2.8.2']
+                'python-dateutil==2.8.2',
+                'urllib3>=1.26']
+
+# optional dependencies, only needed by the features that use them
+extras_requirements = {
+    'html': ['lxml>=4.6', 'cssselect>=1.1'],
+    'zstd': ['zstandard>=0.15'],
+    'parquet': ['pyarrow>=8.0'],
+    'pool': ['psutil>=5.0'],
+}
 
 
 setuptools.setup(
@@ -20,7 +29,7 @@ setuptools.setup(
     license="MIT",
     url="https://github.com/shaikhsajid1111/facebook_page_scraper",
     keywords="web-scraping selenium facebook facebook-pages",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["benchmarks", "benchmarks.*"]),
     classifiers=[
         "Development Status :: 4 - Beta",
         "Environment :: Console",
@@ -42,5 +51,6 @@ setuptools.setup(
 
     ],
     python_requires=">=3.7",
-    install_requires=requirements
+    install_requires=requirements,
+    extras_require=extras_requirements
 )
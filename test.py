@@ -46,6 +46,946 @@ class Test_csv_output(unittest.TestCase):
         self.assertEqual(was_saved,True)
 
 
+class Test_html_parser(unittest.TestCase):
+
+    new_layout_post = """
+        <div data-virtualized="false"><div aria-posinset="1">
+            <b class="html-b"><a href="/Meta">Meta</a></b>
+            <span><a attributionsrc="" role="link" href="https://www.facebook.com/Meta/posts/pfbid0123?__cft__=1"
+                aria-label="January 20, 2022 at 10:43 PM">Jan 20</a></span>
+            <div data-ad-preview="message"><div dir="auto">Hello</div><div dir="auto">World</div></div>
+            <div aria-label="See who reacted to this"><div aria-label="Like: 5K people"></div><div aria-label="Love: 12 people"></div></div>
+            <a href="https://www.facebook.com/photo/?fbid=111&set=a.222"><div><img referrerpolicy="origin" src="https://cdn/1.jpg"></div></a>
+        </div></div>
+    """
+
+    def test_new_layout_post(self):
+        raw_post = facebook_page_scraper.Html_parser._Html_parser__extract_posts([self.new_layout_post], "new", False)[0]
+        self.assertEqual(raw_post["status_url"], "https://www.facebook.com/Meta/posts/pfbid0123?__cft__=1")
+        self.assertEqual(raw_post["name"], "Meta")
+        self.assertEqual(raw_post["user_url"], "https://www.facebook.com/Meta")
+        self.assertEqual(raw_post["content"], "Hello\nWorld")
+        self.assertEqual(raw_post["reactions"], ["Like: 5K people", "Love: 12 people"])
+        self.assertEqual(raw_post["images"], ["https://cdn/1.jpg"])
+        self.assertEqual(raw_post["more_images"], 0)
+
+
+
+class Test_sinks(unittest.TestCase):
+
+    def test_jsonl_resume(self):
+        import gzip
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), "posts.jsonl.gz")
+        sink = facebook_page_scraper.Jsonl_sink(path, compression="gzip", flush_every=2)
+        for post_id in ("1", "2", "3"):
+            sink.write(post_id, {"posted_on": "2022-01-2{}T00:00:00".format(post_id)}, posinset=int(post_id))
+        # post "3" is only buffered, as if the run crashed before the next flush
+        sink._Post_sink__file.close()
+        sink = facebook_page_scraper.Jsonl_sink(path, compression="gzip", flush_every=2, resume=True)
+        self.assertEqual(sink.seen_ids, {"1", "2"})
+        self.assertEqual(sink.last_posinset, 2)
+        self.assertEqual(sink.oldest_timestamp, "2022-01-21T00:00:00")
+        self.assertFalse(sink.write("2", {}))
+        sink.write("3", {})
+        sink.close()
+        with gzip.open(path, "rt", encoding="utf-8") as posts_file:
+            self.assertEqual([json.loads(line)["id"] for line in posts_file], ["1", "2", "3"])
+        # the checkpoint holds the IDs' file length, not the IDs
+        with open(sink.checkpoint_path, encoding="utf-8") as checkpoint_file:
+            self.assertNotIn("seen_ids", json.load(checkpoint_file))
+        # a file can't be resumed without its checkpoint, it is left as it is
+        os.remove(sink.checkpoint_path)
+        with self.assertRaises(Exception):
+            facebook_page_scraper.Jsonl_sink(path, compression="gzip", resume=True)
+        with gzip.open(path, "rt", encoding="utf-8") as posts_file:
+            self.assertEqual(len(posts_file.readlines()), 3)
+
+    def test_restart_checkpoint(self):
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), "posts.jsonl")
+        with facebook_page_scraper.Jsonl_sink(path, flush_every=2) as sink:
+            for post_id in ("1", "2", "3"):
+                sink.write(post_id, {})
+        # a new run starting over crashes before its first flush, its resume starts from the empty files
+        sink = facebook_page_scraper.Jsonl_sink(path, flush_every=2)
+        sink.write("4", {})
+        sink._Post_sink__file.close()
+        sink._Post_sink__ids_file.close()
+        sink = facebook_page_scraper.Jsonl_sink(path, flush_every=2, resume=True)
+        self.assertEqual(sink.seen_ids, set())
+        sink.write("4", {})
+        sink.close()
+        with open(path, encoding="utf-8") as posts_file:
+            self.assertEqual([json.loads(line)["id"] for line in posts_file], ["4"])
+        # a file cut shorter than its checkpoint isn't padded up to it
+        with open(path, "r+b") as posts_file:
+            posts_file.truncate(1)
+        with self.assertRaises(Exception):
+            facebook_page_scraper.Jsonl_sink(path, resume=True)
+        with open(path, "rb") as posts_file:
+            self.assertEqual(posts_file.read(), b"{")
+
+    def test_oldest_timestamp(self):
+        import tempfile
+        with facebook_page_scraper.Jsonl_sink(os.path.join(tempfile.mkdtemp(), "posts.jsonl")) as sink:
+            sink.write("1", {"posted_on": "2022-01-20T10:00:00+02:00"})
+            # later as a string, earlier as a date
+            sink.write("2", {"posted_on": "2022-01-20T09:00:00+05:00"})
+            sink.write("3", {"posted_on": "2022-01-20T08:30:00+02:00"})
+        self.assertEqual(sink.oldest_timestamp, "2022-01-20T09:00:00+05:00")
+
+    def test_csv_projection(self):
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), "posts.csv")
+        with facebook_page_scraper.Csv_sink(path, fields=["post_id", "post_url", "posted_on", "reactions"]) as sink:
+            sink.write("1", {"post_url": "https://www.facebook.com/Meta/posts/1", "posted_on": "2022-01-20T00:00:00",
+                             "reactions": {"likes": 5}})
+        with open(path, encoding="utf-8") as posts_file:
+            header, row = posts_file.read().splitlines()
+        self.assertEqual(header, "id,likes,loves,wow,cares,sad,angry,haha,posted_on,post_url")
+        self.assertEqual(row, "1,5,0,0,0,0,0,0,2022-01-20T00:00:00,https://www.facebook.com/Meta/posts/1")
+
+    def test_csv_append_header(self):
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), "posts.csv")
+        scraper = facebook_page_scraper.Facebook_scraper("page", fields=["post_id", "content"])
+        # a run without any post doesn't create the file
+        scraper._Facebook_scraper__json_to_csv(path, iter([]))
+        self.assertFalse(os.path.exists(path))
+        scraper._Facebook_scraper__json_to_csv(path, iter([("1", {"content": "first"})]))
+        scraper._Facebook_scraper__json_to_csv(path, iter([("2", {"content": "second"})]))
+        with open(path, encoding="utf-8") as posts_file:
+            self.assertEqual(posts_file.read().splitlines(), ["id,content", "1,first", "2,second"])
+        # rows of other columns aren't appended under the existing header
+        scraper = facebook_page_scraper.Facebook_scraper("page", fields=["post_id", "posted_on"])
+        with self.assertRaises(Exception):
+            scraper._Facebook_scraper__json_to_csv(path, iter([("3", {"posted_on": "2022-01-20T00:00:00"})]))
+        with open(path, encoding="utf-8") as posts_file:
+            self.assertEqual(len(posts_file.read().splitlines()), 3)
+
+    def test_parquet_row_groups(self):
+        import tempfile
+        from datetime import datetime, timezone
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow isn't installed")
+        path = os.path.join(tempfile.mkdtemp(), "posts.parquet")
+        with facebook_page_scraper.Parquet_sink(path, row_group_size=2) as sink:
+            for post_id in ("1", "2", "3"):
+                sink.write(post_id, {"name": "Meta", "user_url": "https://www.facebook.com/Meta", "comments": "12",
+                                     "images": ["https://cdn/{}.jpg".format(post_id)], "reactions": {"likes": 5},
+                                     "posted_on": "2022-01-20T00:00:00+02:00"})
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        for column in ("name", "user_url"):
+            self.assertTrue(pyarrow.types.is_dictionary(parquet_file.schema_arrow.field(column).type))
+        row = parquet_file.read().to_pylist()[2]
+        self.assertEqual((row["id"], row["name"], row["user_url"], row["comments"], row["likes"], row["loves"],
+                          row["images"]), ("3", "Meta", "https://www.facebook.com/Meta", 12, 5, None, ["https://cdn/3.jpg"]))
+        # the UTC offset of posted_on is kept
+        self.assertEqual(row["posted_on"], datetime(2022, 1, 19, 22, tzinfo=timezone.utc))
+
+
+    def test_sqlite_upsert(self):
+        import sqlite3
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), "posts.sqlite3")
+        for likes, images in ((5, ["https://cdn/1.jpg", "https://cdn/2.jpg"]), (8, ["https://cdn/1.jpg"])):
+            with facebook_page_scraper.Sqlite_sink(path, page="Meta", batch_size=10) as sink:
+                sink.write("1", {"content": "Hello", "comments": "3", "reactions": {"likes": likes}, "images": images})
+                sink.write("2", {"content": "World"} if likes == 5 else {"shares": 4})
+        connection = sqlite3.connect(path)
+        self.assertEqual(connection.execute("SELECT post_id, page, content, shares, comments FROM posts ORDER BY post_id")
+                         .fetchall(), [("1", "Meta", "Hello", None, 3), ("2", "Meta", "World", 4, None)])
+        self.assertEqual(connection.execute("SELECT count FROM reactions WHERE post_id = '1'").fetchall(), [(8,)])
+        self.assertEqual(connection.execute("SELECT url FROM media").fetchall(), [("https://cdn/1.jpg",)])
+        self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone(), ("wal",))
+        connection.close()
+
+
+class Test_post_index(unittest.TestCase):
+
+    def test_known_posts(self):
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), "post_index.sqlite3")
+        with facebook_page_scraper.Post_index(path) as index:
+            index.add("page", ["123", "pfbid0abc"], "2022-01-20T00:00:00")
+            # a post is known under any of its keys, for its own page only
+            self.assertTrue(index.contains("page", ["NA", "pfbid0abc"]))
+            self.assertFalse(index.contains("other", ["123"]))
+            self.assertFalse(index.contains("page", ["NA", ""]))
+            first_seen = index.last_seen("page")
+            index.touch("page", ["123"])
+            self.assertGreaterEqual(index.last_seen("page"), first_seen)
+            self.assertIsNone(index.last_seen("other"))
+        # the index outlives the run
+        with facebook_page_scraper.Post_index(path) as index:
+            self.assertTrue(index.contains("page", ["123"]))
+
+    def test_stop_after_known(self):
+        import tempfile
+        import time
+        index = facebook_page_scraper.Post_index(os.path.join(tempfile.mkdtemp(), "post_index.sqlite3"))
+        index.add("page", ["1"])
+        index.add("page", ["2"])
+        scraper = facebook_page_scraper.Facebook_scraper("page", post_index=index, stop_after_known=2)
+        # the album of a photo post isn't indexed, the next photos of the album aren't known
+        scraper._Facebook_scraper__scrap_start = time.time()
+        scraper._Facebook_scraper__post_stored("3", {"post_id": "999", "posted_on": "2022-01-20T00:00:00"})
+        self.assertTrue(index.contains("page", ["3"]))
+        self.assertFalse(index.contains("page", ["999"]))
+        self.assertTrue(scraper._Facebook_scraper__known_post(["1"]))
+        self.assertFalse(scraper._Facebook_scraper__reached_known_posts())
+        self.assertTrue(scraper._Facebook_scraper__known_post(["2"]))
+        # two known posts in a row stop the scroll
+        self.assertTrue(scraper._Facebook_scraper__reached_known_posts())
+        index.close()
+
+
+class Test_feed_cursor(unittest.TestCase):
+
+    class Driver:
+        """runs Feed_cursor's script on a list of posts, as dictionaries of their attributes"""
+
+        def __init__(self, posts):
+            self.posts = posts
+
+        def execute_script(self, script, selector, marker, last):
+            posts, positions = [], []
+            for post in self.posts:
+                if marker in post:
+                    continue
+                post[marker] = ""
+                position = post.get("aria-posinset")
+                if last is not None and position is not None and position <= last:
+                    continue
+                posts.append(post)
+                positions.append(position)
+            return [posts, positions]
+
+    def test_next_posts(self):
+        driver = self.Driver([{"id": "1", "aria-posinset": 1}, {"id": "2", "aria-posinset": 2}])
+        cursor = facebook_page_scraper.Feed_cursor(driver, "new", isGroup=False)
+        self.assertEqual(cursor.selector, "div[data-virtualized]")
+        self.assertEqual([post["id"] for post in cursor.next_posts()], ["1", "2"])
+        self.assertTrue(all(facebook_page_scraper.Feed_cursor.MARKER in post for post in driver.posts))
+        self.assertEqual(cursor.position, 2)
+        # marked posts aren't handed over again, a post rendered again loses its mark but is behind the position
+        driver.posts = [driver.posts[0], {"id": "2", "aria-posinset": 2}, {"id": "3", "aria-posinset": 3}]
+        self.assertEqual([post["id"] for post in cursor.next_posts()], ["3"])
+        self.assertEqual(cursor.position, 3)
+        self.assertEqual(cursor.next_posts(), [])
+
+    def test_bounded_keys(self):
+        cursor = facebook_page_scraper.Feed_cursor(self.Driver([]), "old", isGroup=False, max_keys=2)
+        for key in ("1", "2"):
+            cursor.add(key)
+        # seen keys are kept as recent, the oldest one is forgotten
+        self.assertTrue(cursor.seen("1"))
+        cursor.add("3")
+        self.assertEqual([cursor.seen(key) for key in ("1", "2", "3")], [True, False, True])
+        # the old layout has no aria-posinset
+        cursor.driver.posts = [{"id": "1"}]
+        cursor.next_posts()
+        self.assertIsNone(cursor.position)
+
+
+class Test_iter_posts(unittest.TestCase):
+
+    class Driver(Test_feed_cursor.Driver):
+
+        def get(self, url):
+            pass
+
+        def set_window_size(self, width, height):
+            pass
+
+    class Post(dict):
+        """post of the feed, as a dictionary of its attributes, without any child element"""
+
+        def find_elements(self, by, value):
+            return []
+
+    class Pool:
+        logged_in = False
+
+        def __init__(self, driver, layout="new"):
+            self.driver, self.released, self.__layout = driver, [], layout
+
+        def borrow(self):
+            return self.driver
+
+        def layout(self, driver):
+            return self.__layout
+
+        def release(self, driver):
+            self.released.append(driver)
+
+    def scraped(self, posts_count, skip_posts, taken, fields=("post_id", "post_url"), layout="new", posts=None,
+                stopped=False, driver_class=None, read_post_keys=False, **options):
+        """returns the post IDs taken from iter_posts on a feed of 5 posts, and the browsers given back. The posts
+        taken are added to posts if given, with stopped the scraper is stopped before the first post is asked for.
+        options are given to Facebook_scraper, e.g extraction_mode along with the driver_class running its script.
+        With read_post_keys the post keys are read by Finder from the links driver_class gives, else they are the IDs"""
+        from unittest import mock
+        from facebook_page_scraper.element_finder import Finder
+        from facebook_page_scraper.driver_utilities import Utilities
+        pool = self.Pool((driver_class or self.Driver)([self.Post(id=str(position), **{"aria-posinset": position})
+                                                       for position in range(1, 6)]), layout)
+        scraper = facebook_page_scraper.Facebook_scraper("page", posts_count=posts_count, driver_pool=pool,
+                                                         fields=list(fields) if fields is not None else None, **options)
+        with mock.patch.object(Finder, "_Finder__accept_cookies", lambda driver: None), \
+                mock.patch.object(Utilities, "_Utilities__close_error_popup", lambda driver: None), \
+                mock.patch.object(Utilities, "_Utilities__wait_for_element_to_appear", lambda *args: True), \
+                mock.patch.object(Utilities, "_Utilities__close_modern_layout_signup_modal", lambda driver: None), \
+                mock.patch.object(Utilities, "_Utilities__close_cookie_consent_modern_layout", lambda driver: None), \
+                mock.patch.object(Utilities, "_Utilities__scroll_down", lambda driver, layout: None), \
+                mock.patch.object(Finder, "_Finder__find_post_key", Finder.__dict__["_Finder__find_post_key"] if read_post_keys
+                                  else lambda post, layout, driver: [post["id"]]), \
+                mock.patch.object(Finder, "_Finder__find_status", lambda post, *args, **kwargs: (
+                    post["id"], "https://facebook.com/" + post["id"], None)), \
+                mock.patch.object(Finder, "_Finder__find_content", lambda post, driver, layout: "text " + post["id"]), \
+                mock.patch.object(Finder, "_Finder__find_posted_time", lambda *args, **kwargs: "2022-01-20T00:00:00"):
+            generator = scraper.iter_posts(skip_posts=skip_posts)
+            if stopped:
+                scraper.stop()
+            taken_posts = [post for _, post in zip(range(taken), generator)]
+            released_before_close = len(pool.released)
+            generator.close()
+        if posts is not None:
+            posts.extend(taken_posts)
+        return [post_id for post_id, _ in taken_posts], released_before_close, len(pool.released)
+
+    def test_skip_posts(self):
+        # skipped posts are neither extracted nor counted, the run ends with the feed
+        self.assertEqual(self.scraped(10, {"2", "4"}, 10), (["1", "3", "5"], 1, 1))
+
+    def test_stopped_run(self):
+        from unittest import mock
+        scraper = facebook_page_scraper.Facebook_scraper("page")
+        scraper.stop()
+        # stop() ended the previous run only, the next one starts over
+        with mock.patch.object(facebook_page_scraper.Facebook_scraper, "_Facebook_scraper__start_driver",
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                next(scraper.iter_posts())
+        self.assertFalse(scraper._Facebook_scraper__stopped)
+
+    def test_stop_before_first_post(self):
+        # a stop() sent once iter_posts returned ends the run before its first post
+        self.assertEqual(self.scraped(10, None, 10, stopped=True), ([], 1, 1))
+
+    def test_old_layout_projection(self):
+        # the old layout's posts keep the ID of their status link, without looking for their images
+        posts = []
+        self.assertEqual(self.scraped(2, None, 2, fields=("post_id", "post_url", "posted_on", "content"), layout="old",
+                                      posts=posts)[0], ["1", "2"])
+        self.assertEqual(posts[0][1], {"post_id": "1", "post_url": "https://facebook.com/1",
+                                       "posted_on": "2022-01-20T00:00:00", "content": "text 1"})
+
+    class Album_driver(Driver):
+        """every post is a photo of the same album sharing the same post, its time link was hovered before"""
+
+        def execute_script(self, script, *args):
+            if isinstance(args[0], dict):
+                return ["https://www.facebook.com/Meta", "https://www.facebook.com/photo/?fbid=11{}&set=a.999".format(
+                    args[0]["id"]), "https://www.facebook.com/Shared/posts/777"]
+            return super().execute_script(script, *args)
+
+    def test_same_album(self):
+        # the posts are told apart by their own photo, not by their album nor by the post they share
+        self.assertEqual(self.scraped(5, None, 5, driver_class=self.Album_driver, read_post_keys=True)[0],
+                         ["1", "2", "3", "4", "5"])
+        self.assertEqual(self.scraped(5, {"112", "777", "999"}, 5, driver_class=self.Album_driver,
+                                      read_post_keys=True)[0], ["1", "3", "4", "5"])
+
+    def test_early_close(self):
+        # closing the generator before posts_count gives the browser back
+        self.assertEqual(self.scraped(10, None, 2), (["1", "2"], 0, 1))
+
+
+class Test_driver_profiler(unittest.TestCase):
+
+    class Driver:
+        """answers every command, the scripts go through execute like they do with selenium's drivers"""
+
+        def __init__(self):
+            self.commands = []
+
+        def execute(self, driver_command, params=None):
+            self.commands.append(driver_command)
+            return {"value": {"sources": [], "links": [], "hidden": 0}}
+
+        def execute_script(self, script, *args):
+            return self.execute("executeScript", {"script": script, "args": list(args)})["value"]
+
+    def test_attribution(self):
+        from facebook_page_scraper.element_finder import Finder
+        profiler = facebook_page_scraper.Driver_profiler()
+        driver = profiler.wrap(self.Driver())
+        driver.execute("get", {"url": "https://facebook.com/page"})
+        profiler.start_post("post #1")
+        Finder._Finder__find_images_fast(None, driver)
+        Finder._Finder__find_images_fast(None, driver)
+        # the post's commands follow it once it is renamed after its ID
+        profiler.rename_current_post("123")
+        profiler.start_post(None)
+        report = profiler.report()
+        self.assertEqual((report["commands"], report["posts"], report["commands_per_post"]), (3, 1, 3))
+        self.assertEqual(report["commands_outside_posts"], 1)
+        self.assertEqual({row["command"]: row["commands"] for row in report["by_command"]}, {"get": 1, "executeScript": 2})
+        self.assertEqual({row["method"]: row["commands"] for row in report["by_method"]},
+                         {"(outside of the scraper)": 1, "Finder.__find_images_fast": 2})
+        self.assertEqual([(row["post"], row["commands"]) for row in report["slowest_posts"]], [("123", 2)])
+        profiler.unwrap(driver)
+        driver.execute("get")
+        self.assertEqual(profiler.report()["commands"], 3)
+
+    def test_profile_per_run(self):
+        from unittest import mock
+        scraper = facebook_page_scraper.Facebook_scraper("page", profile=True)
+        profilers = [scraper.profiler]
+        scraper.profile = {"commands": 3}
+        with mock.patch.object(facebook_page_scraper.Facebook_scraper, "_Facebook_scraper__start_driver",
+                               side_effect=RuntimeError):
+            for _ in range(2):
+                with self.assertRaises(RuntimeError):
+                    next(scraper.iter_posts())
+                profilers.append(scraper.profiler)
+        # every run starts a new profile rather than adding up to the previous runs'
+        self.assertEqual(len(set(map(id, profilers))), 3)
+        self.assertIsNone(scraper.profile)
+
+
+class Test_script_extractor(unittest.TestCase):
+
+    class Driver(Test_iter_posts.Driver):
+        """returns the same raw values for every post, like Script_extractor's script"""
+
+        batches = []
+        raw = {"shares": "1.2K", "comments": ["", "12"], "reactions": ["Like: 5K people", "Love: 12 people"],
+               "time": "January 20, 2022 at 10:43 PM", "content": "Hello", "name": "Meta",
+               "user_url": "https://www.facebook.com/Meta", "images": ["https://cdn/1.jpg"],
+               "image_links": ["https://www.facebook.com/photo/?fbid=111&set=a.222"],
+               "videos": [],
+               "video_links": ["https://www.facebook.com/Meta/videos/333", "https://www.facebook.com/Meta/videos/333?t=5"],
+               "more_images": 0}
+
+        def execute_async_script(self, script, posts, layout, isGroup):
+            Test_script_extractor.Driver.batches.append(len(posts))
+            if any(post["id"] == "fail" for post in posts):
+                raise Exception("script timeout")
+            return [dict(self.raw, post=post,
+                         status_url="https://www.facebook.com/Meta/posts/{}?__cft__=1".format(post["id"])) for post in posts]
+
+    def test_batches(self):
+        self.Driver.batches = []
+        posts = [{"id": str(position)} for position in range(30)] + [{"id": "fail"}]
+        extract_posts = facebook_page_scraper.Script_extractor._Script_extractor__extract_posts
+        raw_posts = extract_posts(self.Driver([]), posts, "new", False)
+        # one call per BATCH_SIZE posts, a failed batch is left out
+        self.assertEqual(self.Driver.batches, [25, 6])
+        self.assertEqual(len(raw_posts), 25)
+        raw_posts = extract_posts(self.Driver([]), posts[:30], "new", False)
+        self.assertEqual([raw["post"]["id"] for raw in raw_posts], [str(position) for position in range(30)])
+
+    def test_conversion(self):
+        posts = []
+        Test_iter_posts().scraped(2, None, 2, fields=None, posts=posts, driver_class=self.Driver,
+                                  extraction_mode="script")
+        post_id, post = posts[0]
+        # the photo set of the first image gives the post ID, the status link the URL without its query
+        self.assertEqual((post_id, post["post_id"], post["post_url"]),
+                         ("1", "222", "https://www.facebook.com/Meta/posts/1"))
+        self.assertEqual((post["shares"], post["comments"]), (1200, 12))
+        self.assertEqual((post["reactions"]["likes"], post["reactions"]["loves"], post["reaction_count"]),
+                         (5000, 12, 5012))
+        self.assertEqual(post["posted_on"], "2022-01-20T22:43:00")
+        # one link per video ID
+        self.assertEqual(post["video"], ["https://www.facebook.com/Meta/videos/333"])
+        self.assertEqual((post["name"], post["content"], post["images"]), ("Meta", "Hello", ["https://cdn/1.jpg"]))
+
+
+class Test_find_images_fast(unittest.TestCase):
+
+    class Driver:
+        """answers the images script with the post's tiles, and the fetch of the photo set's page with page"""
+
+        def __init__(self, photo_ids, hidden, page=None):
+            self.found = {"sources": ["https://cdn/{}.jpg".format(photo_id) for photo_id in photo_ids],
+                          "links": ["https://www.facebook.com/photo/?fbid={}&set=a.222".format(photo_id)
+                                    for photo_id in photo_ids],
+                          "hidden": hidden}
+            self.page, self.fetched = page, []
+
+        def execute_script(self, script, post):
+            return self.found
+
+        def execute_async_script(self, script, url, timeout):
+            self.fetched.append(url)
+            return self.page
+
+    @staticmethod
+    def photo_set_page(photo_ids):
+        photos = [{"__typename": "Photo", "id": str(photo_id), "image": {"uri": "https://cdn/full/{}.jpg".format(photo_id)}}
+                  for photo_id in photo_ids]
+        return '<html><script type="application/json" data-sjs>{}</script></html>'.format(
+            json.dumps({"require": [{"media": {"edges": [{"node": photo} for photo in photos]}}]}))
+
+    def find_images(self, driver):
+        from facebook_page_scraper.element_finder import Finder
+        return Finder._Finder__find_images_fast(None, driver)
+
+    def test_shown_images(self):
+        driver = self.Driver([11, 12], 0)
+        self.assertEqual(self.find_images(driver), {"images": ["https://cdn/11.jpg", "https://cdn/12.jpg"], "post_id": "222"})
+        self.assertEqual(driver.fetched, [])
+        self.assertEqual(self.find_images(self.Driver([], 0)), {"images": [], "post_id": None})
+
+    def test_hidden_images(self):
+        # the set is an album listing photos before the post's ones, the post has 3 tiles and "+2"
+        driver = self.Driver([11, 12, 13], 2, self.photo_set_page(range(9, 17)))
+        self.assertEqual(self.find_images(driver), {
+            "images": ["https://cdn/full/{}.jpg".format(photo_id) for photo_id in range(11, 16)], "post_id": "222"})
+        self.assertEqual(driver.fetched, ["https://www.facebook.com/media/set/?set=a.222&type=3"])
+        # the set's page doesn't list them all, or couldn't be fetched, the photo viewer is used instead
+        self.assertIsNone(self.find_images(self.Driver([11, 12, 13], 2, self.photo_set_page(range(11, 14)))))
+        self.assertIsNone(self.find_images(self.Driver([11, 12, 13], 2)))
+
+
+class Test_driver_pool(unittest.TestCase):
+
+    class Driver:
+        launched = 0
+
+        def __init__(self):
+            Test_driver_pool.Driver.launched += 1
+            self.session_id = str(self.launched)
+            self.alive = True
+            self.window_handles = ["main"]
+            self.switch_to = self
+
+        def window(self, handle):
+            pass
+
+        def get(self, url):
+            pass
+
+        def set_window_size(self, width, height):
+            pass
+
+        def execute_script(self, script):
+            if not self.alive:
+                raise Exception("invalid session id")
+            return 1
+
+    def test_dead_idle_browser(self):
+        from unittest import mock
+        from facebook_page_scraper.driver_utilities import Utilities
+        closed = []
+        with mock.patch("facebook_page_scraper.driver_pool.Initializer") as initializer, \
+                mock.patch.object(Utilities, "_Utilities__close_driver", closed.append):
+            initializer.return_value.init.side_effect = lambda *args, **kwargs: self.Driver()
+            pool = facebook_page_scraper.Driver_pool(size=1).start()
+            driver = pool.borrow()
+            pool.release(driver)
+            self.assertEqual(closed, [])
+            # the browser crashed while idle, it is replaced instead of being handed out
+            driver.alive = False
+            replacement = pool.borrow()
+        self.assertIsNot(replacement, driver)
+        self.assertEqual(closed, [driver])
+        self.assertEqual(pool.busy, 1)
+
+    def test_failed_replacement(self):
+        import threading
+        from unittest import mock
+        from facebook_page_scraper.driver_utilities import Utilities
+        launches, busy = [], []
+
+        def launch(*args, **kwargs):
+            # the slot reserved while the browser starts isn't a borrowed browser
+            busy.append(pool.busy)
+            launches.append(None)
+            if len(launches) == 2:
+                raise Exception("browser failed to start")
+            return self.Driver()
+
+        with mock.patch("facebook_page_scraper.driver_pool.Initializer") as initializer, \
+                mock.patch.object(Utilities, "_Utilities__close_driver", lambda driver: None):
+            initializer.return_value.init.side_effect = launch
+            pool = facebook_page_scraper.Driver_pool(size=1)
+            driver = pool.borrow()
+            borrowed = []
+            waiter = threading.Thread(target=lambda: borrowed.append(pool.borrow()), daemon=True)
+            waiter.start()
+            waiter.join(0.2)
+            # the browser crashed during its job and its replacement fails to launch, the waiting borrower launches it
+            driver.alive = False
+            pool.release(driver)
+            waiter.join(5)
+        self.assertEqual(len(borrowed), 1)
+        self.assertEqual(len(launches), 3)
+        self.assertEqual(busy, [0, 0, 0])
+        self.assertEqual(pool.busy, 1)
+
+
+class Test_session_store(unittest.TestCase):
+
+    class Driver:
+        """browser holding cookies and localStorage"""
+
+        def __init__(self, cookies=(), local_storage=None):
+            self.cookies = {cookie["name"]: dict(cookie) for cookie in cookies}
+            self.local_storage = dict(local_storage or {})
+            self.login_form = False
+
+        def get(self, url):
+            pass
+
+        def get_cookie(self, name):
+            return self.cookies.get(name)
+
+        def get_cookies(self):
+            return list(self.cookies.values())
+
+        def add_cookie(self, cookie):
+            self.cookies[cookie["name"]] = cookie
+
+        def execute_script(self, script, *args):
+            if args:
+                self.local_storage.update(args[0])
+            return dict(self.local_storage)
+
+        def find_elements(self, by, value):
+            return ["input"] if self.login_form else []
+
+    def test_save_restore(self):
+        import tempfile
+        import time
+        store = facebook_page_scraper.Session_store(tempfile.mkdtemp())
+        logged_in = self.Driver([{"name": "c_user", "value": "1", "expiry": time.time() + 3600, "sameSite": "None"}],
+                                {"key": "value"})
+        self.assertTrue(store.save(logged_in, "account"))
+        # the session file is named after the account's hash
+        self.assertNotIn("account", "".join(os.listdir(store.directory)))
+        self.assertIsNone(store.load("other"))
+        driver = self.Driver()
+        self.assertTrue(store.restore(driver, "account"))
+        self.assertEqual(driver.local_storage, {"key": "value"})
+        self.assertNotIn("sameSite", driver.get_cookie("c_user"))
+        self.assertTrue(facebook_page_scraper.Session_store.is_logged_in(driver))
+        # facebook shows the login form again once the session was revoked
+        driver.login_form = True
+        self.assertFalse(facebook_page_scraper.Session_store.is_logged_in(driver))
+        store.invalidate("account")
+        self.assertFalse(store.restore(self.Driver(), "account"))
+
+    def test_expired_session(self):
+        import tempfile
+        import time
+        store = facebook_page_scraper.Session_store(tempfile.mkdtemp())
+        self.assertTrue(store.save(self.Driver([{"name": "c_user", "value": "1", "expiry": time.time() - 1}]), "account"))
+        self.assertIsNone(store.load("account"))
+        # a browser without the session cookie isn't saved
+        self.assertFalse(store.save(self.Driver(), "other", timeout=0))
+        self.assertEqual(len(os.listdir(store.directory)), 1)
+
+
+class Test_orchestrator(unittest.TestCase):
+
+    def test_retries(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        attempts = {}
+
+        def scrape_target(target, scraper_options):
+            name = target["page_or_group_name"]
+            attempts[name] = attempts.get(name, 0) + 1
+            if name == "broken" or (name == "flaky" and attempts[name] == 1):
+                raise Exception("browser crashed")
+            return {"1": {"options": dict(scraper_options, posts_count=target.get("posts_count"))}}, {"extract": 1.0}
+
+        # the targets run on threads rather than on worker processes with their own browser
+        with mock.patch("facebook_page_scraper.orchestrator.ProcessPoolExecutor",
+                        lambda max_workers, initializer, initargs: ThreadPoolExecutor(max_workers)), \
+                mock.patch("facebook_page_scraper.orchestrator._scrape_target", scrape_target):
+            orchestrator = facebook_page_scraper.Orchestrator(workers=2, retries=1, timeout=60)
+            results = orchestrator.run_to_json(["Meta", {"page_or_group_name": "flaky", "posts_count": 5}, "broken"])
+        self.assertEqual({name: (result["status"], result["attempts"]) for name, result in results.items()},
+                         {"Meta": ("done", 1), "flaky": ("done", 2), "broken": ("failed", 2)})
+        # the target's own arguments come along with the default ones
+        self.assertEqual(results["flaky"]["posts"]["1"]["options"], {"timeout": 60, "posts_count": 5})
+        self.assertEqual((results["broken"]["posts"], results["broken"]["error"]), ({}, "browser crashed"))
+
+    def test_targets(self):
+        orchestrator = facebook_page_scraper.Orchestrator()
+        self.assertEqual(list(orchestrator.run([])), [])
+        # a dictionary target must name its page or group
+        with self.assertRaises(Exception):
+            list(orchestrator.run(["Meta", {"posts_count": 5}]))
+
+
+class Test_waits(unittest.TestCase):
+
+    class Driver:
+        """runs the wait's script, answering with result or raising it"""
+
+        def __init__(self, result):
+            self.result, self.calls = result, []
+
+        def execute_async_script(self, script, kind, target, value, scope, timeout):
+            self.calls.append((kind, target, value, timeout))
+            if isinstance(self.result, Exception):
+                raise self.result
+            return self.result
+
+    def test_timeout(self):
+        from selenium.common.exceptions import TimeoutException
+        Waits = facebook_page_scraper.Waits
+        driver = self.Driver(True)
+        self.assertTrue(Waits._Waits__element(driver, "div[role='feed']", timeout=60))
+        # the browser gives up before the WebDriver script timeout
+        self.assertEqual(driver.calls, [("exists", "div[role='feed']", None, Waits.MAX_TIMEOUT)])
+        self.assertTrue(Waits._Waits__new_elements(driver, "div[data-virtualized]", 3))
+        self.assertEqual(driver.calls[-1], ("count_above", "div[data-virtualized]", 3, 6))
+        # expired in the browser, or the script timed out, the wait returns False rather than raising
+        self.assertFalse(Waits._Waits__element_gone(self.Driver(False), "div[aria-label='Photo Viewer']"))
+        self.assertFalse(Waits._Waits__image_changed(self.Driver(TimeoutException()), "img", "https://cdn/1.jpg"))
+        # the hovered link itself is watched, not a selector other links of the post already match
+        link = object()
+        self.assertTrue(Waits._Waits__href_changed(driver, link, "#"))
+        self.assertEqual(driver.calls[-1], ("href_changed", link, "#", 2))
+
+    def test_jitter(self):
+        from unittest import mock
+        driver = self.Driver(True)
+        driver.wait_jitter = (0.5, 1.5)
+        with mock.patch("facebook_page_scraper.waits.time.sleep") as sleep:
+            facebook_page_scraper.Waits._Waits__element(driver, "div")
+        self.assertEqual(sleep.call_count, 1)
+        self.assertTrue(0.5 <= sleep.call_args[0][0] <= 1.5)
+
+
+class Test_media_downloader(unittest.TestCase):
+
+    def test_content_addressed(self):
+        import tempfile
+        import threading
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = b"same picture" if self.path.endswith(".jpg") else b"<html></html>"
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg" if self.path.endswith(".jpg") else "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = "http://127.0.0.1:{}/".format(server.server_port)
+        posts = [("1", {"images": [url + "a.jpg"], "video": [url + "watch"]}), ("2", {"images": [url + "b.jpg"]})]
+        try:
+            with tempfile.TemporaryDirectory() as directory, facebook_page_scraper.Media_downloader(directory, workers=1) as downloader:
+                posts = dict(downloader.download_posts(iter(posts)))
+                first, page = posts["1"]["media"]
+                second = posts["2"]["media"][0]
+                self.assertEqual((first["status"], page["status"]), ("downloaded", "skipped"))
+                # same content under another URL is stored once
+                self.assertEqual((second["status"], second["path"]), ("exists", first["path"]))
+                with open(first["path"], "rb") as media_file:
+                    self.assertEqual(media_file.read(), b"same picture")
+            # the finished downloads aren't kept
+            self.assertEqual(downloader._Media_downloader__downloads, {})
+        finally:
+            server.shutdown()
+
+
+class Test_post(unittest.TestCase):
+
+    def test_mapping(self):
+        post = facebook_page_scraper.Post(post_id="1", content="text", reactions={"likes": 3, "haha": 1})
+        self.assertEqual(post.reaction_vector, (3, 0, 0, 0, 0, 0, 1))
+        self.assertEqual(list(post), ["content", "post_id", "reactions"])
+        self.assertEqual(post["reactions"]["likes"], 3)
+        self.assertNotIn("shares", post)
+        self.assertEqual(post.get("shares", 0), 0)
+        del post["content"]
+        self.assertEqual(json.loads(post.to_json()), {"post_id": "1", "reactions": dict(post["reactions"])})
+        with self.assertRaises(KeyError):
+            post["unknown"] = 1
+
+
+class Test_scrape_service(unittest.TestCase):
+
+    def test_job_stream(self):
+        import threading
+        from facebook_page_scraper.serve import Scrape_job, Scrape_service
+        job = Scrape_job({"page_or_group_name": "Meta"})
+
+        def scrape():
+            for post_id in ("1", "2", "3"):
+                job.add_post(post_id, {"content": post_id})
+            job.finish("done")
+
+        thread = threading.Thread(target=scrape)
+        thread.start()
+        self.assertEqual([post_id for post_id, _ in job.iter_posts(timeout=5)], ["1", "2", "3"])
+        thread.join()
+        self.assertEqual(job.to_dict()["posts_count"], 3)
+        # only the arguments of JOB_OPTIONS can be set by the jobs
+        with self.assertRaises(Exception):
+            Scrape_service(facebook_page_scraper.Driver_pool(size=1)).submit(
+                {"page_or_group_name": "Meta", "remoteBrowser": "http://example.com"})
+
+
+class Test_scheduler(unittest.TestCase):
+
+    def test_posting_rate(self):
+        from datetime import datetime
+        now = 1700000000
+        scheduler = facebook_page_scraper.Scheduler(["busy", "quiet", "third"], budget_minutes_per_hour=5)
+        # the first polls go back initial_window, the third target doesn't fit in the budget
+        planned = scheduler.plan(slots=3, now=now)
+        self.assertEqual([target["page_or_group_name"] for target, _ in planned], ["busy", "quiet"])
+        self.assertEqual(planned[0][0]["minimum_timestamp"], now - 24 * 3600)
+        # 2 posts per hour, and a single post in a day
+        scheduler.record("busy", [(str(index), {"posted_on": datetime.fromtimestamp(now - index * 1800).isoformat()})
+                                  for index in range(48)], 90, now=now)
+        scheduler.record("quiet", [("1", {"posted_on": datetime.fromtimestamp(now - 20 * 3600).isoformat()})], 60, now=now)
+        self.assertAlmostEqual(scheduler.state("busy")["rate"], 2.0)
+        # polled once posts_per_poll new posts are expected, within min_interval and max_interval
+        self.assertEqual(scheduler.state("busy")["next_poll"], now + 2.5 * 3600)
+        self.assertEqual(scheduler.state("quiet")["next_poll"], now + 24 * 3600)
+        # never polled targets come first, then the ones with the most new posts expected
+        planned = scheduler.plan(slots=3, now=now + 3 * 3600)
+        self.assertEqual([target["page_or_group_name"] for target, _ in planned], ["third", "busy"])
+        # the window starts overlap seconds before the newest post seen
+        self.assertEqual(planned[1][0]["minimum_timestamp"], now - 3600)
+
+
+class Test_filters(unittest.TestCase):
+
+    def test_time_window(self):
+        from datetime import datetime
+        window = facebook_page_scraper.Time_window(since=datetime(2022, 1, 10).timestamp(), until=datetime(2022, 1, 20).timestamp())
+        newer, inside, older = ({"posted_on": "2022-01-{:02d}T00:00:00".format(day)} for day in (25, 15, 5))
+        self.assertEqual([window.accepts(post) for post in (newer, inside, older)], [False, True, False])
+        # the feed goes backwards in time, only posts older than the window end it
+        self.assertEqual([window.ends_feed(post) for post in (newer, older)], [False, True])
+        self.assertTrue(window.accepts({"posted_on": ""}))
+        # a date that can't be parsed keeps the post and is logged
+        with self.assertLogs("facebook_page_scraper.filters", level="WARNING"):
+            self.assertTrue(window.accepts({"posted_on": "yesterday"}))
+            self.assertFalse(window.ends_feed({"posted_on": "yesterday"}))
+
+    def test_plan_steps(self):
+        scraper = facebook_page_scraper.Facebook_scraper("page", fields=["post_id", "post_url", "content", "images"])
+        scraper._Facebook_scraper__filters = [facebook_page_scraper.Time_window(since=1),
+                                              facebook_page_scraper.Content_match("kept")]
+        # the steps of the filters come first, cheapest filter first, then the other requested steps
+        self.assertEqual([step[0] for step in scraper._Facebook_scraper__plan_steps()], ["content", "posted_on", "images"])
+
+    def test_rejected_post_not_hovered(self):
+        from unittest import mock
+        from facebook_page_scraper.element_finder import Finder
+
+        class Cursor:
+            def __init__(self, posts):
+                self.posts, self.added = posts, []
+
+            def next_posts(self):
+                posts, self.posts = self.posts, []
+                return posts
+
+            def seen(self, key):
+                return key in self.added
+
+            def add(self, key):
+                self.added.append(key)
+
+        scraper = facebook_page_scraper.Facebook_scraper("page", fields=["post_id", "post_url", "content", "images"])
+        scraper._Facebook_scraper__filters = [facebook_page_scraper.Content_match("kept")]
+        scraper._Facebook_scraper__steps = scraper._Facebook_scraper__plan_steps()
+        cursor = scraper._Facebook_scraper__cursor = Cursor(["kept", "dropped", "kept"])
+        scraper._Facebook_scraper__skip_posts = set()
+        scraper._Facebook_scraper__posts_found = 0
+        scraper._Facebook_scraper__scrap_start = 0
+        scraper.phase_timings = {}
+        scraper.infinite_loop_counter = 0
+        hovered, imaged = [], []
+        with mock.patch.object(Finder, "_Finder__find_post_key", lambda post, layout, driver: [post + "-key"]), \
+                mock.patch.object(Finder, "_Finder__find_content", lambda post, driver, layout: post), \
+                mock.patch.object(Finder, "_Finder__find_status", lambda post, *args, **kwargs: hovered.append(post) or (
+                    post, "https://facebook.com/" + post + "?ref=feed", None)), \
+                mock.patch.object(Finder, "_Finder__find_images", lambda post, *args: imaged.append(post) or {"images": []}):
+            posts = list(scraper._Facebook_scraper__find_elements())
+        self.assertEqual(posts, [("kept", {"post_id": "kept", "post_url": "https://facebook.com/kept", "content": "kept",
+                                           "images": []})])
+        # the rejected post never reached the time link nor the images, the same post rendered again is skipped by its key
+        self.assertEqual((hovered, imaged), (["kept"], ["kept"]))
+        self.assertEqual(cursor.added, ["kept-key", "kept", "dropped-key"])
+
+
+class Test_graphql_parser(unittest.TestCase):
+
+    def test_feed_response(self):
+        from datetime import datetime
+        fixture = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures", "graphql_feed.txt")
+        with open(fixture, encoding="utf-8") as response_file:
+            posts = dict(facebook_page_scraper.Graphql_parser._Graphql_parser__parse_response(response_file.read()))
+        self.assertEqual(list(posts), ["1001", "1002", "1003"])
+        self.assertEqual(posts["1001"]["content"], "Introducing our new research model.\nLearn more below.")
+        self.assertEqual(posts["1001"]["posted_on"], datetime.fromtimestamp(1705791815).isoformat())
+        self.assertEqual(len(posts["1001"]["images"]), 5)
+        self.assertEqual(posts["1001"]["reactions"]["likes"], 5000)
+        self.assertEqual((posts["1001"]["reaction_count"], posts["1001"]["shares"], posts["1001"]["comments"]), (5123, 42, 310))
+        self.assertEqual(posts["1002"]["video"], ["https://video.xx.fbcdn.net/v/777.mp4"])
+        # the shared post's photo and date belong to the original post, not to the share
+        self.assertEqual(posts["1003"]["images"], [])
+        self.assertEqual(posts["1003"]["posted_on"], datetime.fromtimestamp(1705619015).isoformat())
+
+    def test_photo_set(self):
+        photos = [{"__typename": "Photo", "id": str(photo_id), "image": {"uri": "https://scontent.xx.fbcdn.net/{}.jpg".format(photo_id)}}
+                  for photo_id in (11, 12, 13)]
+        page = '<html><script type="application/json" data-sjs>{}</script></html>'.format(
+            json.dumps({"require": [{"media": {"edges": [{"node": photo} for photo in photos + photos[:1]]}}]}))
+        self.assertEqual(facebook_page_scraper.Graphql_parser._Graphql_parser__photo_set(page),
+                         [(str(photo_id), "https://scontent.xx.fbcdn.net/{}.jpg".format(photo_id)) for photo_id in (11, 12, 13)])
+
+    class Request:
+
+        def __init__(self, request_id, story_id):
+            from types import SimpleNamespace
+            self.id, self.url, self.response = request_id, "https://www.facebook.com/api/graphql/", None
+            body = json.dumps({"data": {"__typename": "Story", "post_id": story_id, "comet_sections": {}}}).encode()
+            self.received = SimpleNamespace(status_code=200, body=body, headers={})
+
+    def test_captured_posts(self):
+        from types import SimpleNamespace
+        first, pending = self.Request("a", "1"), self.Request("b", "2")
+        first.response = first.received
+        driver, processed = SimpleNamespace(requests=[first, pending]), set()
+
+        def captured():
+            return [post_id for post_id, _ in facebook_page_scraper.Graphql_parser._Graphql_parser__captured_posts(
+                driver, "https://facebook.com/page", processed)]
+
+        self.assertEqual(captured(), ["1"])
+        # the response arriving later is read by the next call, the requests read before aren't read again
+        pending.response = pending.received
+        driver.requests.append(self.Request("c", "3"))
+        self.assertEqual(captured(), ["2"])
+        self.assertEqual(processed, {"a", "b"})
+        self.assertEqual(captured(), [])
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file